@@ -6,7 +6,7 @@ from django.conf import settings
 logger = logging.getLogger(__name__)
 
 
-def _get_sns_client():
+def get_sns_client():
     region = getattr(settings, 'AWS_SNS_REGION', 'ap-south-1')
     return boto3.client('sns', region_name=region)
 
@@ -23,24 +23,33 @@ def format_e164(phone):
     return '+' + cleaned
 
 
+def send_sms(phone, message, client=None, sms_type='Transactional'):
+    """
+    Send one SMS via AWS SNS. Returns the MessageId; raises ClientError on
+    failure. Pass a client to reuse its connection pool across many sends.
+    """
+    client = client or get_sns_client()
+    response = client.publish(
+        PhoneNumber=format_e164(phone),
+        Message=message,
+        MessageAttributes={
+            'AWS.SNS.SMS.SMSType': {
+                'DataType': 'String',
+                'StringValue': sms_type,
+            },
+        },
+    )
+    return response.get('MessageId')
+
+
 def send_otp_sms(phone, otp):
     """Send OTP via AWS SNS. Returns True on success, False on failure."""
     e164_phone = format_e164(phone)
     message = f'Your Agromod verification code is {otp}. It expires in 10 minutes. Do not share this code.'
 
     try:
-        client = _get_sns_client()
-        response = client.publish(
-            PhoneNumber=e164_phone,
-            Message=message,
-            MessageAttributes={
-                'AWS.SNS.SMS.SMSType': {
-                    'DataType': 'String',
-                    'StringValue': 'Transactional',
-                },
-            },
-        )
-        logger.info('OTP SMS sent to %s (MessageId: %s)', e164_phone, response.get('MessageId'))
+        message_id = send_sms(e164_phone, message)
+        logger.info('OTP SMS sent to %s (MessageId: %s)', e164_phone, message_id)
         return True
     except ClientError:
         logger.exception('Failed to send OTP SMS to %s', e164_phone)
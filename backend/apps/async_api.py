@@ -0,0 +1,73 @@
+"""
+Minimal async support for DRF views.
+
+DRF's APIView.dispatch is synchronous, so under ASGI every DRF view runs on
+Django's single thread-sensitive executor and an LLM call blocks it for its
+full duration. AsyncAPIView runs authentication, permission checks and body
+parsing in a worker thread (they may hit the database), then awaits the
+handler coroutine on the event loop so many Gemini calls can be in flight
+from one worker.
+
+Usage mirrors the function-based decorators:
+
+    @async_api_view(["POST"], parser_classes=[MultiPartParser, FormParser])
+    async def my_view(request):
+        ...
+"""
+from asgiref.sync import sync_to_async
+from rest_framework.views import APIView
+
+
+class AsyncAPIView(APIView):
+    """APIView whose HTTP handlers are coroutines."""
+
+    def _prepare_request(self, request, *args, **kwargs):
+        self.initial(request, *args, **kwargs)
+        # Parse the body up front so handlers can read request.data without I/O.
+        request.data
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await sync_to_async(self._prepare_request)(request, *args, **kwargs)
+
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(self, request.method.lower(), self.http_method_not_allowed)
+            else:
+                handler = self.http_method_not_allowed
+
+            response = handler(request, *args, **kwargs)
+            if hasattr(response, "__await__"):
+                response = await response
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+
+def async_api_view(http_method_names, parser_classes=None):
+    """Async equivalent of rest_framework.decorators.api_view (+ parser_classes)."""
+
+    def decorator(func):
+        attrs = {"__doc__": func.__doc__}
+        for method in http_method_names:
+            async def handler(self, *args, **kwargs):
+                return await func(*args, **kwargs)
+            attrs[method.lower()] = handler
+        if parser_classes is not None:
+            attrs["parser_classes"] = parser_classes
+
+        view_class = type(func.__name__, (AsyncAPIView,), attrs)
+        view_class.http_method_names = [m.lower() for m in http_method_names] + ["options"]
+        view = view_class.as_view()
+        view.__name__ = func.__name__
+        view.__doc__ = func.__doc__
+        return view
+
+    return decorator
@@ -0,0 +1,192 @@
+"""
+Speech output helpers for Kisan Mitra: PCM encoding and a persistent,
+content-addressed cache of synthesised audio.
+
+Gemini TTS returns raw 24 kHz 16-bit mono PCM (~48 KB/s). Clients can ask
+for a lower sample rate (16 kHz / 8 kHz WAV is plenty for speech) or for
+OGG/Opus, which is encoded with ffmpeg when it is installed and otherwise
+falls back to WAV.
+
+Encoded audio is stored through Django's default storage under
+tts_cache/, i.e. on S3 when STORAGES points there and under MEDIA_ROOT
+otherwise, so a repeated greeting or canned reply is synthesised once.
+Entries are keyed on the format actually produced. They expire after
+TTS_CACHE_TTL_DAYS: run manage.py prune_tts_cache daily, or on S3 add a
+lifecycle rule expiring the tts_cache/ prefix after the same
+number of days.
+"""
+import datetime
+import io
+import logging
+import shutil
+import subprocess
+import wave
+
+import numpy as np
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.utils import timezone
+
+from apps.gemini_cache import make_key
+from apps.gemini_client import GEMINI_TTS_MODEL, atext_to_speech
+
+logger = logging.getLogger(__name__)
+
+TTS_SAMPLE_RATE = 24000
+SUPPORTED_SAMPLE_RATES = (24000, 16000, 8000)
+# Prebuilt Gemini TTS voices.
+TTS_VOICES = (
+    "Achernar", "Achird", "Algenib", "Algieba", "Alnilam", "Aoede", "Autonoe", "Callirrhoe",
+    "Charon", "Despina", "Enceladus", "Erinome", "Fenrir", "Gacrux", "Iapetus", "Kore",
+    "Laomedeia", "Leda", "Orus", "Puck", "Pulcherrima", "Rasalgethi", "Sadachbia", "Sadaltager",
+    "Schedar", "Sulafat", "Umbriel", "Vindemiatrix", "Zephyr", "Zubenelgenubi",
+)
+AUDIO_MIME_TYPES = {"wav": "audio/wav", "ogg": "audio/ogg"}
+CACHE_PREFIX = "tts_cache"
+
+
+def pcm_to_wav(pcm_data: bytes, sample_rate: int = TTS_SAMPLE_RATE, channels: int = 1, sample_width: int = 2) -> bytes:
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as wf:
+        wf.setnchannels(channels)
+        wf.setsampwidth(sample_width)
+        wf.setframerate(sample_rate)
+        wf.writeframes(pcm_data)
+    return buf.getvalue()
+
+
+def resample_pcm(pcm_data: bytes, src_rate: int, dst_rate: int) -> bytes:
+    """Downsample 16-bit LE mono PCM by averaging each output sample's input window."""
+    if dst_rate >= src_rate:
+        return pcm_data
+    samples = np.frombuffer(pcm_data[: len(pcm_data) // 2 * 2], dtype="<i2")
+    n_out = len(samples) * dst_rate // src_rate
+    if not n_out:
+        return b""
+    # Window i is samples[i * src // dst : (i + 1) * src // dst]; windows are
+    # contiguous, so one reduceat over the starts sums them all.
+    bounds = np.arange(n_out + 1, dtype=np.int64) * src_rate // dst_rate
+    sums = np.add.reduceat(samples[: bounds[-1]].astype(np.int64), bounds[:-1])
+    return (sums // np.diff(bounds)).astype("<i2").tobytes()
+
+
+def _ffmpeg_binary():
+    return shutil.which(getattr(settings, "FFMPEG_BINARY", "ffmpeg"))
+
+
+def _pcm_to_ogg_opus(pcm_data: bytes, sample_rate: int) -> bytes | None:
+    ffmpeg = _ffmpeg_binary()
+    if not ffmpeg:
+        return None
+    try:
+        proc = subprocess.run(
+            [
+                ffmpeg, "-loglevel", "error",
+                "-f", "s16le", "-ar", str(sample_rate), "-ac", "1", "-i", "pipe:0",
+                "-c:a", "libopus", "-b:a", "24k", "-application", "voip",
+                "-f", "ogg", "pipe:1",
+            ],
+            input=pcm_data,
+            capture_output=True,
+            timeout=30,
+            check=True,
+        )
+    except (OSError, subprocess.SubprocessError):
+        logger.exception("Opus encoding failed; falling back to WAV")
+        return None
+    return proc.stdout
+
+
+def encode_audio(pcm_data: bytes, fmt: str = "wav", sample_rate: int = TTS_SAMPLE_RATE) -> tuple[bytes, str]:
+    """
+    Encode Gemini TTS PCM as `fmt` at `sample_rate`.
+    Returns (audio_bytes, actual_format) — "ogg" degrades to "wav" without ffmpeg.
+    """
+    if fmt == "ogg":
+        encoded = _pcm_to_ogg_opus(pcm_data, TTS_SAMPLE_RATE)
+        if encoded is not None:
+            return encoded, "ogg"
+    pcm_data = resample_pcm(pcm_data, TTS_SAMPLE_RATE, sample_rate)
+    return pcm_to_wav(pcm_data, sample_rate=sample_rate), "wav"
+
+
+def output_format(fmt: str, sample_rate: int) -> tuple[str, int]:
+    """(format, sample_rate) encode_audio() will produce for a request, as used in cache keys."""
+    if fmt == "ogg" and _ffmpeg_binary():
+        # Opus is always encoded from the 24 kHz source.
+        return "ogg", TTS_SAMPLE_RATE
+    return "wav", sample_rate
+
+
+def _cache_path(text: str, voice_name: str, fmt: str, sample_rate: int) -> str:
+    key = make_key(GEMINI_TTS_MODEL, voice_name, text, fmt, sample_rate)
+    return f"{CACHE_PREFIX}/{key[:2]}/{key}.{fmt}"
+
+
+def _load_cached(path: str) -> bytes | None:
+    if not default_storage.exists(path):
+        return None
+    with default_storage.open(path, "rb") as fh:
+        return fh.read()
+
+
+def _store(path: str, data: bytes) -> str:
+    # S3 overwrites in place; on local storage a concurrent miss for the
+    # same text may leave a suffixed copy, which the pruner removes.
+    return default_storage.save(path, ContentFile(data))
+
+
+def prune_cache(max_age_days: int) -> tuple[int, int]:
+    """Delete cached audio older than max_age_days. Returns (deleted, kept)."""
+    cutoff = timezone.now() - datetime.timedelta(days=max_age_days)
+    deleted = kept = 0
+    try:
+        shards, _ = default_storage.listdir(CACHE_PREFIX)
+    except FileNotFoundError:  # local storage before anything was cached
+        shards = []
+    for shard in shards:
+        _, files = default_storage.listdir(f"{CACHE_PREFIX}/{shard}")
+        for name in files:
+            path = f"{CACHE_PREFIX}/{shard}/{name}"
+            if default_storage.get_modified_time(path) < cutoff:
+                default_storage.delete(path)
+                deleted += 1
+            else:
+                kept += 1
+    return deleted, kept
+
+
+async def synthesize_cached(
+    text: str,
+    voice_name: str = "Kore",
+    fmt: str = "wav",
+    sample_rate: int = TTS_SAMPLE_RATE,
+    feature: str = "text_to_speech",
+) -> tuple[str, bytes, str]:
+    """
+    Return (storage_path, audio_bytes, format) for `text`, synthesising and
+    storing it only on a cache miss.
+    """
+    fmt, sample_rate = output_format(fmt, sample_rate)
+    path = _cache_path(text, voice_name, fmt, sample_rate)
+    cached = await sync_to_async(_load_cached, thread_sensitive=False)(path)
+    if cached is not None:
+        return path, cached, fmt
+
+    pcm_audio = await atext_to_speech(text, voice_name, feature=feature)
+    audio, actual_fmt = await sync_to_async(encode_audio, thread_sensitive=False)(pcm_audio, fmt, sample_rate)
+    if actual_fmt != fmt:
+        # ffmpeg failed on this input: key the WAV fallback as WAV.
+        path = _cache_path(text, voice_name, actual_fmt, sample_rate)
+    try:
+        path = await sync_to_async(_store, thread_sensitive=False)(path, audio)
+    except Exception:
+        logger.exception("Could not store TTS audio in cache")
+        path = ""
+    return path, audio, actual_fmt
+
+
+def audio_url(path: str) -> str:
+    return default_storage.url(path)
@@ -0,0 +1,274 @@
+import asyncio
+import contextlib
+import io
+import random
+import time
+from unittest import mock
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+QUESTIONS = [
+    'When should I sow wheat in Punjab?',
+    'How much urea does one acre of paddy need?',
+    'My tomato leaves are curling, what should I do?',
+    'Which mustard variety suits late sowing?',
+    'How often should I irrigate cotton in August?',
+    'What is the best time to spray for aphids?',
+    'How do I store onions to avoid rotting?',
+    'Is drip irrigation worth it for sugarcane?',
+]
+CROPS = ['Wheat', 'Rice', 'Cotton', 'Maize', 'Mustard', 'Soybean']
+REGIONS = ['Punjab', 'Haryana', 'Maharashtra', 'Bihar', 'Karnataka']
+
+SCENARIOS = ('chatbot', 'chatbot_stream', 'kisan_text', 'kisan_speak', 'tts', 'disease', 'yield')
+
+
+def _png(seed: int) -> bytes:
+    """A 256x256 noise image; different seeds give different dHashes."""
+    from PIL import Image
+
+    rng = random.Random(seed)
+    img = Image.new('RGB', (16, 16))
+    img.putdata([(rng.randrange(256), rng.randrange(256), rng.randrange(256)) for _ in range(256)])
+    buf = io.BytesIO()
+    img.resize((256, 256)).save(buf, format='PNG')
+    return buf.getvalue()
+
+
+def _build_request(scenario: str, key: int) -> dict:
+    """
+    Request spec for one call: method, path and json / files / params.
+    `key` picks the payload, so equal keys repeat an earlier request.
+    """
+    question = QUESTIONS[key % len(QUESTIONS)]
+    if key >= len(QUESTIONS):
+        question = f'{question} (field {key})'
+
+    if scenario == 'chatbot':
+        return {'method': 'POST', 'path': '/api/chatbot/message/', 'json': {'message': question}}
+    if scenario == 'chatbot_stream':
+        return {'method': 'POST', 'path': '/api/chatbot/message/', 'json': {'message': question, 'stream': True}, 'stream': True}
+    if scenario == 'kisan_text':
+        return {'method': 'POST', 'path': '/api/kisan-mitra/text/', 'json': {'message': question}}
+    if scenario == 'kisan_speak':
+        return {'method': 'POST', 'path': '/api/kisan-mitra/speak/', 'json': {'message': question}, 'stream': True}
+    if scenario == 'tts':
+        return {'method': 'POST', 'path': '/api/kisan-mitra/tts/', 'json': {'text': question, 'delivery': 'binary'}}
+    if scenario == 'disease':
+        # Requests with a description skip the dHash dedup, so repeated
+        # (popular) images go without one and can hit it.
+        return {
+            'method': 'POST', 'path': '/api/disease/analyze/',
+            'data': {'description': 'Spots on leaves'} if key >= len(QUESTIONS) else {},
+            'files': {'image': (f'leaf-{key}.png', _png(key), 'image/png')},
+        }
+    if scenario == 'yield':
+        return {'method': 'POST', 'path': '/api/yield/predict/', 'json': {
+            'crop': CROPS[key % len(CROPS)],
+            'region': REGIONS[key % len(REGIONS)],
+            'season': 'Rabi' if key % 2 else 'Kharif',
+            'area': f'{key % 10 + 1} acres',
+        }}
+    raise CommandError(f'Unknown scenario {scenario!r}')
+
+
+def _percentile(samples: list, pct: float):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+class _InProcessTransport:
+    """Drives the views through django.test.AsyncClient (no server needed)."""
+
+    def __init__(self):
+        from django.test import AsyncClient
+
+        self.client = AsyncClient()
+
+    async def send(self, spec: dict) -> tuple[int, float | None]:
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        started = time.perf_counter()
+        if 'json' in spec:
+            response = await self.client.post(spec['path'], spec['json'], content_type='application/json')
+        else:
+            data = dict(spec.get('data', {}))
+            for field, (name, content, mime) in spec.get('files', {}).items():
+                data[field] = SimpleUploadedFile(name, content, content_type=mime)
+            response = await self.client.post(spec['path'], data)
+
+        first_byte = None
+        if getattr(response, 'streaming', False):
+            async for _ in response.streaming_content:
+                if first_byte is None:
+                    first_byte = time.perf_counter() - started
+        return response.status_code, first_byte
+
+    async def close(self):
+        pass
+
+
+class _HTTPTransport:
+    """Drives a running server over HTTP."""
+
+    def __init__(self, base_url: str, token: str = ''):
+        import httpx
+
+        headers = {'Authorization': f'Bearer {token}'} if token else {}
+        self.client = httpx.AsyncClient(base_url=base_url.rstrip('/'), headers=headers, timeout=120)
+
+    async def send(self, spec: dict) -> tuple[int, float | None]:
+        started = time.perf_counter()
+        kwargs = {k: spec[k] for k in ('json', 'data', 'files') if k in spec}
+        first_byte = None
+        async with self.client.stream(spec['method'], spec['path'], **kwargs) as response:
+            async for _ in response.aiter_bytes():
+                if first_byte is None:
+                    first_byte = time.perf_counter() - started
+        return response.status_code, first_byte if spec.get('stream') else None
+
+    async def close(self):
+        await self.client.aclose()
+
+
+async def _run_scenario(transport, scenario: str, total: int, concurrency: int, unique_ratio: float, seed: int) -> dict:
+    rng = random.Random(seed)
+    # Non-unique requests repeat one of a small pool of payloads, like
+    # farmers asking the same popular questions.
+    keys = [
+        len(QUESTIONS) + i if rng.random() < unique_ratio else rng.randrange(len(QUESTIONS))
+        for i in range(total)
+    ]
+    queue = asyncio.Queue()
+    for key in keys:
+        queue.put_nowait(key)
+
+    latencies, ttfbs, errors = [], [], 0
+
+    async def worker():
+        nonlocal errors
+        while True:
+            try:
+                key = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            spec = _build_request(scenario, key)
+            started = time.perf_counter()
+            try:
+                status_code, first_byte = await transport.send(spec)
+            except Exception:
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - started)
+            if first_byte is not None:
+                ttfbs.append(first_byte)
+            if status_code >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(min(concurrency, total))))
+    elapsed = time.perf_counter() - started
+    return {
+        'requests': total,
+        'errors': errors,
+        'elapsed': elapsed,
+        'rps': total / elapsed if elapsed else 0,
+        'p50': _percentile(latencies, 50),
+        'p95': _percentile(latencies, 95),
+        'p99': _percentile(latencies, 99),
+        'ttfb_p50': _percentile(ttfbs, 50),
+    }
+
+
+def _ms(value):
+    return '-' if value is None else f'{value * 1000:.0f}'
+
+
+class Command(BaseCommand):
+    help = (
+        'Load-test the AI endpoints at a given concurrency and report throughput '
+        'and latency percentiles. Use --stub to run offline against apps.gemini_stub '
+        '(in-process only; the yield forecast is canned too); requests write rows to the configured database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scenario', action='append', choices=SCENARIOS,
+                            help='Scenario to run (repeatable; default: all).')
+        parser.add_argument('--requests', type=int, default=100, help='Requests per scenario (default: 100).')
+        parser.add_argument('--concurrency', type=int, default=10, help='Requests in flight (default: 10).')
+        parser.add_argument('--unique-ratio', type=float, default=1.0,
+                            help='Fraction of requests with a unique payload; the rest repeat popular ones (default: 1.0).')
+        parser.add_argument('--url', default='', help='Benchmark a running server, e.g. http://localhost:8000.')
+        parser.add_argument('--token', default='', help='JWT access token sent with --url requests.')
+        parser.add_argument('--stub', action='store_true', help='Use the offline Gemini stub (in-process runs).')
+        parser.add_argument('--stub-latency-ms', type=float, default=None, help='Override GEMINI_STUB_LATENCY_MS.')
+        parser.add_argument('--clear-cache', action='store_true', help='Clear the Gemini response cache before each scenario.')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        from apps import gemini_client
+        from apps.gemini_cache import get_response_cache
+        from apps.llm_usage.recorder import flush
+
+        if options['url'] and options['stub']:
+            raise CommandError('--stub only applies to in-process runs; start the server with GEMINI_BACKEND=stub instead.')
+        if not 0 <= options['unique_ratio'] <= 1:
+            raise CommandError('--unique-ratio must be between 0 and 1.')
+
+        overrides = {'ALLOWED_HOSTS': list(settings.ALLOWED_HOSTS) + ['testserver']}
+        if options['stub']:
+            overrides['GEMINI_BACKEND'] = 'stub'
+        if options['stub_latency_ms'] is not None:
+            overrides['GEMINI_STUB_LATENCY_MS'] = options['stub_latency_ms']
+
+        scenarios = options['scenario'] or list(SCENARIOS)
+        results = {}
+        with override_settings(**overrides), contextlib.ExitStack() as stack:
+            if options['stub']:
+                from apps.gemini_stub import forecast_text
+
+                stack.enter_context(mock.patch('apps.yield_prediction.gemini_yield._fetch_forecast', forecast_text))
+            gemini_client._client = None
+            try:
+                results = asyncio.run(self._run(scenarios, options, get_response_cache))
+            finally:
+                gemini_client._client = None
+
+        header = (
+            f"{'scenario':<16}{'reqs':>6}{'err':>5}{'req/s':>8}"
+            f"{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'ttfb p50':>10}"
+        )
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+        for scenario, r in results.items():
+            self.stdout.write(
+                f"{scenario:<16}{r['requests']:>6}{r['errors']:>5}{r['rps']:>8.1f}"
+                f"{_ms(r['p50']):>9}{_ms(r['p95']):>9}{_ms(r['p99']):>9}{_ms(r['ttfb_p50']):>10}"
+            )
+        if not options['url']:
+            self.stdout.write(f"response cache: {get_response_cache().stats()}")
+            # In-process runs record usage here; write it before llm_usage_report is run.
+            flush()
+
+    async def _run(self, scenarios, options, get_response_cache):
+        if options['url']:
+            transport = _HTTPTransport(options['url'], options['token'])
+        else:
+            transport = _InProcessTransport()
+        results = {}
+        try:
+            for scenario in scenarios:
+                if options['clear_cache']:
+                    get_response_cache().clear()
+                self.stderr.write(f'Running {scenario} ...')
+                results[scenario] = await _run_scenario(
+                    transport, scenario, options['requests'], options['concurrency'],
+                    options['unique_ratio'], options['seed'],
+                )
+        finally:
+            await transport.close()
+        return results
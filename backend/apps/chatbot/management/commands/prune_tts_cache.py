@@ -0,0 +1,22 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from ...audio import prune_cache
+
+
+class Command(BaseCommand):
+    help = 'Delete cached Kisan Mitra TTS audio older than TTS_CACHE_TTL_DAYS.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help='Override TTS_CACHE_TTL_DAYS.')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        days = options['days'] or getattr(settings, 'TTS_CACHE_TTL_DAYS', 30)
+        deleted, kept = prune_cache(days)
+        self.stdout.write(self.style.SUCCESS(
+            f'{deleted} cached audio files older than {days} days deleted, {kept} kept '
+            f'({time.monotonic() - started:.1f}s).'
+        ))
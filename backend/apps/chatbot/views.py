@@ -1,28 +1,31 @@
+import asyncio
 import base64
-import io
+import json
 import logging
-import wave
+import re
 
+from django.http import HttpResponse, StreamingHttpResponse
 from rest_framework import status
-from rest_framework.decorators import api_view, parser_classes
+from rest_framework.decorators import api_view, permission_classes
 from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
+from rest_framework.permissions import IsAdminUser
 from rest_framework.response import Response
 
+from apps.async_api import async_api_view
+from apps.gemini_cache import get_response_cache
 from apps.gemini_client import (
-    ask_text, ask_with_audio, ask_with_image,
-    create_ephemeral_token, text_to_speech,
+    aask_text, aask_with_audio, aask_with_image,
+    astream_text, astream_with_image, create_ephemeral_token,
+)
+from apps.gemini_resilience import resilience_state
+from apps.http_client import http_stats
+from apps.image_prep import aprepare_image, image_prep_stats
+from .audio import (
+    AUDIO_MIME_TYPES, SUPPORTED_SAMPLE_RATES, TTS_SAMPLE_RATE, TTS_VOICES,
+    audio_url, synthesize_cached,
 )
 
 
-def _pcm_to_wav(pcm_data: bytes, sample_rate: int = 24000, channels: int = 1, sample_width: int = 2) -> bytes:
-    buf = io.BytesIO()
-    with wave.open(buf, "wb") as wf:
-        wf.setnchannels(channels)
-        wf.setsampwidth(sample_width)
-        wf.setframerate(sample_rate)
-        wf.writeframes(pcm_data)
-    return buf.getvalue()
-
 logger = logging.getLogger(__name__)
 
 CHATBOT_SYSTEM_PROMPT = (
@@ -69,10 +72,64 @@ MAX_IMAGE_SIZE = 5 * 1024 * 1024
 ALLOWED_AUDIO_TYPES = {"audio/webm", "audio/wav", "audio/ogg", "audio/mpeg", "audio/mp4", "audio/mp3"}
 ALLOWED_IMAGE_TYPES = {"image/jpeg", "image/png", "image/webp"}
 
+MAX_TTS_CHARS = 3000
+# kisan_mitra_tts responses: base64 in JSON, raw audio bytes, or a storage URL
+TTS_DELIVERIES = ("inline", "binary", "url")
+# Short sentences are merged until a chunk reaches this length, so numbered
+# steps ("1.") and one-word lines don't each cost a TTS round trip.
+MIN_TTS_CHUNK_CHARS = 40
 
+TEXT_FALLBACK_REPLY = "I could not generate a response. Please rephrase your question and try again."
 
-@api_view(["POST"])
-def chatbot_message(request):
+
+# ── Server-Sent Events helpers ───────────────────────────────────────────
+
+def _wants_stream(request) -> bool:
+    """Clients opt into SSE with ?stream=1 (or a truthy "stream" field in the body)."""
+    flag = request.query_params.get("stream") or request.data.get("stream")
+    return str(flag).lower() in ("1", "true", "yes")
+
+
+def _sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def _sse_reply(chunks, fallback: str, log_message: str):
+    """
+    Relay text chunks as `delta` events, then a final `done` event carrying
+    the full reply. Upstream failures after the stream has started are
+    reported as an `error` event since the status line is already sent.
+
+    Events reach the client incrementally only under an ASGI server.
+    Behind API Gateway / Mangum the whole response is buffered and arrives
+    at once when the reply is complete, so there time-to-first-token is no
+    better than the non-streaming request.
+    """
+    parts = []
+    try:
+        async for text in chunks:
+            parts.append(text)
+            yield _sse_event("delta", {"text": text})
+    except Exception:
+        logger.exception(log_message)
+        yield _sse_event("error", {"error": "Unable to get a response. Please try again."})
+        return
+    reply = "".join(parts)
+    if not reply and fallback:
+        reply = fallback
+        yield _sse_event("delta", {"text": reply})
+    yield _sse_event("done", {"reply": reply})
+
+
+def _sse_response(events) -> StreamingHttpResponse:
+    response = StreamingHttpResponse(events, content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
+@async_api_view(["POST"])
+async def chatbot_message(request):
     message = request.data.get("message", "").strip()
     if not message:
         return Response(
@@ -80,8 +137,15 @@ def chatbot_message(request):
             status=status.HTTP_400_BAD_REQUEST,
         )
 
+    if _wants_stream(request):
+        return _sse_response(_sse_reply(
+            astream_text(CHATBOT_SYSTEM_PROMPT, message, max_tokens=512, feature="chatbot"),
+            fallback="",
+            log_message="Gemini chatbot stream failed",
+        ))
+
     try:
-        reply = ask_text(CHATBOT_SYSTEM_PROMPT, message, max_tokens=512)
+        reply = await aask_text(CHATBOT_SYSTEM_PROMPT, message, max_tokens=512, feature="chatbot")
     except Exception:
         logger.exception("Gemini chatbot failed")
         return Response(
@@ -92,6 +156,19 @@ def chatbot_message(request):
     return Response({"reply": reply})
 
 
+# ── Monitoring: cache, resilience and image preprocessing state ──────────
+
+@api_view(["GET"])
+@permission_classes([IsAdminUser])
+def ai_status(request):
+    return Response({
+        "response_cache": get_response_cache().stats(),
+        "upstream": resilience_state(),
+        "image_prep": image_prep_stats(),
+        "http": http_stats(),
+    })
+
+
 # ── Kisan Mitra: Gemini Live API token (primary — real-time voice) ────────
 
 @api_view(["POST"])
@@ -119,9 +196,8 @@ def kisan_mitra_token(request):
 
 # ── Kisan Mitra: fallback voice endpoint (record → send → get reply) ─────
 
-@api_view(["POST"])
-@parser_classes([MultiPartParser, FormParser])
-def kisan_mitra_voice(request):
+@async_api_view(["POST"], parser_classes=[MultiPartParser, FormParser])
+async def kisan_mitra_voice(request):
     audio_file = request.FILES.get("audio")
     image_file = request.FILES.get("image")
     preferred_lang = request.POST.get("language", "").strip()
@@ -144,17 +220,17 @@ def kisan_mitra_voice(request):
         image_mime = image_file.content_type or "image/jpeg"
         if image_mime not in ALLOWED_IMAGE_TYPES:
             return Response({"error": "Unsupported image format."}, status=status.HTTP_400_BAD_REQUEST)
-        image_bytes = image_file.read()
+        image_bytes, image_mime = await aprepare_image(image_file.read(), image_mime)
 
     system_prompt = KISAN_MITRA_SYSTEM_PROMPT
     if preferred_lang and preferred_lang.lower() != "english":
         system_prompt += f"\n\nIMPORTANT: The user prefers {preferred_lang}. Reply in {preferred_lang}."
 
     try:
-        text_reply = ask_with_audio(
+        text_reply = await aask_with_audio(
             system_prompt, audio_bytes, audio_mime,
             image_bytes=image_bytes, image_mime=image_mime,
-            max_tokens=2048, temperature=0.4,
+            max_tokens=2048, temperature=0.4, feature="kisan_mitra_voice",
         )
     except Exception:
         logger.exception("Kisan Mitra audio understanding failed")
@@ -168,9 +244,11 @@ def kisan_mitra_voice(request):
 
 # ── Kisan Mitra: text + optional image endpoint ──────────────────────────
 
-@api_view(["POST"])
-@parser_classes([MultiPartParser, FormParser, JSONParser])
-def kisan_mitra_text(request):
+def _read_text_request(request):
+    """
+    Parse a Kisan Mitra text request (JSON, or multipart with optional image).
+    Returns (message, image_bytes, image_mime, error_response).
+    """
     message = ""
     image_bytes = None
     image_mime = "image/jpeg"
@@ -180,49 +258,252 @@ def kisan_mitra_text(request):
         image_file = request.FILES.get("image")
         if image_file:
             if image_file.size > MAX_IMAGE_SIZE:
-                return Response({"error": "Image too large (max 5 MB)."}, status=status.HTTP_400_BAD_REQUEST)
+                return message, None, image_mime, Response({"error": "Image too large (max 5 MB)."}, status=status.HTTP_400_BAD_REQUEST)
             image_mime = image_file.content_type or "image/jpeg"
             if image_mime not in ALLOWED_IMAGE_TYPES:
-                return Response({"error": "Unsupported image format."}, status=status.HTTP_400_BAD_REQUEST)
+                return message, None, image_mime, Response({"error": "Unsupported image format."}, status=status.HTTP_400_BAD_REQUEST)
             image_bytes = image_file.read()
     else:
         message = request.data.get("message", "").strip()
 
     if not message:
-        return Response({"error": "Message is required."}, status=status.HTTP_400_BAD_REQUEST)
+        return message, None, image_mime, Response({"error": "Message is required."}, status=status.HTTP_400_BAD_REQUEST)
+
+    return message, image_bytes, image_mime, None
+
+
+def _stream_kisan_mitra_reply(message, image_bytes, image_mime, feature):
+    if image_bytes:
+        return astream_with_image(
+            KISAN_MITRA_SYSTEM_PROMPT, message, image_bytes, image_mime, max_tokens=2048, feature=feature,
+        )
+    return astream_text(KISAN_MITRA_SYSTEM_PROMPT, message, max_tokens=2048, feature=feature)
+
+
+@async_api_view(["POST"], parser_classes=[MultiPartParser, FormParser, JSONParser])
+async def kisan_mitra_text(request):
+    message, image_bytes, image_mime, error = _read_text_request(request)
+    if error is not None:
+        return error
+    if image_bytes:
+        image_bytes, image_mime = await aprepare_image(image_bytes, image_mime)
+
+    if _wants_stream(request):
+        return _sse_response(_sse_reply(
+            _stream_kisan_mitra_reply(message, image_bytes, image_mime, "kisan_mitra_text"),
+            fallback=TEXT_FALLBACK_REPLY,
+            log_message="Kisan Mitra text stream failed",
+        ))
 
     try:
         if image_bytes:
-            text_reply = ask_with_image(KISAN_MITRA_SYSTEM_PROMPT, message, image_bytes, image_mime, max_tokens=2048)
+            text_reply = await aask_with_image(
+                KISAN_MITRA_SYSTEM_PROMPT, message, image_bytes, image_mime,
+                max_tokens=2048, feature="kisan_mitra_text",
+            )
         else:
-            text_reply = ask_text(KISAN_MITRA_SYSTEM_PROMPT, message, max_tokens=2048)
+            text_reply = await aask_text(KISAN_MITRA_SYSTEM_PROMPT, message, max_tokens=2048, feature="kisan_mitra_text")
     except Exception:
         logger.exception("Kisan Mitra text failed")
         return Response({"error": "Unable to get a response. Please try again."}, status=status.HTTP_502_BAD_GATEWAY)
 
     if not text_reply:
-        text_reply = "I could not generate a response. Please rephrase your question and try again."
+        text_reply = TEXT_FALLBACK_REPLY
 
     return Response({"reply": text_reply})
 
 
 # ── Kisan Mitra: separate TTS endpoint (called async after text reply) ────
 
-@api_view(["POST"])
-@parser_classes([JSONParser])
-def kisan_mitra_tts(request):
+def _read_audio_options(request):
+    """
+    Optional output settings: format ("wav" | "ogg") and sample_rate
+    (24000 | 16000 | 8000, WAV only). Returns (fmt, sample_rate, error_response).
+    """
+    fmt = (request.data.get("format") or "wav").lower()
+    if fmt not in AUDIO_MIME_TYPES:
+        return fmt, TTS_SAMPLE_RATE, Response({"error": "Unsupported audio format."}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        sample_rate = int(request.data.get("sample_rate") or TTS_SAMPLE_RATE)
+    except (TypeError, ValueError):
+        sample_rate = None
+    if sample_rate not in SUPPORTED_SAMPLE_RATES:
+        return fmt, TTS_SAMPLE_RATE, Response({"error": "Unsupported sample rate."}, status=status.HTTP_400_BAD_REQUEST)
+    return fmt, sample_rate, None
+
+
+@async_api_view(["POST"], parser_classes=[JSONParser])
+async def kisan_mitra_tts(request):
     text = (request.data.get("text") or "").strip()
     if not text:
         return Response({"error": "Text is required."}, status=status.HTTP_400_BAD_REQUEST)
 
-    if len(text) > 3000:
-        text = text[:3000]
+    if len(text) > MAX_TTS_CHARS:
+        text = text[:MAX_TTS_CHARS]
+
+    fmt, sample_rate, error = _read_audio_options(request)
+    if error is not None:
+        return error
+    delivery = request.data.get("delivery") or "inline"
+    if delivery not in TTS_DELIVERIES:
+        return Response(
+            {"error": f"delivery must be one of: {', '.join(TTS_DELIVERIES)}."}, status=status.HTTP_400_BAD_REQUEST,
+        )
 
     try:
-        pcm_audio = text_to_speech(text)
-        audio_b64 = base64.b64encode(_pcm_to_wav(pcm_audio)).decode("ascii")
+        path, audio, fmt = await synthesize_cached(text, fmt=fmt, sample_rate=sample_rate, feature="kisan_mitra_tts")
     except Exception:
         logger.exception("Kisan Mitra TTS failed")
         return Response({"error": "TTS failed."}, status=status.HTTP_502_BAD_GATEWAY)
 
-    return Response({"audio": audio_b64})
+    mime_type = AUDIO_MIME_TYPES[fmt]
+    if delivery == "binary":
+        return HttpResponse(audio, content_type=mime_type)
+    if delivery == "url" and path:
+        return Response({"url": audio_url(path), "format": fmt, "mime_type": mime_type})
+
+    audio_b64 = base64.b64encode(audio).decode("ascii")
+    return Response({"audio": audio_b64, "format": fmt, "mime_type": mime_type})
+
+
+# ── Kisan Mitra: pipelined text + speech (SSE) ───────────────────────────
+
+_SENTENCE_BOUNDARY = re.compile(r"[.!?।॥\n]+[\"')\]]*\s+")
+
+
+class _SentenceSplitter:
+    """Accumulates streamed text and releases complete sentences for synthesis."""
+
+    def __init__(self, min_chars: int = MIN_TTS_CHUNK_CHARS):
+        self.min_chars = min_chars
+        self.buffer = ""
+
+    def feed(self, text: str) -> list[str]:
+        self.buffer += text
+        sentences = []
+        start = 0
+        for match in _SENTENCE_BOUNDARY.finditer(self.buffer):
+            if match.end() - start >= self.min_chars:
+                sentences.append(self.buffer[start:match.end()].strip())
+                start = match.end()
+        self.buffer = self.buffer[start:]
+        return sentences
+
+    def flush(self) -> list[str]:
+        rest = self.buffer.strip()
+        self.buffer = ""
+        return [rest] if rest else []
+
+
+async def _speak_events(chunks, fallback: str, voice_name: str, fmt: str = "wav", sample_rate: int = TTS_SAMPLE_RATE):
+    """
+    Relay reply text as `delta` events while each completed sentence is sent
+    to TTS concurrently; `audio` events (base64 audio segments) are emitted in
+    sentence order as soon as the head-of-line segment is ready. Ends with a
+    `done` event carrying the full reply, or, if the reply stream fails, with
+    an `error` event and no `done`, so clients don't treat a partial reply
+    as complete.
+    """
+    failed = _sse_event("error", {"error": "Unable to get a response. Please try again."})
+    events = asyncio.Queue()
+    jobs = asyncio.Queue()  # (index, sentence, task) in order; None terminates
+    tts_tasks = []
+    reply_parts = []
+
+    async def produce():
+        splitter = _SentenceSplitter()
+        budget = MAX_TTS_CHARS
+        index = 0
+
+        async def schedule(sentences):
+            nonlocal budget, index
+            for sentence in sentences:
+                if budget <= 0:
+                    return
+                sentence = sentence[:budget]
+                budget -= len(sentence)
+                task = asyncio.create_task(
+                    synthesize_cached(sentence, voice_name, fmt, sample_rate, feature="kisan_mitra_speak_tts")
+                )
+                tts_tasks.append(task)
+                await jobs.put((index, sentence, task))
+                index += 1
+
+        try:
+            async for text in chunks:
+                reply_parts.append(text)
+                await events.put(_sse_event("delta", {"text": text}))
+                await schedule(splitter.feed(text))
+            if not reply_parts:
+                reply_parts.append(fallback)
+                await events.put(_sse_event("delta", {"text": fallback}))
+                splitter.feed(fallback)
+            await schedule(splitter.flush())
+        except Exception:
+            logger.exception("Kisan Mitra speak stream failed")
+            await events.put(failed)
+        finally:
+            await jobs.put(None)
+
+    async def deliver():
+        try:
+            while (job := await jobs.get()) is not None:
+                index, sentence, task = job
+                try:
+                    _, audio, segment_fmt = await task
+                except Exception:
+                    logger.exception("Kisan Mitra TTS segment %d failed", index)
+                    await events.put(_sse_event("audio_error", {"index": index, "text": sentence}))
+                    continue
+                await events.put(_sse_event("audio", {
+                    "index": index,
+                    "text": sentence,
+                    "format": segment_fmt,
+                    "audio": base64.b64encode(audio).decode("ascii"),
+                }))
+        finally:
+            await events.put(None)
+
+    producer = asyncio.create_task(produce())
+    deliverer = asyncio.create_task(deliver())
+    try:
+        while (event := await events.get()) is not None:
+            yield event
+            if event is failed:
+                return
+        yield _sse_event("done", {"reply": "".join(reply_parts)})
+    finally:
+        # Client went away (or we finished): don't leave synthesis running.
+        for task in (producer, deliverer, *tts_tasks):
+            task.cancel()
+
+
+@async_api_view(["POST"], parser_classes=[MultiPartParser, FormParser, JSONParser])
+async def kisan_mitra_speak(request):
+    """
+    Text (+ optional image) in, streamed reply text and speech out.
+
+    Replaces the kisan_mitra_text → kisan_mitra_tts round trip: speech for
+    the first sentence starts while the rest of the reply is still being
+    generated.
+    """
+    message, image_bytes, image_mime, error = _read_text_request(request)
+    if error is not None:
+        return error
+    if image_bytes:
+        image_bytes, image_mime = await aprepare_image(image_bytes, image_mime)
+
+    fmt, sample_rate, error = _read_audio_options(request)
+    if error is not None:
+        return error
+
+    voice_name = (request.data.get("voice") or "Kore").strip()
+    if voice_name not in TTS_VOICES:
+        return Response({"error": "Unsupported voice."}, status=status.HTTP_400_BAD_REQUEST)
+    return _sse_response(_speak_events(
+        _stream_kisan_mitra_reply(message, image_bytes, image_mime, "kisan_mitra_speak"),
+        fallback=TEXT_FALLBACK_REPLY,
+        voice_name=voice_name,
+        fmt=fmt,
+        sample_rate=sample_rate,
+    ))
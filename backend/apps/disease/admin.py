@@ -7,4 +7,4 @@ from .models import DiseaseQuery
 class DiseaseQueryAdmin(admin.ModelAdmin):
     list_display = ("id", "user", "diagnosis", "created_at")
     list_filter = ("created_at",)
-    readonly_fields = ("created_at",)
+    readonly_fields = ("image_hash", "result", "created_at")
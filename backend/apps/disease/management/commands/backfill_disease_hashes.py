@@ -0,0 +1,54 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.image_prep import prepare_image
+from ...models import DiseaseQuery
+from ...phash import dhash, hash_fields
+
+HASH_FIELDS = ['image_hash', 'hash_band_0', 'hash_band_1', 'hash_band_2', 'hash_band_3']
+
+
+class Command(BaseCommand):
+    help = 'Compute the dHash of stored DiseaseQuery images saved before hashing existed, so they can be reused.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=200)
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        # Same rows find_similar() can return: structured result, no description.
+        pending = (
+            DiseaseQuery.objects
+            .filter(image_hash__isnull=True, description='')
+            .exclude(result={})
+            .exclude(image='')
+            .only('id', 'image')
+            .order_by('id')
+        )
+        hashed = skipped = 0
+        batch = []
+        for query in pending.iterator(chunk_size=options['batch_size']):
+            try:
+                with query.image.open('rb') as fh:
+                    # Hash what the view hashes: the image as prepared for Gemini.
+                    value = dhash(prepare_image(fh.read())[0])
+            except (OSError, ValueError) as exc:
+                self.stderr.write(f'#{query.pk}: {exc}')
+                value = None
+            if value is None:
+                skipped += 1
+                continue
+            for field, field_value in hash_fields(value).items():
+                setattr(query, field, field_value)
+            batch.append(query)
+            if len(batch) >= options['batch_size']:
+                DiseaseQuery.objects.bulk_update(batch, HASH_FIELDS)
+                hashed += len(batch)
+                batch = []
+        if batch:
+            DiseaseQuery.objects.bulk_update(batch, HASH_FIELDS)
+            hashed += len(batch)
+        self.stdout.write(self.style.SUCCESS(
+            f'{hashed} images hashed, {skipped} unreadable or too uniform ({time.monotonic() - started:.1f}s).'
+        ))
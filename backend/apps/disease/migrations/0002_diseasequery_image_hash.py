@@ -0,0 +1,43 @@
+# Generated by Django 4.2.30 on 2026-10-17 18:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('disease', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='diseasequery',
+            name='hash_band_0',
+            field=models.IntegerField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='diseasequery',
+            name='hash_band_1',
+            field=models.IntegerField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='diseasequery',
+            name='hash_band_2',
+            field=models.IntegerField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='diseasequery',
+            name='hash_band_3',
+            field=models.IntegerField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='diseasequery',
+            name='image_hash',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='diseasequery',
+            name='result',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
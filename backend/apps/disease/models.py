@@ -14,6 +14,14 @@ class DiseaseQuery(models.Model):
     description = models.TextField(blank=True, default="")
     diagnosis = models.TextField(blank=True, default="")
     treatment = models.TextField(blank=True, default="")
+    # Full structured diagnosis; empty when Gemini's reply could not be parsed.
+    result = models.JSONField(blank=True, default=dict)
+    # dHash of the image and its four 16-bit bands (see apps.disease.phash).
+    image_hash = models.BigIntegerField(null=True, blank=True)
+    hash_band_0 = models.IntegerField(null=True, blank=True, db_index=True)
+    hash_band_1 = models.IntegerField(null=True, blank=True, db_index=True)
+    hash_band_2 = models.IntegerField(null=True, blank=True, db_index=True)
+    hash_band_3 = models.IntegerField(null=True, blank=True, db_index=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
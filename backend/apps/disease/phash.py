@@ -0,0 +1,120 @@
+"""
+Perceptual-hash lookup of previous disease diagnoses.
+
+Each analysed image gets a 64-bit difference hash (dHash). Re-sent photos
+(network retries, WhatsApp forwards, re-compression) land within a few bits
+of the original, so a query whose hash is within
+settings.DISEASE_DEDUP_MAX_DISTANCE of a stored one reuses that diagnosis.
+
+To keep lookups indexed, the hash is also stored as four 16-bit bands. By
+the pigeonhole principle two hashes within Hamming distance 3 share at
+least one band exactly, so candidates come from four equality lookups and
+only those rows are compared bit-by-bit. Only their ids and hashes are read
+for the comparison (up to DISEASE_DEDUP_MAX_CANDIDATES, newest first), and
+the stored result is loaded for the closest one, so a busy band doesn't
+hide an older but closer match. Distances above 3 still work but may miss
+matches that differ in every band.
+
+Blank or near-uniform images (a lens cap, a white sheet) hash to almost all
+zeros or ones and would match each other, so they get no hash. A diagnosis
+is only reused for queries without a farmer description, since new context
+("wilting since the rain") should get a fresh analysis. Rows saved before
+hashing was added are filled in by manage.py backfill_disease_hashes.
+"""
+import io
+import logging
+
+from django.conf import settings
+from django.db.models import Q
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from .models import DiseaseQuery
+
+logger = logging.getLogger(__name__)
+
+HASH_BITS = 64
+BAND_BITS = 16
+BAND_COUNT = HASH_BITS // BAND_BITS
+_BAND_MASK = (1 << BAND_BITS) - 1
+_SIGN_BIT = 1 << (HASH_BITS - 1)
+# Hashes with fewer set (or unset) bits than this carry too little detail to match on.
+MIN_HASH_BITS = 8
+
+
+def dhash(image_bytes: bytes) -> int | None:
+    """
+    64-bit difference hash of an image, as a signed int (fits a BigIntegerField),
+    or None if the image can't be read or is too uniform to hash usefully.
+    """
+    try:
+        with Image.open(io.BytesIO(image_bytes)) as img:
+            img = ImageOps.exif_transpose(img)
+            gray = img.convert("L").resize((9, 8), Image.Resampling.LANCZOS)
+    except (UnidentifiedImageError, OSError, ValueError):
+        logger.warning("Could not hash image", exc_info=True)
+        return None
+
+    pixels = list(gray.getdata())
+    value = 0
+    for row in range(8):
+        for col in range(8):
+            left = pixels[row * 9 + col]
+            right = pixels[row * 9 + col + 1]
+            value = (value << 1) | (left > right)
+    if not MIN_HASH_BITS <= value.bit_count() <= HASH_BITS - MIN_HASH_BITS:
+        return None
+    return value - (1 << HASH_BITS) if value & _SIGN_BIT else value
+
+
+def hash_bands(value: int) -> list[int]:
+    unsigned = value & ((1 << HASH_BITS) - 1)
+    return [(unsigned >> (i * BAND_BITS)) & _BAND_MASK for i in range(BAND_COUNT)]
+
+
+def hamming(a: int, b: int) -> int:
+    return ((a ^ b) & ((1 << HASH_BITS) - 1)).bit_count()
+
+
+def hash_fields(value: int | None) -> dict:
+    """Model field values for a hash (all None when the image could not be hashed)."""
+    if value is None:
+        return {}
+    b0, b1, b2, b3 = hash_bands(value)
+    return {
+        "image_hash": value,
+        "hash_band_0": b0,
+        "hash_band_1": b1,
+        "hash_band_2": b2,
+        "hash_band_3": b3,
+    }
+
+
+def find_similar(value: int | None, description: str = ""):
+    """
+    Closest previous query with a stored structured result, or None. Queries
+    with a description never match, and only match queries without one.
+    """
+    max_distance = getattr(settings, "DISEASE_DEDUP_MAX_DISTANCE", 3)
+    if value is None or max_distance < 0 or description.strip():
+        return None
+
+    b0, b1, b2, b3 = hash_bands(value)
+    candidates = (
+        DiseaseQuery.objects
+        .filter(Q(hash_band_0=b0) | Q(hash_band_1=b1) | Q(hash_band_2=b2) | Q(hash_band_3=b3))
+        .filter(description="")
+        .exclude(result={})
+        .order_by("-created_at")
+        .values_list("id", "image_hash")[:getattr(settings, "DISEASE_DEDUP_MAX_CANDIDATES", 5000)]
+    )
+    best = None
+    best_distance = max_distance + 1
+    for pk, image_hash in candidates:
+        distance = hamming(value, image_hash)
+        if distance < best_distance:
+            best, best_distance = pk, distance
+            if distance == 0:
+                break
+    if best is None:
+        return None
+    return DiseaseQuery.objects.only("id", "image_hash", "result").get(pk=best)
@@ -2,13 +2,16 @@ import json
 import logging
 import re
 
+from asgiref.sync import sync_to_async
 from rest_framework import status
-from rest_framework.decorators import api_view, parser_classes
 from rest_framework.parsers import MultiPartParser, FormParser
 from rest_framework.response import Response
 
-from apps.gemini_client import ask_with_image
+from apps.async_api import async_api_view
+from apps.gemini_client import aask_with_image
+from apps.image_prep import aprepare_image
 from .models import DiseaseQuery
+from .phash import dhash, find_similar, hash_fields
 from .serializers import DiseaseAnalyzeSerializer
 
 logger = logging.getLogger(__name__)
@@ -38,13 +41,16 @@ DISEASE_SYSTEM_PROMPT = (
 )
 
 
-def _parse_gemini_response(raw: str) -> dict:
-    """Extract structured data from the Gemini JSON response."""
+def _parse_gemini_response(raw: str) -> tuple[dict, bool]:
+    """
+    Extract structured data from the Gemini JSON response.
+    Returns (data, structured) — structured is False for the raw-text fallback.
+    """
     cleaned = raw.strip()
     cleaned = re.sub(r"^```(?:json)?\s*", "", cleaned)
     cleaned = re.sub(r"\s*```$", "", cleaned)
     try:
-        return json.loads(cleaned)
+        return json.loads(cleaned), True
     except json.JSONDecodeError:
         return {
             "plant": "unknown",
@@ -53,12 +59,23 @@ def _parse_gemini_response(raw: str) -> dict:
             "diagnosis": cleaned,
             "treatment": "Could not parse structured response. Raw analysis above.",
             "prevention": "",
-        }
+        }, False
 
 
-@api_view(["POST"])
-@parser_classes([MultiPartParser, FormParser])
-def analyze_disease(request):
+def _diagnosis_payload(parsed: dict) -> dict:
+    return {
+        "plant": parsed.get("plant", "unknown"),
+        "disease": parsed.get("disease", "unknown"),
+        "severity": parsed.get("severity", "unknown"),
+        "diagnosis": parsed.get("diagnosis", ""),
+        "treatment": parsed.get("treatment", ""),
+        "prevention": parsed.get("prevention", ""),
+        "recommended_products": parsed.get("recommended_products", []),
+    }
+
+
+@async_api_view(["POST"], parser_classes=[MultiPartParser, FormParser])
+async def analyze_disease(request):
     serializer = DiseaseAnalyzeSerializer(data=request.data)
     serializer.is_valid(raise_exception=True)
     d = serializer.validated_data
@@ -79,46 +96,54 @@ def analyze_disease(request):
             status=status.HTTP_400_BAD_REQUEST,
         )
 
-    image_bytes = image_file.read()
-
-    user_msg = "Analyse this plant/leaf image for diseases."
-    if description:
-        user_msg += f" Additional context from the farmer: {description}"
+    image_bytes, image_mime = await aprepare_image(image_file.read(), content_type)
+    image_hash = await sync_to_async(dhash, thread_sensitive=False)(image_bytes)
 
+    # Near-duplicate of an already diagnosed photo: reuse it, skip Gemini.
     try:
-        raw = ask_with_image(
-            DISEASE_SYSTEM_PROMPT,
-            user_msg,
-            image_bytes,
-            mime_type=content_type,
-        )
+        previous = await sync_to_async(find_similar)(image_hash, description)
     except Exception:
-        logger.exception("Gemini disease analysis failed")
-        return Response(
-            {"error": "Disease analysis failed. Please try again later."},
-            status=status.HTTP_502_BAD_GATEWAY,
-        )
-
-    parsed = _parse_gemini_response(raw)
+        logger.exception("Disease dedup lookup failed")
+        previous = None
+
+    if previous is not None:
+        payload = previous.result
+        structured = True
+    else:
+        user_msg = "Analyse this plant/leaf image for diseases."
+        if description:
+            user_msg += f" Additional context from the farmer: {description}"
+
+        try:
+            raw = await aask_with_image(
+                DISEASE_SYSTEM_PROMPT,
+                user_msg,
+                image_bytes,
+                mime_type=image_mime,
+                feature="disease",
+            )
+        except Exception:
+            logger.exception("Gemini disease analysis failed")
+            return Response(
+                {"error": "Disease analysis failed. Please try again later."},
+                status=status.HTTP_502_BAD_GATEWAY,
+            )
+
+        parsed, structured = _parse_gemini_response(raw)
+        payload = _diagnosis_payload(parsed)
 
     user = request.user if request.user.is_authenticated else None
     try:
-        DiseaseQuery.objects.create(
+        await sync_to_async(DiseaseQuery.objects.create)(
             user=user,
             image=image_file,
             description=description,
-            diagnosis=parsed.get("diagnosis", ""),
-            treatment=parsed.get("treatment", ""),
+            diagnosis=payload["diagnosis"],
+            treatment=payload["treatment"],
+            result=payload if structured else {},
+            **hash_fields(image_hash),
         )
     except Exception as e:
         logger.warning("Could not save DiseaseQuery log: %s", e)
 
-    return Response({
-        "plant": parsed.get("plant", "unknown"),
-        "disease": parsed.get("disease", "unknown"),
-        "severity": parsed.get("severity", "unknown"),
-        "diagnosis": parsed.get("diagnosis", ""),
-        "treatment": parsed.get("treatment", ""),
-        "prevention": parsed.get("prevention", ""),
-        "recommended_products": parsed.get("recommended_products", []),
-    })
+    return Response({**payload, "cached": previous is not None})
@@ -0,0 +1,215 @@
+"""
+Response cache for Gemini text completions.
+
+Entries are keyed on a SHA-256 of (model, system prompt, user message,
+max_tokens, temperature), so the same question asked by many farmers is
+answered once and served from cache until the TTL expires.
+
+The backend is selected by settings.GEMINI_CACHE_BACKEND:
+  "memory"  per-process LRU bounded by entry count and total bytes (default)
+  "django"  a Django cache alias, shared across processes / Lambda containers
+  "none"    caching disabled
+"""
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def make_key(*parts) -> str:
+    """Stable content hash of the given JSON-serialisable parts."""
+    payload = json.dumps(parts, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """Base cache: subclasses implement _get/_set/_clear; hit/miss counting lives here."""
+
+    backend = "base"
+
+    def __init__(self, ttl: int):
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._stats_lock = threading.Lock()
+
+    def get(self, key: str):
+        value = self._get(key)
+        with self._stats_lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def set(self, key: str, value) -> None:
+        self._set(key, value)
+
+    async def aget(self, key: str):
+        return await sync_to_async(self.get)(key)
+
+    async def aset(self, key: str, value) -> None:
+        await sync_to_async(self.set)(key, value)
+
+    def clear(self) -> None:
+        self._clear()
+        with self._stats_lock:
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "backend": self.backend,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+    def _get(self, key):
+        raise NotImplementedError
+
+    def _set(self, key, value):
+        raise NotImplementedError
+
+    def _clear(self):
+        raise NotImplementedError
+
+
+class NullResponseCache(ResponseCache):
+    backend = "none"
+
+    async def aget(self, key):
+        return self.get(key)
+
+    async def aset(self, key, value):
+        pass
+
+    def _get(self, key):
+        return None
+
+    def _set(self, key, value):
+        pass
+
+    def _clear(self):
+        pass
+
+
+class MemoryResponseCache(ResponseCache):
+    """In-process LRU with TTL, evicting by entry count and by total stored bytes."""
+
+    backend = "memory"
+
+    def __init__(self, ttl: int, max_entries: int = 1000, max_bytes: int = 8 * 1024 * 1024):
+        super().__init__(ttl)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._data = OrderedDict()  # key -> (expires_at, size, value)
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    # Pure in-memory operations: no need to hop to a worker thread.
+    async def aget(self, key):
+        return self.get(key)
+
+    async def aset(self, key, value):
+        self.set(key, value)
+
+    @staticmethod
+    def _sizeof(value) -> int:
+        if isinstance(value, (bytes, bytearray)):
+            return len(value)
+        return len(str(value).encode("utf-8"))
+
+    def _get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, size, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                self._bytes -= size
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def _set(self, key, value):
+        size = self._sizeof(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._data[key] = (time.monotonic() + self.ttl, size, value)
+            self._bytes += size
+            while self._data and (len(self._data) > self.max_entries or self._bytes > self.max_bytes):
+                _, (_, evicted_size, _) = self._data.popitem(last=False)
+                self._bytes -= evicted_size
+
+    def _clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        data = super().stats()
+        data.update(entries=len(self._data), bytes=self._bytes)
+        return data
+
+
+class DjangoResponseCache(ResponseCache):
+    """Delegates storage to a Django cache alias; eviction follows that backend's MAX_ENTRIES."""
+
+    backend = "django"
+    key_prefix = "gemini:"
+
+    def __init__(self, ttl: int, alias: str = "default"):
+        super().__init__(ttl)
+        self.alias = alias
+
+    @property
+    def _store(self):
+        return caches[self.alias]
+
+    def _get(self, key):
+        return self._store.get(self.key_prefix + key)
+
+    def _set(self, key, value):
+        self._store.set(self.key_prefix + key, value, self.ttl)
+
+    def _clear(self):
+        # Other entries may share the alias, so only the counters are reset.
+        pass
+
+
+def build_response_cache() -> ResponseCache:
+    backend = getattr(settings, "GEMINI_CACHE_BACKEND", "memory")
+    ttl = getattr(settings, "GEMINI_CACHE_TTL", 6 * 60 * 60)
+    if backend == "django":
+        return DjangoResponseCache(ttl, alias=getattr(settings, "GEMINI_CACHE_ALIAS", "default"))
+    if backend == "memory":
+        return MemoryResponseCache(
+            ttl,
+            max_entries=getattr(settings, "GEMINI_CACHE_MAX_ENTRIES", 1000),
+            max_bytes=getattr(settings, "GEMINI_CACHE_MAX_BYTES", 8 * 1024 * 1024),
+        )
+    return NullResponseCache(ttl)
+
+
+def get_response_cache() -> ResponseCache:
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = build_response_cache()
+    return _cache
@@ -3,15 +3,23 @@ Shared Google Gemini client used by yield_prediction, disease, and chatbot apps.
 
 Uses gemini-2.5-flash for text, vision (image), and audio tasks.
 """
+import asyncio
 import base64
 import logging
+import time
+import weakref
 
 from google import genai
 from django.conf import settings
 
+from apps.gemini_cache import get_response_cache, make_key
+from apps.gemini_resilience import acall, call
+from apps.llm_usage.recorder import record_call
+
 logger = logging.getLogger(__name__)
 
 _client = None
+_semaphores = weakref.WeakKeyDictionary()
 
 GEMINI_TTS_MODEL = "gemini-2.5-flash-preview-tts"
 
@@ -19,10 +27,69 @@ GEMINI_TTS_MODEL = "gemini-2.5-flash-preview-tts"
 def _get_client():
     global _client
     if _client is None:
-        _client = genai.Client(api_key=settings.GEMINI_API_KEY)
+        if getattr(settings, "GEMINI_BACKEND", "google") == "stub":
+            from apps.gemini_stub import StubClient
+
+            _client = StubClient()
+        else:
+            _client = genai.Client(api_key=settings.GEMINI_API_KEY)
     return _client
 
 
+def _get_semaphore() -> asyncio.Semaphore:
+    """
+    Per-event-loop semaphore capping in-flight async Gemini calls.
+
+    asyncio primitives are bound to the loop they first wait on, and both
+    Mangum and async_to_sync may run successive requests on different loops.
+    """
+    loop = asyncio.get_running_loop()
+    sem = _semaphores.get(loop)
+    if sem is None:
+        sem = asyncio.Semaphore(getattr(settings, "GEMINI_MAX_CONCURRENCY", 32))
+        _semaphores[loop] = sem
+    return sem
+
+
+def _text_config(system_prompt: str, max_tokens: int, temperature: float):
+    return genai.types.GenerateContentConfig(
+        system_instruction=system_prompt,
+        max_output_tokens=max_tokens,
+        temperature=temperature,
+    )
+
+
+def _image_contents(user_message: str, image_bytes: bytes, mime_type: str) -> list:
+    return [
+        genai.types.Part.from_bytes(data=image_bytes, mime_type=mime_type),
+        genai.types.Part.from_text(text=user_message),
+    ]
+
+
+def _audio_contents(audio_bytes: bytes, audio_mime: str, image_bytes: bytes | None, image_mime: str) -> list:
+    parts = [genai.types.Part.from_bytes(data=audio_bytes, mime_type=audio_mime)]
+    if image_bytes:
+        parts.append(genai.types.Part.from_bytes(data=image_bytes, mime_type=image_mime))
+    return parts
+
+
+def _tts_config(voice_name: str):
+    return genai.types.GenerateContentConfig(
+        response_modalities=["AUDIO"],
+        speech_config=genai.types.SpeechConfig(
+            voice_config=genai.types.VoiceConfig(
+                prebuilt_voice_config=genai.types.PrebuiltVoiceConfig(
+                    voice_name=voice_name,
+                )
+            )
+        ),
+    )
+
+
+def _extract_audio(response) -> bytes:
+    return response.candidates[0].content.parts[0].inline_data.data
+
+
 def _extract_text(response) -> str:
     """Safely extract text from a Gemini response, handling None / empty candidates."""
     try:
@@ -37,19 +104,73 @@ def _extract_text(response) -> str:
     return ""
 
 
-def ask_text(system_prompt: str, user_message: str, *, max_tokens: int = 4096, temperature: float = 0.4) -> str:
-    """Send a text-only prompt to Gemini and return the response."""
+def _generate(feature: str, model: str, contents, config):
+    """generate_content with retries/breaker, recording latency and token usage."""
     client = _get_client()
-    response = client.models.generate_content(
-        model=settings.GEMINI_MODEL,
-        contents=user_message,
-        config=genai.types.GenerateContentConfig(
-            system_instruction=system_prompt,
-            max_output_tokens=max_tokens,
-            temperature=temperature,
-        ),
+    started = time.monotonic()
+    try:
+        response = call(model, lambda: client.models.generate_content(
+            model=model,
+            contents=contents,
+            config=config,
+        ), kind=feature)
+    except Exception:
+        record_call(feature, model, time.monotonic() - started, error=True)
+        raise
+    record_call(feature, model, time.monotonic() - started, usage=getattr(response, "usage_metadata", None))
+    return response
+
+
+async def _agenerate(feature: str, model: str, contents, config):
+    """Async _generate, bounded by the per-loop concurrency semaphore."""
+    client = _get_client()
+    started = time.monotonic()
+    try:
+        async with _get_semaphore():
+            response = await acall(model, lambda: client.aio.models.generate_content(
+                model=model,
+                contents=contents,
+                config=config,
+            ), kind=feature)
+    except Exception:
+        record_call(feature, model, time.monotonic() - started, error=True)
+        raise
+    record_call(feature, model, time.monotonic() - started, usage=getattr(response, "usage_metadata", None))
+    return response
+
+
+def ask_text(
+    system_prompt: str,
+    user_message: str,
+    *,
+    max_tokens: int = 4096,
+    temperature: float = 0.4,
+    use_cache: bool = True,
+    feature: str = "ask_text",
+) -> str:
+    """
+    Send a text-only prompt to Gemini and return the response.
+
+    Identical prompts are served from the response cache; pass use_cache=False
+    to force a fresh completion.
+    """
+    cache = get_response_cache() if use_cache else None
+    key = None
+    if cache is not None:
+        key = make_key(settings.GEMINI_MODEL, system_prompt, user_message, max_tokens, temperature)
+        cached = cache.get(key)
+        if cached is not None:
+            record_call(feature, settings.GEMINI_MODEL, 0, cached=True)
+            return cached
+
+    response = _generate(
+        feature, settings.GEMINI_MODEL, user_message,
+        _text_config(system_prompt, max_tokens, temperature),
     )
-    return _extract_text(response)
+    text = _extract_text(response)
+    if cache is not None and text:
+        cache.set(key, text)
+    return text
 
 
 def ask_with_image(
@@ -60,20 +181,13 @@ def ask_with_image(
     *,
     max_tokens: int = 2048,
     temperature: float = 0.3,
+    feature: str = "ask_with_image",
 ) -> str:
     """Send an image + text prompt to Gemini and return the response."""
-    client = _get_client()
-    image_part = genai.types.Part.from_bytes(data=image_bytes, mime_type=mime_type)
-    text_part = genai.types.Part.from_text(text=user_message)
-
-    response = client.models.generate_content(
-        model=settings.GEMINI_MODEL,
-        contents=[image_part, text_part],
-        config=genai.types.GenerateContentConfig(
-            system_instruction=system_prompt,
-            max_output_tokens=max_tokens,
-            temperature=temperature,
-        ),
+    response = _generate(
+        feature, settings.GEMINI_MODEL,
+        _image_contents(user_message, image_bytes, mime_type),
+        _text_config(system_prompt, max_tokens, temperature),
     )
     return _extract_text(response)
 
@@ -87,44 +201,179 @@ def ask_with_audio(
     *,
     max_tokens: int = 2048,
     temperature: float = 0.4,
+    feature: str = "ask_with_audio",
 ) -> str:
     """Send audio (+ optional image) to Gemini and return a text response."""
-    client = _get_client()
-    parts = [genai.types.Part.from_bytes(data=audio_bytes, mime_type=audio_mime)]
-    if image_bytes:
-        parts.append(genai.types.Part.from_bytes(data=image_bytes, mime_type=image_mime))
-
-    response = client.models.generate_content(
-        model=settings.GEMINI_MODEL,
-        contents=parts,
-        config=genai.types.GenerateContentConfig(
-            system_instruction=system_prompt,
-            max_output_tokens=max_tokens,
-            temperature=temperature,
-        ),
+    response = _generate(
+        feature, settings.GEMINI_MODEL,
+        _audio_contents(audio_bytes, audio_mime, image_bytes, image_mime),
+        _text_config(system_prompt, max_tokens, temperature),
     )
     return _extract_text(response)
 
 
-def text_to_speech(text: str, voice_name: str = "Kore") -> bytes:
+def text_to_speech(text: str, voice_name: str = "Kore", *, feature: str = "text_to_speech") -> bytes:
     """Convert text to speech using Gemini TTS. Returns raw PCM audio (24 kHz, 16-bit LE)."""
-    client = _get_client()
-    response = client.models.generate_content(
-        model=GEMINI_TTS_MODEL,
-        contents=text,
-        config=genai.types.GenerateContentConfig(
-            response_modalities=["AUDIO"],
-            speech_config=genai.types.SpeechConfig(
-                voice_config=genai.types.VoiceConfig(
-                    prebuilt_voice_config=genai.types.PrebuiltVoiceConfig(
-                        voice_name=voice_name,
-                    )
-                )
-            ),
-        ),
+    response = _generate(feature, GEMINI_TTS_MODEL, text, _tts_config(voice_name))
+    return _extract_audio(response)
+
+
+# ── Async variants (client.aio), bounded by GEMINI_MAX_CONCURRENCY ────────
+
+async def aask_text(
+    system_prompt: str,
+    user_message: str,
+    *,
+    max_tokens: int = 4096,
+    temperature: float = 0.4,
+    use_cache: bool = True,
+    feature: str = "ask_text",
+) -> str:
+    """Async counterpart of ask_text; shares the same response cache."""
+    cache = get_response_cache() if use_cache else None
+    key = None
+    if cache is not None:
+        key = make_key(settings.GEMINI_MODEL, system_prompt, user_message, max_tokens, temperature)
+        cached = await cache.aget(key)
+        if cached is not None:
+            record_call(feature, settings.GEMINI_MODEL, 0, cached=True)
+            return cached
+
+    response = await _agenerate(
+        feature, settings.GEMINI_MODEL, user_message,
+        _text_config(system_prompt, max_tokens, temperature),
     )
-    data = response.candidates[0].content.parts[0].inline_data.data
-    return data
+    text = _extract_text(response)
+    if cache is not None and text:
+        await cache.aset(key, text)
+    return text
+
+
+async def aask_with_image(
+    system_prompt: str,
+    user_message: str,
+    image_bytes: bytes,
+    mime_type: str = "image/jpeg",
+    *,
+    max_tokens: int = 2048,
+    temperature: float = 0.3,
+    feature: str = "ask_with_image",
+) -> str:
+    """Async counterpart of ask_with_image."""
+    response = await _agenerate(
+        feature, settings.GEMINI_MODEL,
+        _image_contents(user_message, image_bytes, mime_type),
+        _text_config(system_prompt, max_tokens, temperature),
+    )
+    return _extract_text(response)
+
+
+async def aask_with_audio(
+    system_prompt: str,
+    audio_bytes: bytes,
+    audio_mime: str = "audio/webm",
+    image_bytes: bytes | None = None,
+    image_mime: str = "image/jpeg",
+    *,
+    max_tokens: int = 2048,
+    temperature: float = 0.4,
+    feature: str = "ask_with_audio",
+) -> str:
+    """Async counterpart of ask_with_audio."""
+    response = await _agenerate(
+        feature, settings.GEMINI_MODEL,
+        _audio_contents(audio_bytes, audio_mime, image_bytes, image_mime),
+        _text_config(system_prompt, max_tokens, temperature),
+    )
+    return _extract_text(response)
+
+
+async def atext_to_speech(text: str, voice_name: str = "Kore", *, feature: str = "text_to_speech") -> bytes:
+    """Async counterpart of text_to_speech."""
+    response = await _agenerate(feature, GEMINI_TTS_MODEL, text, _tts_config(voice_name))
+    return _extract_audio(response)
+
+
+# ── Streaming (generate_content_stream) ──────────────────────────────────
+
+async def _astream(feature: str, model: str, contents, config):
+    client = _get_client()
+    started = time.monotonic()
+    usage = None
+    try:
+        async with _get_semaphore():
+            # Only opening the stream is retried; a reply cut off mid-stream is
+            # surfaced to the caller rather than replayed from the start.
+            stream = await acall(model, lambda: client.aio.models.generate_content_stream(
+                model=model,
+                contents=contents,
+                config=config,
+            ), kind=f"{feature}:stream_open")
+            async for chunk in stream:
+                # Cumulative usage arrives with the chunks; the last one wins.
+                usage = getattr(chunk, "usage_metadata", None) or usage
+                text = _extract_text(chunk)
+                if text:
+                    yield text
+    except Exception:
+        record_call(feature, model, time.monotonic() - started, error=True)
+        raise
+    record_call(feature, model, time.monotonic() - started, usage=usage)
+
+
+async def astream_text(
+    system_prompt: str,
+    user_message: str,
+    *,
+    max_tokens: int = 4096,
+    temperature: float = 0.4,
+    use_cache: bool = True,
+    feature: str = "stream_text",
+):
+    """
+    Async generator yielding the reply to a text prompt as it is generated.
+
+    A cached reply is yielded as a single chunk; a freshly streamed reply is
+    cached once the stream completes.
+    """
+    cache = get_response_cache() if use_cache else None
+    key = None
+    if cache is not None:
+        key = make_key(settings.GEMINI_MODEL, system_prompt, user_message, max_tokens, temperature)
+        cached = await cache.aget(key)
+        if cached is not None:
+            record_call(feature, settings.GEMINI_MODEL, 0, cached=True)
+            yield cached
+            return
+
+    chunks = []
+    async for text in _astream(
+        feature, settings.GEMINI_MODEL, user_message, _text_config(system_prompt, max_tokens, temperature),
+    ):
+        chunks.append(text)
+        yield text
+    if cache is not None and chunks:
+        await cache.aset(key, "".join(chunks))
+
+
+async def astream_with_image(
+    system_prompt: str,
+    user_message: str,
+    image_bytes: bytes,
+    mime_type: str = "image/jpeg",
+    *,
+    max_tokens: int = 2048,
+    temperature: float = 0.3,
+    feature: str = "stream_with_image",
+):
+    """Async generator yielding the reply to an image + text prompt as it is generated."""
+    async for text in _astream(
+        feature,
+        settings.GEMINI_MODEL,
+        _image_contents(user_message, image_bytes, mime_type),
+        _text_config(system_prompt, max_tokens, temperature),
+    ):
+        yield text
 
 
 def create_ephemeral_token() -> dict:
@@ -0,0 +1,280 @@
+"""
+Resilience layer for Gemini calls: retries, hedging and a circuit breaker.
+
+- Transient failures (429 / 5xx / timeouts / connection resets) are retried
+  with capped exponential backoff and full jitter, so concurrent callers
+  don't retry in lock-step.
+- Async calls can be hedged: if the first attempt is still running after
+  the recent p-th percentile latency for the same model and kind of call
+  (e.g. a 512-token chat reply vs a 4096-token yield report vs opening a
+  stream), a second identical request is sent and whichever finishes first
+  wins. Retries are never hedged, so an attempt sends at most two requests.
+- A per-model circuit breaker opens after GEMINI_BREAKER_FAILURES
+  consecutive failed calls (a call fails once all its retries have; the
+  attempts are not counted separately) and fast-fails with
+  CircuitOpenError until a cool-down passes, then lets a single probe
+  call, with its retries, through (half-open). Cached answers are still served while
+  it is open because the response cache is consulted before any call.
+  A probe that is cancelled or rejected with a 4xx frees the slot without
+  closing the breaker, so the next call probes again.
+
+Tuning lives in settings.GEMINI_RETRY_* / GEMINI_HEDGE_* / GEMINI_BREAKER_*;
+resilience_state() returns breaker and latency state for monitoring.
+"""
+import asyncio
+import logging
+import random
+import threading
+import time
+
+import httpx
+from django.conf import settings
+from google.genai import errors as genai_errors
+
+from apps.latency import LatencyWindow
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling Gemini while the circuit breaker is open."""
+
+
+def is_retryable(exc: BaseException) -> bool:
+    if isinstance(exc, genai_errors.APIError):
+        return exc.code in RETRYABLE_STATUS_CODES
+    return isinstance(exc, (httpx.TimeoutException, httpx.TransportError, ConnectionError, TimeoutError))
+
+
+def _setting(name: str, default):
+    return getattr(settings, name, default)
+
+
+class CircuitBreaker:
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.total_failures = 0
+        self.total_rejections = 0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                self._probe_in_flight = False
+            if self.state == self.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            self.total_rejections += 1
+            return False
+
+    def release_probe(self) -> None:
+        """End a half-open probe that gave no verdict (cancelled, or a 4xx) so another can be sent."""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def is_open(self) -> bool:
+        with self._lock:
+            return self.state == self.OPEN
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self.state != self.CLOSED:
+                logger.info("Gemini circuit %s closed", self.name)
+            self.state = self.CLOSED
+            self.consecutive_failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.total_failures += 1
+            self.consecutive_failures += 1
+            if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    logger.warning("Gemini circuit %s opened after %d failures", self.name, self.consecutive_failures)
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+                self._probe_in_flight = False
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "state": self.state,
+                "consecutive_failures": self.consecutive_failures,
+                "total_failures": self.total_failures,
+                "total_rejections": self.total_rejections,
+                "open_for_s": round(time.monotonic() - self.opened_at, 1) if self.state != self.CLOSED else 0,
+            }
+
+
+_breakers: dict[str, CircuitBreaker] = {}
+_latencies: dict[tuple[str, str], LatencyWindow] = {}
+_registry_lock = threading.Lock()
+
+
+def get_breaker(name: str) -> CircuitBreaker:
+    with _registry_lock:
+        breaker = _breakers.get(name)
+        if breaker is None:
+            breaker = CircuitBreaker(
+                name,
+                failure_threshold=_setting("GEMINI_BREAKER_FAILURES", 5),
+                reset_timeout=_setting("GEMINI_BREAKER_RESET_S", 30.0),
+            )
+            _breakers[name] = breaker
+        return breaker
+
+
+def _latency(name: str, kind: str) -> LatencyWindow:
+    with _registry_lock:
+        window = _latencies.get((name, kind))
+        if window is None:
+            window = _latencies[(name, kind)] = LatencyWindow()
+        return window
+
+
+def _backoff(attempt: int) -> float:
+    base = _setting("GEMINI_RETRY_BASE_DELAY_S", 0.5)
+    cap = _setting("GEMINI_RETRY_MAX_DELAY_S", 8.0)
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def _retry_or_fail(breaker: CircuitBreaker, name: str, exc: Exception, attempt: int, attempts: int) -> float:
+    """Delay before retrying a failed attempt; re-raises when the call as a whole has failed."""
+    if not is_retryable(exc):
+        # A bad request says nothing about upstream health.
+        breaker.release_probe()
+        raise exc
+    if attempt == attempts - 1:
+        breaker.record_failure()
+        raise exc
+    delay = _backoff(attempt)
+    logger.warning("Gemini %s attempt %d failed (%s); retrying in %.2fs", name, attempt + 1, exc, delay)
+    return delay
+
+
+def _check_still_closed(breaker: CircuitBreaker, name: str, exc: Exception) -> None:
+    # Other calls opened the breaker during our backoff: stop retrying.
+    if breaker.is_open():
+        raise CircuitOpenError(f"Gemini circuit {name} opened while retrying") from exc
+
+
+def call(name: str, fn, kind: str = ""):
+    """Run fn() with breaker protection and retries (sync); kind groups latency samples."""
+    breaker = get_breaker(name)
+    if not breaker.allow():
+        raise CircuitOpenError(f"Gemini circuit {name} is open")
+    attempts = _setting("GEMINI_RETRY_ATTEMPTS", 3)
+    try:
+        for attempt in range(attempts):
+            started = time.monotonic()
+            try:
+                result = fn()
+            except Exception as exc:
+                time.sleep(_retry_or_fail(breaker, name, exc, attempt, attempts))
+                _check_still_closed(breaker, name, exc)
+                continue
+            breaker.record_success()
+            _latency(name, kind).add(time.monotonic() - started)
+            return result
+    except Exception:
+        raise
+    except BaseException:
+        breaker.release_probe()
+        raise
+
+
+async def _hedged(name: str, kind: str, factory, hedge: bool = True):
+    """Await factory(); if it outlives the hedge threshold, race a second attempt."""
+    threshold = None
+    if hedge and _setting("GEMINI_HEDGE_ENABLED", False):
+        threshold = _latency(name, kind).percentile(_setting("GEMINI_HEDGE_PERCENTILE", 95))
+    if threshold is None:
+        return await factory()
+
+    first = asyncio.ensure_future(factory())
+    pending = {first}
+    try:
+        done, pending = await asyncio.wait(pending, timeout=threshold)
+        if done:
+            return first.result()
+
+        logger.info(
+            "Gemini %s %s exceeded p%s (%.2fs); sending hedged request",
+            name, kind, _setting("GEMINI_HEDGE_PERCENTILE", 95), threshold,
+        )
+        pending.add(asyncio.ensure_future(factory()))
+        error = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        # Also reached when the caller is cancelled (e.g. an SSE client
+        # disconnected) while waiting on the first attempt alone.
+        for task in pending:
+            task.cancel()
+
+
+async def acall(name: str, factory, kind: str = ""):
+    """Async counterpart of call(); factory() must return a fresh awaitable per attempt."""
+    breaker = get_breaker(name)
+    if not breaker.allow():
+        raise CircuitOpenError(f"Gemini circuit {name} is open")
+    attempts = _setting("GEMINI_RETRY_ATTEMPTS", 3)
+    try:
+        for attempt in range(attempts):
+            started = time.monotonic()
+            try:
+                result = await _hedged(name, kind, factory, hedge=attempt == 0)
+            except Exception as exc:
+                await asyncio.sleep(_retry_or_fail(breaker, name, exc, attempt, attempts))
+                _check_still_closed(breaker, name, exc)
+                continue
+            breaker.record_success()
+            _latency(name, kind).add(time.monotonic() - started)
+            return result
+    except Exception:
+        raise
+    except BaseException:
+        # Cancelled (e.g. the client disconnected), also during a backoff: no verdict either way.
+        breaker.release_probe()
+        raise
+
+
+def resilience_state() -> dict:
+    with _registry_lock:
+        names = set(_breakers) | {name for name, _ in _latencies}
+        windows = dict(_latencies)
+    state = {}
+    for name in sorted(names):
+        state[name] = {
+            "breaker": get_breaker(name).snapshot(),
+            "latency": {
+                kind or "default": {
+                    "samples": len(window),
+                    "p50_s": window.percentile(50),
+                    "p95_s": window.percentile(95),
+                }
+                for (model, kind), window in sorted(windows.items())
+                if model == name
+            },
+        }
+    return state
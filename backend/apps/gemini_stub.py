@@ -0,0 +1,195 @@
+"""
+Offline stand-in for the google-genai client, for load tests and local dev.
+
+Selected with GEMINI_BACKEND=stub. It implements the subset of the SDK that
+gemini_client uses (models / aio.models generate_content and
+generate_content_stream, auth_tokens.create) and returns real
+google.genai.types objects, so everything above the client — caching,
+retries, usage accounting, views — runs unchanged.
+
+Behaviour is tuned through settings:
+  GEMINI_STUB_LATENCY_MS     median response latency (log-normal)
+  GEMINI_STUB_LATENCY_SIGMA  spread of the log-normal distribution
+  GEMINI_STUB_ERROR_RATE     fraction of calls failing with a 503
+Replies are canned: structured JSON for the disease prompt, a silent-ish
+PCM tone for TTS, and deterministic filler text for everything else.
+forecast_text() stands in for the Open-Meteo forecast the yield prompt
+includes, so offline runs make no network calls at all.
+"""
+import asyncio
+import datetime
+import hashlib
+import json
+import math
+import random
+import struct
+import time
+
+from django.conf import settings
+from google.genai import errors as genai_errors
+from google.genai import types
+
+DISEASE_REPLY = {
+    "plant": "Wheat",
+    "disease": "Leaf rust (Puccinia triticina)",
+    "severity": "moderate",
+    "diagnosis": "Orange-brown pustules scattered on the upper leaf surface are typical of leaf rust.",
+    "treatment": "Spray propiconazole 25 EC at 0.1% and repeat after 15 days if pustules continue to appear.",
+    "prevention": "Sow rust-resistant varieties, avoid late sowing and excess nitrogen.",
+    "recommended_products": ["Tilt (propiconazole)", "Folicur (tebuconazole)"],
+}
+
+_FILLER_WORDS = (
+    "farmers should check soil moisture before irrigation and apply fertiliser in split doses "
+    "according to the crop stage while watching the weather forecast for rain and heat"
+).split()
+
+
+def _latency_s() -> float:
+    median_ms = getattr(settings, "GEMINI_STUB_LATENCY_MS", 1500)
+    sigma = getattr(settings, "GEMINI_STUB_LATENCY_SIGMA", 0.4)
+    return random.lognormvariate(math.log(max(median_ms, 1)), sigma) / 1000
+
+
+def _maybe_fail():
+    if random.random() < getattr(settings, "GEMINI_STUB_ERROR_RATE", 0.0):
+        raise genai_errors.ServerError(503, {"error": {"code": 503, "message": "stub: model overloaded", "status": "UNAVAILABLE"}})
+
+
+def _prompt_text(contents) -> str:
+    if isinstance(contents, str):
+        return contents
+    texts = []
+    for part in contents or []:
+        text = getattr(part, "text", None)
+        if text:
+            texts.append(text)
+    return " ".join(texts)
+
+
+def _approx_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+def _filler(seed: str, max_tokens: int | None) -> str:
+    rng = random.Random(hashlib.sha256(seed.encode("utf-8")).hexdigest())
+    words = min(150, (max_tokens or 4096) // 2)
+    sentences = []
+    while sum(len(s.split()) for s in sentences) < words:
+        n = rng.randint(8, 16)
+        sentence = " ".join(rng.choice(_FILLER_WORDS) for _ in range(n))
+        sentences.append(sentence.capitalize() + ".")
+    return " ".join(sentences)
+
+
+def _fake_pcm(text: str, sample_rate: int = 24000) -> bytes:
+    """Quiet 240 Hz tone, ~60 ms per character like real speech pacing."""
+    n = min(len(text) * sample_rate * 60 // 1000, sample_rate * 60)
+    period = sample_rate // 240
+    cycle = b"".join(struct.pack("<h", int(800 * math.sin(2 * math.pi * i / period))) for i in range(period))
+    return (cycle * (n // period + 1))[:n * 2]
+
+
+def forecast_text(lat: float, lon: float) -> str:
+    """Canned 7-day forecast in gemini_yield._fetch_forecast's format."""
+    today = datetime.date.today()
+    lines = ["Current temperature: 28.4 C, wind speed: 9.7 km/h.", "7-day forecast:"]
+    for i in range(7):
+        lines.append(f"  {today + datetime.timedelta(days=i)}: {21 + i % 3}-{32 + i % 4} C, rain {(i % 3) * 1.5} mm")
+    return "\n".join(lines)
+
+
+def _reply_text(contents, config) -> str:
+    system = getattr(config, "system_instruction", None) or ""
+    if "plant pathologist" in system:
+        return json.dumps(DISEASE_REPLY)
+    return _filler(system + _prompt_text(contents), getattr(config, "max_output_tokens", None))
+
+
+def _usage(prompt: str, reply: str):
+    return types.GenerateContentResponseUsageMetadata(
+        prompt_token_count=_approx_tokens(prompt),
+        candidates_token_count=_approx_tokens(reply),
+    )
+
+
+def _text_response(text: str, usage=None):
+    return types.GenerateContentResponse(
+        candidates=[types.Candidate(content=types.Content(role="model", parts=[types.Part(text=text)]))],
+        usage_metadata=usage,
+    )
+
+
+def _respond(contents, config):
+    prompt = (getattr(config, "system_instruction", None) or "") + _prompt_text(contents)
+    if "AUDIO" in (getattr(config, "response_modalities", None) or []):
+        pcm = _fake_pcm(_prompt_text(contents))
+        return types.GenerateContentResponse(
+            candidates=[types.Candidate(content=types.Content(parts=[
+                types.Part(inline_data=types.Blob(data=pcm, mime_type="audio/pcm")),
+            ]))],
+            usage_metadata=_usage(prompt, ""),
+        )
+    reply = _reply_text(contents, config)
+    return _text_response(reply, _usage(prompt, reply))
+
+
+class _StubModels:
+    def generate_content(self, *, model, contents, config=None):
+        time.sleep(_latency_s())
+        _maybe_fail()
+        return _respond(contents, config)
+
+    def generate_content_stream(self, *, model, contents, config=None):
+        return iter(_stream_chunks(contents, config))
+
+
+def _stream_chunks(contents, config) -> list:
+    prompt = (getattr(config, "system_instruction", None) or "") + _prompt_text(contents)
+    reply = _reply_text(contents, config)
+    words = reply.split(" ")
+    chunks = [" ".join(words[i:i + 8]) + (" " if i + 8 < len(words) else "") for i in range(0, len(words), 8)]
+    responses = [_text_response(chunk) for chunk in chunks]
+    if responses:
+        responses[-1].usage_metadata = _usage(prompt, reply)
+    return responses
+
+
+class _AsyncStubModels:
+    async def generate_content(self, *, model, contents, config=None):
+        await asyncio.sleep(_latency_s())
+        _maybe_fail()
+        return _respond(contents, config)
+
+    async def generate_content_stream(self, *, model, contents, config=None):
+        # Time to first chunk is ~30% of a full reply; the rest trickles in.
+        total = _latency_s()
+        await asyncio.sleep(total * 0.3)
+        _maybe_fail()
+        chunks = _stream_chunks(contents, config)
+
+        async def iterate():
+            for chunk in chunks:
+                yield chunk
+                await asyncio.sleep(total * 0.7 / max(len(chunks), 1))
+
+        return iterate()
+
+
+class _StubAuthTokens:
+    def create(self, *, config=None):
+        return types.AuthToken(name="auth_tokens/stub-" + hashlib.sha1(str(time.time()).encode()).hexdigest()[:12])
+
+
+class _StubAio:
+    def __init__(self):
+        self.models = _AsyncStubModels()
+
+
+class StubClient:
+    """Drop-in for genai.Client as used by apps.gemini_client."""
+
+    def __init__(self):
+        self.models = _StubModels()
+        self.aio = _StubAio()
+        self.auth_tokens = _StubAuthTokens()
@@ -0,0 +1,118 @@
+"""
+Shared outbound HTTP client (Open-Meteo, Nominatim, ...).
+
+Module-level requests.get opens a new TCP + TLS connection per call. This
+keeps one Session per process whose adapter pools keep-alive connections
+per host, retries idempotent requests on connection errors and 429/5xx
+(honouring Retry-After) with exponential backoff, and applies default
+connect/read timeouts. Read timeouts are not retried, so a hung upstream
+costs one read timeout rather than one per attempt. Per-host request counts, errors and latency
+percentiles are available from http_stats().
+"""
+import logging
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from apps.latency import LatencyWindow
+
+logger = logging.getLogger(__name__)
+
+USER_AGENT = 'Agromod/1.0'
+
+_session = None
+_session_lock = threading.Lock()
+_stats_lock = threading.Lock()
+_stats = {}
+
+
+def _build_session():
+    retries = getattr(settings, 'HTTP_RETRIES', 2)
+    retry = Retry(
+        total=retries,
+        connect=retries,
+        read=0,
+        status=retries,
+        backoff_factor=getattr(settings, 'HTTP_RETRY_BACKOFF_S', 0.3),
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset({'GET', 'HEAD'}),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=getattr(settings, 'HTTP_POOL_HOSTS', 10),
+        pool_maxsize=getattr(settings, 'HTTP_POOL_MAXSIZE', 20),
+        max_retries=retry,
+    )
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers['User-Agent'] = USER_AGENT
+    return session
+
+
+def get_session():
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = _build_session()
+    return _session
+
+
+def _default_timeout():
+    return (
+        getattr(settings, 'HTTP_CONNECT_TIMEOUT_S', 3.05),
+        getattr(settings, 'HTTP_READ_TIMEOUT_S', 10),
+    )
+
+
+def _record(host, seconds, error):
+    with _stats_lock:
+        stats = _stats.get(host)
+        if stats is None:
+            stats = _stats[host] = {'requests': 0, 'errors': 0, 'latency': LatencyWindow()}
+        stats['requests'] += 1
+        if error:
+            stats['errors'] += 1
+    if not error:
+        stats['latency'].add(seconds)
+
+
+def request(method, url, *, timeout=None, **kwargs):
+    """session.request() with default timeouts and per-host metrics."""
+    host = urlsplit(url).netloc
+    started = time.monotonic()
+    try:
+        resp = get_session().request(method, url, timeout=timeout or _default_timeout(), **kwargs)
+    except requests.RequestException:
+        _record(host, time.monotonic() - started, error=True)
+        raise
+    _record(host, time.monotonic() - started, error=resp.status_code >= 400)
+    return resp
+
+
+def get(url, *, params=None, **kwargs):
+    return request('GET', url, params=params, **kwargs)
+
+
+def http_stats():
+    """{host: {requests, errors, p50_ms, p95_ms}} since process start."""
+    with _stats_lock:
+        snapshot = {host: dict(stats) for host, stats in _stats.items()}
+    result = {}
+    for host, stats in sorted(snapshot.items()):
+        window = stats['latency']
+        p50, p95 = window.percentile(50), window.percentile(95)
+        result[host] = {
+            'requests': stats['requests'],
+            'errors': stats['errors'],
+            'p50_ms': round(p50 * 1000) if p50 is not None else None,
+            'p95_ms': round(p95 * 1000) if p95 is not None else None,
+        }
+    return result
@@ -0,0 +1,94 @@
+"""
+Image preprocessing before Gemini vision calls.
+
+Phone-camera uploads are often 3-5 MB, 12 MP, rotated via EXIF, while the
+model works on much smaller tiles. prepare_image() applies the EXIF
+orientation, downsizes so the longest side is at most
+settings.GEMINI_IMAGE_MAX_SIDE and re-encodes as JPEG or WebP, cutting
+request payloads (and upload time to Gemini) by an order of magnitude.
+"""
+import io
+import logging
+import threading
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+logger = logging.getLogger(__name__)
+
+_FORMATS = {"jpeg": ("JPEG", "image/jpeg"), "webp": ("WEBP", "image/webp")}
+
+_stats_lock = threading.Lock()
+_stats = {"images": 0, "bytes_in": 0, "bytes_out": 0, "failures": 0}
+
+
+def _record(bytes_in: int, bytes_out: int, failed: bool = False) -> None:
+    with _stats_lock:
+        _stats["images"] += 1
+        _stats["bytes_in"] += bytes_in
+        _stats["bytes_out"] += bytes_out
+        if failed:
+            _stats["failures"] += 1
+
+
+def image_prep_stats() -> dict:
+    """Process-wide totals since start-up."""
+    with _stats_lock:
+        data = dict(_stats)
+    data["bytes_saved"] = data["bytes_in"] - data["bytes_out"]
+    return data
+
+
+def _flatten(img: Image.Image) -> Image.Image:
+    """Drop alpha (composited on white) and palette modes; JPEG needs plain RGB."""
+    if img.mode in ("RGBA", "LA") or (img.mode == "P" and "transparency" in img.info):
+        img = img.convert("RGBA")
+        background = Image.new("RGB", img.size, (255, 255, 255))
+        background.paste(img, mask=img.getchannel("A"))
+        return background
+    if img.mode != "RGB":
+        return img.convert("RGB")
+    return img
+
+
+def prepare_image(image_bytes: bytes, mime_type: str = "image/jpeg") -> tuple[bytes, str]:
+    """
+    Return (image_bytes, mime_type) ready to send to Gemini.
+
+    Falls back to the original bytes if the image cannot be decoded or if
+    re-encoding would not make it smaller.
+    """
+    max_side = getattr(settings, "GEMINI_IMAGE_MAX_SIDE", 1024)
+    quality = getattr(settings, "GEMINI_IMAGE_QUALITY", 85)
+    pil_format, out_mime = _FORMATS.get(getattr(settings, "GEMINI_IMAGE_FORMAT", "jpeg"), _FORMATS["jpeg"])
+
+    try:
+        with Image.open(io.BytesIO(image_bytes)) as img:
+            img = ImageOps.exif_transpose(img)
+            original_size = img.size
+            img.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+            img = _flatten(img)
+            buf = io.BytesIO()
+            img.save(buf, format=pil_format, quality=quality, optimize=True)
+    except (UnidentifiedImageError, OSError, ValueError):
+        logger.warning("Could not preprocess image; sending original", exc_info=True)
+        _record(len(image_bytes), len(image_bytes), failed=True)
+        return image_bytes, mime_type
+
+    out = buf.getvalue()
+    if len(out) >= len(image_bytes) and img.size == original_size:
+        _record(len(image_bytes), len(image_bytes))
+        return image_bytes, mime_type
+
+    _record(len(image_bytes), len(out))
+    logger.info(
+        "Prepared image %sx%s -> %sx%s, %d -> %d bytes",
+        *original_size, *img.size, len(image_bytes), len(out),
+    )
+    return out, out_mime
+
+
+async def aprepare_image(image_bytes: bytes, mime_type: str = "image/jpeg") -> tuple[bytes, str]:
+    """prepare_image() on a worker thread, keeping decode/resize off the event loop."""
+    return await sync_to_async(prepare_image, thread_sensitive=False)(image_bytes, mime_type)
@@ -0,0 +1,26 @@
+"""Rolling latency samples with percentiles, shared by the Gemini and HTTP clients."""
+import threading
+from collections import deque
+
+
+class LatencyWindow:
+    """Recent successful-call latencies (seconds); percentiles need at least 20 samples."""
+
+    def __init__(self, size: int = 200):
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, pct: float) -> float | None:
+        with self._lock:
+            samples = sorted(self._samples)
+        if len(samples) < 20:
+            return None
+        index = min(len(samples) - 1, int(len(samples) * pct / 100))
+        return samples[index]
+
+    def __len__(self):
+        return len(self._samples)
@@ -0,0 +1,10 @@
+from django.contrib import admin
+
+from .models import LLMUsageBucket
+
+
+@admin.register(LLMUsageBucket)
+class LLMUsageBucketAdmin(admin.ModelAdmin):
+    list_display = ("hour", "feature", "model", "calls", "errors", "cache_hits", "prompt_tokens", "output_tokens")
+    list_filter = ("feature", "model")
+    readonly_fields = ("latency_histogram", "token_histogram")
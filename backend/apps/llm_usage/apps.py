@@ -0,0 +1,17 @@
+from django.apps import AppConfig
+
+
+class LlmUsageConfig(AppConfig):
+    default_auto_field = "django.db.models.BigAutoField"
+    name = "apps.llm_usage"
+    verbose_name = "LLM Usage"
+
+    def ready(self):
+        import atexit
+
+        from django.core.signals import request_finished
+
+        from .recorder import flush_at_exit, flush_if_due
+
+        request_finished.connect(flush_if_due, dispatch_uid="llm_usage_flush")
+        atexit.register(flush_at_exit)
@@ -0,0 +1,73 @@
+import datetime
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from ...models import LATENCY_BUCKETS_MS, TOKEN_BUCKETS, LLMUsageBucket
+from ...recorder import merge_histogram, flush, histogram_percentile
+
+
+def _fmt(value, bounds, suffix=""):
+    if value is None:
+        return f">{bounds[-1]}{suffix}"
+    return f"{value}{suffix}"
+
+
+class Command(BaseCommand):
+    help = 'Print p50/p95/p99 latency and token usage per Gemini feature.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=int, default=24 * 7, help='Look-back window (default: 7 days).')
+        parser.add_argument('--feature', default='', help='Only report this feature.')
+
+    def handle(self, *args, **options):
+        flush()
+        since = timezone.now() - datetime.timedelta(hours=options['hours'])
+        qs = LLMUsageBucket.objects.filter(hour__gte=since)
+        if options['feature']:
+            qs = qs.filter(feature=options['feature'])
+
+        rows = {}
+        for bucket in qs:
+            row = rows.setdefault(bucket.feature, {
+                'calls': 0, 'errors': 0, 'cache_hits': 0,
+                'prompt': 0, 'output': 0, 'thinking': 0, 'latency_ms': 0,
+                'latency_hist': [], 'token_hist': [], 'models': set(),
+            })
+            row['calls'] += bucket.calls
+            row['errors'] += bucket.errors
+            row['cache_hits'] += bucket.cache_hits
+            row['prompt'] += bucket.prompt_tokens
+            row['output'] += bucket.output_tokens
+            row['thinking'] += bucket.thinking_tokens
+            row['latency_ms'] += bucket.latency_ms_total
+            row['latency_hist'] = merge_histogram(row['latency_hist'], bucket.latency_histogram)
+            row['token_hist'] = merge_histogram(row['token_hist'], bucket.token_histogram)
+            row['models'].add(bucket.model)
+
+        if not rows:
+            self.stdout.write('No LLM usage recorded in this window.')
+            return
+
+        header = (
+            f"{'feature':<22}{'calls':>7}{'err':>5}{'cached':>8}"
+            f"{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+            f"{'avg in':>8}{'avg out':>8}{'p95 tok':>9}{'total tok':>11}"
+        )
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+        ordered = sorted(rows.items(), key=lambda kv: kv[1]['prompt'] + kv[1]['output'] + kv[1]['thinking'], reverse=True)
+        for feature, row in ordered:
+            calls = row['calls'] or 1
+            total_tokens = row['prompt'] + row['output'] + row['thinking']
+            p50, p95, p99 = (histogram_percentile(row['latency_hist'], LATENCY_BUCKETS_MS, p) for p in (50, 95, 99))
+            tok95 = histogram_percentile(row['token_hist'], TOKEN_BUCKETS, 95)
+            self.stdout.write(
+                f"{feature[:21]:<22}{row['calls']:>7}{row['errors']:>5}{row['cache_hits']:>8}"
+                f"{_fmt(p50, LATENCY_BUCKETS_MS):>9}{_fmt(p95, LATENCY_BUCKETS_MS):>9}{_fmt(p99, LATENCY_BUCKETS_MS):>9}"
+                f"{row['prompt'] // calls:>8}{(row['output'] + row['thinking']) // calls:>8}"
+                f"{_fmt(tok95, TOKEN_BUCKETS):>9}{total_tokens:>11}"
+            )
+        self.stdout.write(self.style.SUCCESS(
+            'Percentiles are histogram upper bounds; "avg out" includes thinking tokens.'
+        ))
@@ -0,0 +1,39 @@
+# Generated by Django 4.2.30 on 2026-10-17 19:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LLMUsageBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('feature', models.CharField(max_length=50)),
+                ('model', models.CharField(max_length=100)),
+                ('hour', models.DateTimeField()),
+                ('calls', models.PositiveIntegerField(default=0)),
+                ('errors', models.PositiveIntegerField(default=0)),
+                ('cache_hits', models.PositiveIntegerField(default=0)),
+                ('prompt_tokens', models.BigIntegerField(default=0)),
+                ('output_tokens', models.BigIntegerField(default=0)),
+                ('thinking_tokens', models.BigIntegerField(default=0)),
+                ('latency_ms_total', models.BigIntegerField(default=0)),
+                ('latency_histogram', models.JSONField(default=list)),
+                ('token_histogram', models.JSONField(default=list)),
+            ],
+            options={
+                'ordering': ['-hour', 'feature'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='llmusagebucket',
+            constraint=models.UniqueConstraint(fields=('feature', 'model', 'hour'), name='unique_llm_usage_bucket'),
+        ),
+    ]
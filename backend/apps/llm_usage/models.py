@@ -0,0 +1,36 @@
+from django.db import models
+
+# Upper bounds of the histogram buckets; the last bucket is open-ended.
+LATENCY_BUCKETS_MS = [100, 250, 500, 750, 1000, 1500, 2000, 3000, 4000, 6000, 8000, 12000, 20000, 30000, 60000]
+TOKEN_BUCKETS = [64, 128, 256, 512, 768, 1024, 1536, 2048, 3072, 4096, 6144, 8192, 16384]
+
+
+class LLMUsageBucket(models.Model):
+    """
+    Hourly aggregate of Gemini calls per (feature, model).
+
+    Latency and total-token distributions are kept as fixed-bucket
+    histograms so percentiles can be estimated over any time range
+    without storing one row per call.
+    """
+    feature = models.CharField(max_length=50)
+    model = models.CharField(max_length=100)
+    hour = models.DateTimeField()
+    calls = models.PositiveIntegerField(default=0)
+    errors = models.PositiveIntegerField(default=0)
+    cache_hits = models.PositiveIntegerField(default=0)
+    prompt_tokens = models.BigIntegerField(default=0)
+    output_tokens = models.BigIntegerField(default=0)
+    thinking_tokens = models.BigIntegerField(default=0)
+    latency_ms_total = models.BigIntegerField(default=0)
+    latency_histogram = models.JSONField(default=list)
+    token_histogram = models.JSONField(default=list)
+
+    class Meta:
+        ordering = ["-hour", "feature"]
+        constraints = [
+            models.UniqueConstraint(fields=["feature", "model", "hour"], name="unique_llm_usage_bucket"),
+        ]
+
+    def __str__(self):
+        return f"{self.feature} / {self.model} @ {self.hour:%Y-%m-%d %H:00}"
@@ -0,0 +1,201 @@
+"""
+In-process buffer of Gemini call metrics, flushed into LLMUsageBucket.
+
+record_call() only touches memory, so it is safe to call from async code
+and adds no database round trip to the request. Buffered aggregates are
+written when a request finishes (request_finished runs on a sync thread)
+once LLM_USAGE_FLUSH_S seconds have passed or LLM_USAGE_FLUSH_CALLS calls
+are buffered, at process exit (atexit, which covers management commands),
+or explicitly via flush(). Lambda containers are frozen rather than exited,
+so there LLM_USAGE_FLUSH_S defaults to 0: every request flushes.
+
+On PostgreSQL each bucket is flushed with one INSERT ... ON CONFLICT DO
+UPDATE that adds the buffered counts (histograms included) in SQL, so
+concurrent flushes into the same hour's row don't serialise on a
+SELECT ... FOR UPDATE held across round trips. Other databases (local
+development) read, merge and save the row under a lock.
+"""
+import bisect
+import json
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import LATENCY_BUCKETS_MS, TOKEN_BUCKETS, LLMUsageBucket
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_buffer = {}
+_buffered_calls = 0
+_last_flush = time.monotonic()
+
+
+class _Aggregate:
+    __slots__ = (
+        "calls", "errors", "cache_hits", "prompt_tokens", "output_tokens",
+        "thinking_tokens", "latency_ms_total", "latency_histogram", "token_histogram",
+    )
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.cache_hits = 0
+        self.prompt_tokens = 0
+        self.output_tokens = 0
+        self.thinking_tokens = 0
+        self.latency_ms_total = 0
+        self.latency_histogram = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.token_histogram = [0] * (len(TOKEN_BUCKETS) + 1)
+
+
+def merge_histogram(stored: list, extra: list) -> list:
+    merged = list(stored) + [0] * (len(extra) - len(stored))
+    for i, count in enumerate(extra):
+        merged[i] += count
+    return merged
+
+
+def record_call(feature: str, model: str, latency_s: float, *, usage=None, error: bool = False, cached: bool = False) -> None:
+    """
+    Record one Gemini call. `usage` is the response's usage_metadata;
+    cache hits are only counted, not added to latency/token distributions.
+    """
+    global _buffered_calls
+    key = (feature[:50], model[:100], timezone.now().replace(minute=0, second=0, microsecond=0))
+    with _lock:
+        _buffered_calls += 1
+        agg = _buffer.get(key)
+        if agg is None:
+            agg = _buffer[key] = _Aggregate()
+        if cached:
+            agg.cache_hits += 1
+            return
+
+        agg.calls += 1
+        if error:
+            agg.errors += 1
+        latency_ms = int(latency_s * 1000)
+        agg.latency_ms_total += latency_ms
+        agg.latency_histogram[bisect.bisect_left(LATENCY_BUCKETS_MS, latency_ms)] += 1
+
+        if usage is not None:
+            prompt = getattr(usage, "prompt_token_count", None) or 0
+            output = getattr(usage, "candidates_token_count", None) or 0
+            thinking = getattr(usage, "thoughts_token_count", None) or 0
+            agg.prompt_tokens += prompt
+            agg.output_tokens += output
+            agg.thinking_tokens += thinking
+            agg.token_histogram[bisect.bisect_left(TOKEN_BUCKETS, prompt + output + thinking)] += 1
+
+
+_COUNTERS = (
+    "calls", "errors", "cache_hits", "prompt_tokens", "output_tokens", "thinking_tokens", "latency_ms_total",
+)
+_HISTOGRAMS = ("latency_histogram", "token_histogram")
+
+
+def _upsert_sql() -> str:
+    table = connection.ops.quote_name(LLMUsageBucket._meta.db_table)
+    columns = ("feature", "model", "hour") + _COUNTERS + _HISTOGRAMS
+    updates = [f"{name} = {table}.{name} + excluded.{name}" for name in _COUNTERS]
+    # Element-wise sum of two JSON arrays of counts (they may differ in length).
+    updates += [
+        f"""{name} = COALESCE((
+            SELECT jsonb_agg(COALESCE(a.n::bigint, 0) + COALESCE(b.n::bigint, 0) ORDER BY COALESCE(a.i, b.i))
+            FROM jsonb_array_elements_text({table}.{name}) WITH ORDINALITY AS a(n, i)
+            FULL JOIN jsonb_array_elements_text(excluded.{name}) WITH ORDINALITY AS b(n, i) ON a.i = b.i
+        ), '[]'::jsonb)"""
+        for name in _HISTOGRAMS
+    ]
+    placeholders = ["%s"] * (3 + len(_COUNTERS)) + ["%s::jsonb"] * len(_HISTOGRAMS)
+    return f"""
+        INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(placeholders)})
+        ON CONFLICT (feature, model, hour) DO UPDATE SET {', '.join(updates)}
+    """
+
+
+def _add_upsert(feature: str, model: str, hour, agg: _Aggregate) -> None:
+    params = [feature, model, hour]
+    params += [getattr(agg, name) for name in _COUNTERS]
+    params += [json.dumps(getattr(agg, name)) for name in _HISTOGRAMS]
+    with connection.cursor() as cursor:
+        cursor.execute(_upsert_sql(), params)
+
+
+def _add_locked(feature: str, model: str, hour, agg: _Aggregate) -> None:
+    with transaction.atomic():
+        bucket, _ = LLMUsageBucket.objects.select_for_update().get_or_create(
+            feature=feature, model=model, hour=hour,
+        )
+        for name in _COUNTERS:
+            setattr(bucket, name, getattr(bucket, name) + getattr(agg, name))
+        for name in _HISTOGRAMS:
+            setattr(bucket, name, merge_histogram(getattr(bucket, name), getattr(agg, name)))
+        bucket.save()
+
+
+def flush() -> int:
+    """Write buffered aggregates to the database. Returns the number of buckets written."""
+    global _buffer, _buffered_calls, _last_flush
+    with _lock:
+        pending, _buffer = _buffer, {}
+        _buffered_calls = 0
+        _last_flush = time.monotonic()
+
+    add = _add_upsert if connection.vendor == "postgresql" else _add_locked
+    written = 0
+    for (feature, model, hour), agg in pending.items():
+        try:
+            add(feature, model, hour, agg)
+            written += 1
+        except Exception:
+            logger.exception("Could not write LLM usage bucket for %s/%s", feature, model)
+    return written
+
+
+def flush_if_due(**kwargs) -> None:
+    """request_finished receiver."""
+    if not _buffer:
+        return
+    if (
+        time.monotonic() - _last_flush < getattr(settings, "LLM_USAGE_FLUSH_S", 60)
+        and _buffered_calls < getattr(settings, "LLM_USAGE_FLUSH_CALLS", 500)
+    ):
+        return
+    try:
+        flush()
+    except Exception:
+        logger.exception("LLM usage flush failed")
+
+
+def flush_at_exit() -> None:
+    """atexit hook so short-lived processes don't drop their buffer."""
+    if not _buffer:
+        return
+    try:
+        flush()
+    except Exception:
+        logger.exception("LLM usage flush at exit failed")
+
+
+def histogram_percentile(histogram: list, bounds: list, pct: float):
+    """
+    Estimated percentile from a bucketed histogram: the upper bound of the
+    bucket holding the pct-th observation (None for the open-ended last
+    bucket, or when empty).
+    """
+    total = sum(histogram)
+    if not total:
+        return None
+    rank = total * pct / 100
+    seen = 0
+    for i, count in enumerate(histogram):
+        seen += count
+        if seen >= rank and count:
+            return bounds[i] if i < len(bounds) else None
+    return None
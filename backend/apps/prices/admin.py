@@ -1,5 +1,8 @@
 from django.contrib import admin
-from .models import MandiPrice, HistoricalPrice
+from .models import HistoricalPrice, LatestMandiPrice, MandiMarket, MandiPrice, PriceSummary
 
 admin.site.register(MandiPrice)
 admin.site.register(HistoricalPrice)
+admin.site.register(PriceSummary)
+admin.site.register(LatestMandiPrice)
+admin.site.register(MandiMarket)
@@ -0,0 +1,170 @@
+"""
+Streaming bulk export of HistoricalPrice as CSV, NDJSON or Parquet.
+
+Rows come from a server-side cursor (QuerySet.iterator on PostgreSQL) in
+chunks of PRICE_EXPORT_CHUNK_ROWS and each chunk is encoded and yielded as
+bytes before the next is read, optionally through a gzip stream, so memory
+stays flat however many rows are exported. Used by PriceExportView and
+manage.py export_prices.
+
+Under ASGI Django 4.2 collects a sync streaming body into a list before
+sending it, so the view wraps the stream in aiter_export(), which pulls one
+chunk at a time through sync_to_async instead.
+"""
+import csv
+import io
+import json
+import zlib
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from .models import HistoricalPrice
+
+FIELDS = ('commodity', 'state', 'centre', 'year', 'month', 'price', 'unit', 'source')
+FORMATS = {
+    'csv': ('text/csv; charset=utf-8', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+}
+
+
+class ExportError(Exception):
+    pass
+
+
+def filtered_prices(commodity=None, state=None, centre=None, years=None, monthly_only=False):
+    qs = HistoricalPrice.objects.all()
+    if commodity:
+        qs = qs.filter(commodity=commodity)
+    if state:
+        qs = qs.filter(state=state)
+    if centre:
+        qs = qs.filter(centre=centre)
+    if years:
+        qs = qs.filter(year__in=years)
+    if monthly_only:
+        qs = qs.filter(month__gt=0)
+    return qs.order_by('commodity', 'year', 'month', 'id')
+
+
+def _chunks(qs, size):
+    rows = qs.values_list(*FIELDS).iterator(chunk_size=size)
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _csv(chunks):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(FIELDS)
+    for chunk in chunks:
+        writer.writerows(chunk)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+def _ndjson(chunks):
+    for chunk in chunks:
+        yield ''.join(json.dumps(dict(zip(FIELDS, row))) + '\n' for row in chunk).encode()
+
+
+class _Sink(io.RawIOBase):
+    """Write-only file that hands back whatever was written since the last drain()."""
+
+    def __init__(self):
+        self.parts = []
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def drain(self):
+        data, self.parts = b''.join(self.parts), []
+        return data
+
+
+def _parquet(chunks):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ExportError('Parquet export needs pyarrow (pip install -r requirements-analytics.txt).')
+
+    schema = pa.schema([
+        ('commodity', pa.string()), ('state', pa.string()), ('centre', pa.string()),
+        ('year', pa.int32()), ('month', pa.int32()), ('price', pa.float64()),
+        ('unit', pa.string()), ('source', pa.string()),
+    ])
+
+    def generate():
+        sink = _Sink()
+        # One row group per chunk, flushed to the client as soon as it is written.
+        with pq.ParquetWriter(sink, schema, compression='snappy') as writer:
+            for chunk in chunks:
+                columns = list(zip(*chunk))
+                writer.write_table(pa.Table.from_arrays(
+                    [pa.array(values, type=field.type) for values, field in zip(columns, schema)], schema=schema,
+                ))
+                data = sink.drain()
+                if data:
+                    yield data
+        yield sink.drain()
+
+    return generate()
+
+
+def _gzip(stream):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for data in stream:
+        compressed = compressor.compress(data)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def export(fmt, qs, compress=False, chunk_rows=None):
+    """
+    Iterator of bytes encoding `qs` (see filtered_prices) in `fmt`.
+
+    Raises ExportError for an unknown format, or Parquet without pyarrow,
+    before any row is read.
+    """
+    if fmt not in FORMATS:
+        raise ExportError(f"Unknown format '{fmt}'; use one of: {', '.join(FORMATS)}.")
+    chunks = _chunks(qs, chunk_rows or getattr(settings, 'PRICE_EXPORT_CHUNK_ROWS', 5000))
+    stream = {'csv': _csv, 'ndjson': _ndjson, 'parquet': _parquet}[fmt](chunks)
+    return _gzip(stream) if compress else stream
+
+
+async def aiter_export(stream):
+    """
+    Async iterator over an export() stream for ASGI responses. Each chunk is
+    produced on the request's thread-sensitive worker, which owns the
+    server-side cursor, and sent before the next one is read.
+    """
+    step = sync_to_async(next, thread_sensitive=True)
+    while True:
+        data = await step(stream, None)
+        if data is None:
+            return
+        yield data
+
+
+def filename(fmt, compress=False):
+    return f'historical_prices.{FORMATS[fmt][1]}' + ('.gz' if compress else '')
@@ -0,0 +1,48 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ...export import FORMATS, ExportError, export, filtered_prices
+
+
+class Command(BaseCommand):
+    help = 'Stream HistoricalPrice rows to a CSV, NDJSON or Parquet file (or stdout) in constant memory.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', dest='fmt', choices=sorted(FORMATS), default='csv')
+        parser.add_argument('--output', '-o', default='-', help="File to write; '-' for stdout.")
+        parser.add_argument('--gzip', action='store_true', help='Gzip the output.')
+        parser.add_argument('--commodity')
+        parser.add_argument('--state')
+        parser.add_argument('--centre')
+        parser.add_argument('--year', type=int, action='append', help='Repeat for several years.')
+        parser.add_argument('--monthly', action='store_true', help='Only monthly rows (month > 0).')
+        parser.add_argument('--chunk-rows', type=int, help='Rows per cursor fetch (default PRICE_EXPORT_CHUNK_ROWS).')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        qs = filtered_prices(
+            options['commodity'], options['state'], options['centre'], options['year'], options['monthly'],
+        )
+        try:
+            stream = export(options['fmt'], qs, compress=options['gzip'], chunk_rows=options['chunk_rows'])
+        except ExportError as exc:
+            raise CommandError(str(exc))
+
+        to_stdout = options['output'] == '-'
+        out = sys.stdout.buffer if to_stdout else open(options['output'], 'wb')
+        written = 0
+        try:
+            for data in stream:
+                out.write(data)
+                written += len(data)
+        finally:
+            if to_stdout:
+                out.flush()
+            else:
+                out.close()
+        if not to_stdout:
+            self.stdout.write(self.style.SUCCESS(
+                f"{written} bytes written to {options['output']} ({time.monotonic() - started:.1f}s)."
+            ))
@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from ...ingest import TARGETS, LoadError, load
+from ...mandi import locate_markets
+from ...summary import refresh, touch_watermark
+
+
+class Command(BaseCommand):
+    help = (
+        'Load Agmarknet / GOI price dumps (CSV, CSV.gz or XLSX) into MandiPrice or HistoricalPrice '
+        'through PostgreSQL COPY and a staging-table merge.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='+', help='Files to load, in order (later rows win on duplicate keys).')
+        parser.add_argument('--table', choices=sorted(TARGETS), default='mandi')
+        parser.add_argument('--source', help='Source label for rows without a source column.')
+        parser.add_argument('--sheet', help='Worksheet name for .xlsx input (default: the first).')
+        parser.add_argument('--chunk-rows', type=int, default=5000, help='Parsed rows per COPY write.')
+        parser.add_argument('--progress-every', type=int, default=100000)
+        parser.add_argument(
+            '--skip-summary', action='store_true',
+            help='Do not refresh the price summary cube after a historical load.',
+        )
+
+    def handle(self, *args, **options):
+        def progress(rows, seconds):
+            rate = rows / seconds if seconds else 0
+            self.stdout.write(f'  {rows:,} rows parsed ({rate:,.0f} rows/s)')
+
+        try:
+            stats = load(
+                options['table'], options['paths'], source=options['source'], sheet=options['sheet'],
+                chunk_rows=options['chunk_rows'], progress=progress, progress_every=options['progress_every'],
+            )
+        except (LoadError, OSError) as exc:
+            raise CommandError(str(exc))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{stats['read']:,} rows read, {stats['rejected']:,} rejected, {stats['staged']:,} unique: "
+            f"{stats['inserted']:,} inserted, {stats['updated']:,} updated in {stats['seconds']}s "
+            f"(COPY {stats['copy_seconds']}s, {stats['rows_per_s']:,} rows/s)."
+        ))
+        if options['table'] == 'mandi':
+            located, missing = locate_markets()
+            self.stdout.write(
+                f"Latest prices: {stats['latest']:,} markets refreshed; "
+                f'{located} new markets located, {missing} not found in the gazetteer.'
+            )
+        if options['table'] == 'historical' and not options['skip_summary']:
+            slices, rows = refresh(changed_slices=stats['slices'])
+            self.stdout.write(f'Price summary: {slices} commodity-year slices refreshed ({rows} cube rows).')
+        elif options['table'] == 'historical' and (stats['inserted'] or stats['updated']):
+            touch_watermark()
@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from ...mandi import locate_markets, refresh_latest
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the latest price of every mandi market from MandiPrice and geocode new markets.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--retry-missing', action='store_true',
+            help='Geocode again markets the gazetteer could not place before (e.g. after importing more places).',
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        rows = refresh_latest()
+        located, missing = locate_markets(retry_missing=options['retry_missing'])
+        self.stdout.write(self.style.SUCCESS(
+            f'{rows} latest prices refreshed; {located} markets located, {missing} not found '
+            f'({time.monotonic() - started:.1f}s).'
+        ))
@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from ...summary import rebuild, refresh
+
+
+class Command(BaseCommand):
+    help = 'Fold newly ingested HistoricalPrice rows into the PriceSummary cube (run after each ingestion).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Rebuild every slice, e.g. after prices were corrected or deleted.')
+        parser.add_argument('--commodity', help='With --full, rebuild only this commodity.')
+        parser.add_argument('--year', type=int, help='With --full, rebuild only this year.')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        if options['full']:
+            slices, rows = rebuild(commodity=options['commodity'], year=options['year'])
+        else:
+            slices, rows = refresh()
+        self.stdout.write(self.style.SUCCESS(
+            f'{slices} commodity-year slices refreshed, {rows} cube rows written ({time.monotonic() - started:.1f}s).'
+        ))
@@ -0,0 +1,150 @@
+"""
+Live mandi rates on top of MandiPrice.
+
+MandiPrice grows by hundreds of thousands of rows a day, so the endpoints
+read LatestMandiPrice instead: one row per (commodity, state, market) with
+the latest and previous price. refresh_latest() rebuilds it in SQL, either
+for the markets touched by a load (called by the loader inside its
+transaction, a two-row index lookup per market) or for everything.
+Market coordinates for nearest-market lookups come from the offline
+gazetteer (locate_markets).
+"""
+import math
+import re
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from apps.weather import gazetteer
+from .models import LatestMandiPrice, MandiMarket, MandiPrice
+
+# Suffixes and notes that keep market names from matching gazetteer places.
+_MARKET_NOISE = re.compile(r'\(.*?\)|\b(apmc|mandi|f ?& ?v|grain market|vegetable market|market yard)\b', re.I)
+
+_COLUMNS = 'commodity, state, market, price, unit, date, previous_price, previous_date, updated_at'
+_UPSERT = """
+    ON CONFLICT (commodity, state, market) DO UPDATE SET
+        price = excluded.price, unit = excluded.unit, date = excluded.date,
+        previous_price = excluded.previous_price, previous_date = excluded.previous_date,
+        updated_at = excluded.updated_at
+"""
+
+
+def refresh_latest(cursor=None, changed_from=None):
+    """
+    Upsert LatestMandiPrice from MandiPrice. With changed_from (a table
+    with commodity, state and market columns, e.g. the loader's staging
+    table; PostgreSQL only) just those markets are recomputed, otherwise
+    all of them, and markets no longer in MandiPrice are deleted in the
+    same transaction. Returns rows written.
+    """
+    latest = connection.ops.quote_name(LatestMandiPrice._meta.db_table)
+    prices = connection.ops.quote_name(MandiPrice._meta.db_table)
+    prune = None
+    if changed_from:
+        sql = f"""
+            INSERT INTO {latest} ({_COLUMNS})
+            SELECT p.commodity, p.state, p.market, cur.price, cur.unit, cur.date, prev.price, prev.date, %s
+            FROM (SELECT DISTINCT commodity, state, market FROM {changed_from}) AS p
+            CROSS JOIN LATERAL (
+                SELECT m.price, m.unit, m.date FROM {prices} AS m
+                WHERE m.commodity = p.commodity AND m.market = p.market AND m.state = p.state
+                ORDER BY m.date DESC, m.id DESC LIMIT 1
+            ) AS cur
+            LEFT JOIN LATERAL (
+                SELECT m.price, m.date FROM {prices} AS m
+                WHERE m.commodity = p.commodity AND m.market = p.market AND m.state = p.state AND m.date < cur.date
+                ORDER BY m.date DESC, m.id DESC LIMIT 1
+            ) AS prev ON true
+            {_UPSERT}
+        """
+    else:
+        sql = f"""
+            WITH ranked AS (
+                SELECT commodity, state, market, price, unit, date,
+                       row_number() OVER (PARTITION BY commodity, state, market ORDER BY date DESC, id DESC) AS rn
+                FROM {prices}
+            )
+            INSERT INTO {latest} ({_COLUMNS})
+            SELECT cur.commodity, cur.state, cur.market, cur.price, cur.unit, cur.date, prev.price, prev.date, %s
+            FROM ranked AS cur
+            LEFT JOIN ranked AS prev
+                ON prev.commodity = cur.commodity AND prev.state = cur.state AND prev.market = cur.market AND prev.rn = 2
+            WHERE cur.rn = 1
+            {_UPSERT}
+        """
+        prune = f"""
+            DELETE FROM {latest} WHERE NOT EXISTS (
+                SELECT 1 FROM {prices} AS m
+                WHERE m.commodity = {latest}.commodity AND m.market = {latest}.market AND m.state = {latest}.state
+            )
+        """
+    if cursor is not None:
+        return _refresh(cursor, sql, prune)
+    with transaction.atomic(), connection.cursor() as cursor:
+        return _refresh(cursor, sql, prune)
+
+
+def _refresh(cursor, sql, prune):
+    if prune:
+        cursor.execute(prune)
+    cursor.execute(sql, [timezone.now()])
+    return cursor.rowcount
+
+
+def _geocode(market, state):
+    """(lat, lon) of the best gazetteer match for a market in its state, or None."""
+    query = ' '.join(_MARKET_NOISE.sub(' ', market).split())
+    wanted = gazetteer.normalize(state)
+    for place in gazetteer.search(query, limit=5):
+        if wanted and wanted in gazetteer.normalize(place['name']):
+            return place['lat'], place['lon']
+    return None
+
+
+def locate_markets(retry_missing=False):
+    """
+    Add a MandiMarket for every market in LatestMandiPrice that has none
+    (and, with retry_missing, retry those stored without coordinates).
+    Returns (located, not located).
+    """
+    known = dict(
+        ((name, state), lat is not None)
+        for name, state, lat in MandiMarket.objects.values_list('name', 'state', 'latitude')
+    )
+    pairs = set(LatestMandiPrice.objects.values_list('market', 'state').distinct().order_by())
+    todo = [p for p in pairs if p not in known or (retry_missing and not known[p])]
+    rows = []
+    for market, state in todo:
+        point = _geocode(market, state)
+        lat, lon = point if point else (None, None)
+        rows.append(MandiMarket(name=market, state=state, latitude=lat, longitude=lon))
+    MandiMarket.objects.bulk_create(
+        rows, batch_size=1000, update_conflicts=True,
+        unique_fields=['name', 'state'], update_fields=['latitude', 'longitude'],
+    )
+    located = sum(1 for row in rows if row.latitude is not None)
+    return located, len(rows) - located
+
+
+def _haversine_km(lat1, lon1, lat2, lon2):
+    dlat = math.radians(lat2 - lat1)
+    dlon = math.radians(lon2 - lon1)
+    a = math.sin(dlat / 2) ** 2 + math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(dlon / 2) ** 2
+    return 6371.0 * 2 * math.asin(math.sqrt(a))
+
+
+def nearest_markets(lat, lon, radius_km=100, limit=10):
+    """[(MandiMarket, distance_km)] within radius_km, nearest first; limit=None for all."""
+    dlat = radius_km / 111.0
+    dlon = radius_km / (111.0 * max(math.cos(math.radians(lat)), 0.01))
+    candidates = MandiMarket.objects.filter(
+        latitude__range=(lat - dlat, lat + dlat), longitude__range=(lon - dlon, lon + dlon),
+    )
+    found = []
+    for market in candidates:
+        distance = _haversine_km(lat, lon, market.latitude, market.longitude)
+        if distance <= radius_km:
+            found.append((market, distance))
+    found.sort(key=lambda item: item[1])
+    return found[:limit] if limit else found
@@ -0,0 +1,76 @@
+# Generated by Django 4.2.30 on 2026-10-17 23:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HistoricalPrice',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('commodity', models.CharField(db_index=True, max_length=100)),
+                ('state', models.CharField(db_index=True, default='All India', max_length=100)),
+                ('centre', models.CharField(db_index=True, default='', max_length=100)),
+                ('year', models.IntegerField(db_index=True)),
+                ('month', models.IntegerField(default=0)),
+                ('price', models.FloatField()),
+                ('unit', models.CharField(default='Rs/Quintal', max_length=30)),
+                ('source', models.CharField(default='GOI-2024', max_length=50)),
+            ],
+            options={
+                'db_table': 'prices_historicalprice',
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='MandiPrice',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('commodity', models.CharField(max_length=100)),
+                ('market', models.CharField(max_length=200)),
+                ('state', models.CharField(max_length=100)),
+                ('price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('unit', models.CharField(max_length=20)),
+                ('date', models.DateField()),
+                ('source', models.CharField(max_length=100)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'prices_mandiprice',
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='PriceSummaryWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_price_id', models.BigIntegerField(default=0)),
+                ('refreshed_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='PriceSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('commodity', models.CharField(max_length=100)),
+                ('state', models.CharField(max_length=100, null=True)),
+                ('centre', models.CharField(max_length=100, null=True)),
+                ('year', models.IntegerField()),
+                ('month', models.IntegerField(null=True)),
+                ('row_count', models.IntegerField()),
+                ('price_sum', models.FloatField()),
+                ('price_min', models.FloatField()),
+                ('price_max', models.FloatField()),
+            ],
+            options={
+                'indexes': [models.Index(fields=['commodity', 'year'], name='price_summary_slice'), models.Index(fields=['state', 'centre', 'month', 'commodity', 'year'], name='price_summary_lookup')],
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.30 on 2026-10-17 23:20
+
+from django.db import migrations
+
+INDEX = 'prices_historicalprice_keyset'
+
+
+def create_index(apps, schema_editor):
+    # prices_historicalprice is owned by the ingestion job (managed=False),
+    # so the PriceDataView keyset index is only added where the table exists.
+    connection = schema_editor.connection
+    if connection.vendor != 'postgresql' or 'prices_historicalprice' not in connection.introspection.table_names():
+        return
+    schema_editor.execute(
+        f'CREATE INDEX IF NOT EXISTS {INDEX} ON prices_historicalprice (commodity, year, month, id)'
+    )
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(f'DROP INDEX IF EXISTS {INDEX}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('prices', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
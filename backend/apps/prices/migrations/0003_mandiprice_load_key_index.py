@@ -0,0 +1,32 @@
+# Generated by Django 4.2.30 on 2026-10-17 23:40
+
+from django.db import migrations
+
+INDEX = 'prices_mandiprice_load_key'
+
+
+def create_index(apps, schema_editor):
+    # Key of the load_prices merge; prices_mandiprice is owned outside the
+    # app (managed=False), so this only runs where the table exists.
+    connection = schema_editor.connection
+    if connection.vendor != 'postgresql' or 'prices_mandiprice' not in connection.introspection.table_names():
+        return
+    schema_editor.execute(
+        f'CREATE INDEX IF NOT EXISTS {INDEX} ON prices_mandiprice (commodity, market, state, date)'
+    )
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(f'DROP INDEX IF EXISTS {INDEX}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('prices', '0002_historicalprice_keyset_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 4.2.30 on 2026-10-17 23:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('prices', '0003_mandiprice_load_key_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LatestMandiPrice',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('commodity', models.CharField(max_length=100)),
+                ('state', models.CharField(max_length=100)),
+                ('market', models.CharField(max_length=200)),
+                ('price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('unit', models.CharField(max_length=20)),
+                ('date', models.DateField()),
+                ('previous_price', models.DecimalField(decimal_places=2, max_digits=10, null=True)),
+                ('previous_date', models.DateField(null=True)),
+                ('updated_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='MandiMarket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=200)),
+                ('state', models.CharField(max_length=100)),
+                ('latitude', models.FloatField(blank=True, null=True)),
+                ('longitude', models.FloatField(blank=True, null=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['latitude', 'longitude'], name='mandi_market_location')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='mandimarket',
+            constraint=models.UniqueConstraint(fields=('name', 'state'), name='mandi_market_unique'),
+        ),
+        migrations.AddIndex(
+            model_name='latestmandiprice',
+            index=models.Index(fields=['state', 'market'], name='latest_mandi_price_market'),
+        ),
+        migrations.AddConstraint(
+            model_name='latestmandiprice',
+            constraint=models.UniqueConstraint(fields=('commodity', 'state', 'market'), name='latest_mandi_price_per_market'),
+        ),
+    ]
@@ -29,3 +29,83 @@ class HistoricalPrice(models.Model):
     class Meta:
         db_table = 'prices_historicalprice'
         managed = False
+
+
+class PriceSummary(models.Model):
+    """
+    Aggregate cube over HistoricalPrice, rebuilt by apps.prices.summary.
+
+    One row per commodity x state x centre x year x month, plus roll-ups in
+    which state, centre and/or month are NULL meaning "all" (the month
+    roll-up covers monthly rows only, month > 0). Averages are
+    price_sum / row_count.
+    """
+
+    commodity = models.CharField(max_length=100)
+    state = models.CharField(max_length=100, null=True)
+    centre = models.CharField(max_length=100, null=True)
+    year = models.IntegerField()
+    month = models.IntegerField(null=True)
+    row_count = models.IntegerField()
+    price_sum = models.FloatField()
+    price_min = models.FloatField()
+    price_max = models.FloatField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['commodity', 'year'], name='price_summary_slice'),
+            models.Index(fields=['state', 'centre', 'month', 'commodity', 'year'], name='price_summary_lookup'),
+        ]
+
+
+class PriceSummaryWatermark(models.Model):
+    """Highest HistoricalPrice id already folded into PriceSummary (single row)."""
+
+    last_price_id = models.BigIntegerField(default=0)
+    refreshed_at = models.DateTimeField(auto_now=True)
+
+
+class LatestMandiPrice(models.Model):
+    """
+    Most recent MandiPrice per (commodity, state, market), with the one
+    before it; maintained by apps.prices.mandi.refresh_latest after each
+    load so the live-rate endpoints never scan MandiPrice.
+    """
+
+    commodity = models.CharField(max_length=100)
+    state = models.CharField(max_length=100)
+    market = models.CharField(max_length=200)
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+    unit = models.CharField(max_length=20)
+    date = models.DateField()
+    previous_price = models.DecimalField(max_digits=10, decimal_places=2, null=True)
+    previous_date = models.DateField(null=True)
+    updated_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['commodity', 'state', 'market'], name='latest_mandi_price_per_market'),
+        ]
+        indexes = [
+            models.Index(fields=['state', 'market'], name='latest_mandi_price_market'),
+        ]
+
+
+class MandiMarket(models.Model):
+    """Location of a mandi, geocoded from the offline gazetteer (null if no confident match)."""
+
+    name = models.CharField(max_length=200)
+    state = models.CharField(max_length=100)
+    latitude = models.FloatField(null=True, blank=True)
+    longitude = models.FloatField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['name', 'state'], name='mandi_market_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['latitude', 'longitude'], name='mandi_market_location'),
+        ]
+
+    def __str__(self):
+        return f'{self.name}, {self.state}'
@@ -0,0 +1,272 @@
+"""
+In-memory columnar copy of HistoricalPrice for the prices endpoints.
+
+HistoricalPrice is reference data that only changes when the ingestion job
+runs, so each process loads it once into NumPy columns: commodity, state,
+centre and unit are dictionary-encoded (codes follow the sorted labels, so
+ordering by code is ordering by name), and rows are sorted by commodity,
+year, month, id, which makes a commodity filter a searchsorted slice and
+the PriceDataView keyset order free. Other filters and the per-year
+averages are vectorised masks and bincounts.
+
+warm_store() loads it at process start (lambda_handler runs it during the
+Lambda init phase, asgi.py in a background thread); otherwise get_store()
+loads on first use. Rows are streamed in chunks straight into compact
+arrays, so peak memory is the arrays plus one chunk. The store reloads when
+the summary watermark changes (every load_prices / refresh_price_summary
+run saves it), checked at most every PRICE_STORE_CHECK_S seconds. After
+changing HistoricalPrice any other way, run refresh_price_summary.
+get_store() returns None when disabled or the table can't be read, and the
+views then query the database as before.
+"""
+import bisect
+import logging
+import threading
+import time
+from array import array
+from itertools import islice
+
+import numpy as np
+from django.conf import settings
+from django.db import connections
+
+from .models import HistoricalPrice, PriceSummaryWatermark
+
+logger = logging.getLogger(__name__)
+
+_store = None
+_checked_at = None
+_lock = threading.Lock()
+
+
+LOAD_CHUNK_ROWS = 10000
+
+
+class _Encoder:
+    """Incremental dictionary encoding of a string column."""
+
+    def __init__(self):
+        self.codes = {}
+        self.values = array('i')
+
+    def extend(self, labels):
+        codes = self.codes
+        self.values.extend(codes.setdefault(label, len(codes)) for label in labels)
+
+    def finish(self):
+        """(sorted labels, int32 codes, {label: code}); codes follow the sorted labels."""
+        labels = sorted(self.codes)
+        remap = np.empty(len(labels), dtype=np.int32)
+        for code, label in enumerate(labels):
+            remap[self.codes[label]] = code
+        return labels, remap[np.frombuffer(self.values, dtype=np.int32)], {label: code for code, label in enumerate(labels)}
+
+
+class _Columns:
+    """Column builder fed row chunks (id, commodity, state, centre, year, month, price, unit)."""
+
+    def __init__(self):
+        self.id = array('q')
+        self.year = array('i')
+        self.month = array('i')
+        self.price = array('d')
+        self.commodity, self.state, self.centre, self.unit = _Encoder(), _Encoder(), _Encoder(), _Encoder()
+
+    def extend(self, rows):
+        ids, commodities, states, centres, years, months, prices, units = zip(*rows)
+        self.id.extend(ids)
+        self.commodity.extend(commodities)
+        self.state.extend(states)
+        self.centre.extend(centres)
+        self.year.extend(years)
+        self.month.extend(months)
+        self.price.extend(prices)
+        self.unit.extend(units)
+
+
+class PriceStore:
+    def __init__(self, columns, version):
+        self.version = version
+        self.commodity_labels, commodity, self.commodity_codes = columns.commodity.finish()
+        self.state_labels, state, self.state_codes = columns.state.finish()
+        self.centre_labels, centre, self.centre_codes = columns.centre.finish()
+        self.unit_labels, unit, _ = columns.unit.finish()
+        year = np.frombuffer(columns.year, dtype=np.int32)
+        month = np.frombuffer(columns.month, dtype=np.int32)
+        ids = np.frombuffer(columns.id, dtype=np.int64)
+        order = np.lexsort((ids, month, year, commodity))
+
+        self.id = ids[order]
+        self.commodity = commodity[order]
+        self.state = state[order]
+        self.centre = centre[order]
+        self.unit = unit[order]
+        self.year = year[order]
+        self.month = month[order]
+        self.price = np.frombuffer(columns.price, dtype=np.float64)[order]
+        # Row range of each commodity code.
+        self.bounds = np.searchsorted(self.commodity, np.arange(len(self.commodity_labels) + 1))
+
+    def __len__(self):
+        return len(self.price)
+
+    @classmethod
+    def load(cls, version=None):
+        started = time.monotonic()
+        rows = (
+            HistoricalPrice.objects
+            .values_list('id', 'commodity', 'state', 'centre', 'year', 'month', 'price', 'unit')
+            .order_by()
+            .iterator(chunk_size=LOAD_CHUNK_ROWS)
+        )
+        columns = _Columns()
+        while chunk := list(islice(rows, LOAD_CHUNK_ROWS)):
+            columns.extend(chunk)
+        store = cls(columns, version)
+        logger.info('Price store loaded %d rows in %.2fs', len(store), time.monotonic() - started)
+        return store
+
+    # Lists
+
+    def commodities(self):
+        return list(self.commodity_labels)
+
+    def states(self):
+        return list(self.state_labels)
+
+    def centres(self, state=None):
+        codes = self.centre
+        if state:
+            code = self.state_codes.get(state)
+            if code is None:
+                return []
+            codes = codes[self.state == code]
+        return [self.centre_labels[c] for c in np.unique(codes) if self.centre_labels[c]]
+
+    def years(self):
+        return np.unique(self.year).tolist()
+
+    # Queries
+
+    def _select(self, commodity=None, state=None, centre=None, years=None, monthly_only=False, after=None):
+        """Sorted row indices matching the filters, past the (commodity, year, month, id) key `after`."""
+        lo, hi = 0, len(self)
+        if commodity:
+            code = self.commodity_codes.get(commodity)
+            if code is None:
+                return np.empty(0, dtype=np.intp)
+            lo, hi = self.bounds[code], self.bounds[code + 1]
+        if after is not None:
+            # Rows are sorted by the key: skip earlier commodities through
+            # the code bounds, then find the first later (year, month, id)
+            # within the cursor's own commodity.
+            after_commodity, after_year, after_month, after_id = after
+            code = bisect.bisect_left(self.commodity_labels, after_commodity)
+            start = self.bounds[code]
+            if code < len(self.commodity_labels) and self.commodity_labels[code] == after_commodity:
+                rows = slice(start, self.bounds[code + 1])
+                year, month, ids = self.year[rows], self.month[rows], self.id[rows]
+                later = (year > after_year) | ((year == after_year) & (
+                    (month > after_month) | ((month == after_month) & (ids > after_id))
+                ))
+                start += int(np.argmax(later)) if later.any() else len(later)
+            lo = max(lo, start)
+            hi = max(hi, lo)
+        mask = np.ones(hi - lo, dtype=bool)
+        for value, codes, column in ((state, self.state_codes, self.state), (centre, self.centre_codes, self.centre)):
+            if value:
+                code = codes.get(value)
+                if code is None:
+                    return np.empty(0, dtype=np.intp)
+                mask &= column[lo:hi] == code
+        if years:
+            mask &= np.isin(self.year[lo:hi], years)
+        if monthly_only:
+            mask &= self.month[lo:hi] > 0
+        return lo + np.flatnonzero(mask)
+
+    def rows(self, commodity=None, state=None, centre=None, years=None, monthly_only=False, after=None, limit=2000):
+        """
+        One PriceDataView page ordered by (commodity, year, month, id), starting
+        after the key `after`. Returns (rows, key of the last row or None when
+        there are no more).
+        """
+        idx = self._select(commodity, state, centre, years, monthly_only, after)[:limit + 1]
+        more = len(idx) > limit
+        idx = idx[:limit]
+        rows = [
+            {
+                'commodity': self.commodity_labels[c],
+                'state': self.state_labels[s],
+                'centre': self.centre_labels[ce],
+                'year': y,
+                'month': m,
+                'price': p,
+                'unit': self.unit_labels[u],
+            }
+            for c, s, ce, y, m, p, u in zip(
+                self.commodity[idx].tolist(), self.state[idx].tolist(), self.centre[idx].tolist(),
+                self.year[idx].tolist(), self.month[idx].tolist(), self.price[idx].tolist(),
+                self.unit[idx].tolist(),
+            )
+        ]
+        last = None
+        if more:
+            last = rows[-1]['commodity'], rows[-1]['year'], rows[-1]['month'], int(self.id[idx[-1]])
+        return rows, last
+
+    def summary(self, commodity=None, state=None, centre=None):
+        """Average monthly price per commodity and year (PriceSummaryView)."""
+        idx = self._select(commodity, state, centre, monthly_only=True)
+        if not len(idx):
+            return []
+        # One int64 key per (commodity, year); sorting keys sorts by name, then year.
+        keys, inverse = np.unique(self.commodity[idx].astype(np.int64) * 10000 + self.year[idx], return_inverse=True)
+        totals = np.bincount(inverse, weights=self.price[idx])
+        counts = np.bincount(inverse)
+        return [
+            {'commodity': self.commodity_labels[key // 10000], 'year': key % 10000, 'avg_price': total / n}
+            for key, total, n in zip(keys.tolist(), totals.tolist(), counts.tolist())
+        ]
+
+
+def _table_version():
+    # One-row lookup: the watermark is saved after every load, including in-place updates.
+    return PriceSummaryWatermark.objects.filter(pk=1).values_list('refreshed_at', flat=True).first()
+
+
+def get_store():
+    """The process-wide PriceStore, (re)loaded as needed, or None."""
+    global _store, _checked_at
+    if not getattr(settings, 'PRICE_STORE_ENABLED', True):
+        return None
+    check_s = getattr(settings, 'PRICE_STORE_CHECK_S', 60)
+    if _checked_at is not None and time.monotonic() - _checked_at < check_s:
+        return _store
+    with _lock:
+        if _checked_at is None or time.monotonic() - _checked_at >= check_s:
+            try:
+                version = _table_version()
+                if _store is None or _store.version != version:
+                    _store = PriceStore.load(version)
+            except Exception:
+                logger.exception('Price store load failed; querying the database')
+            _checked_at = time.monotonic()
+    return _store
+
+
+def warm_store():
+    """Load the store now (process start) instead of on the first prices request."""
+    if not getattr(settings, 'PRICE_STORE_PRELOAD', True):
+        return
+    try:
+        get_store()
+    finally:
+        # Runs outside any request, so nothing else closes this thread's connection.
+        connections.close_all()
+
+
+def reset_store():
+    global _store, _checked_at
+    with _lock:
+        _store, _checked_at = None, None
@@ -0,0 +1,124 @@
+"""
+Incremental refresh of the PriceSummary cube.
+
+HistoricalPrice is loaded by the ingestion job (manage.py load_prices),
+mostly append-only. refresh() looks for rows above the stored id
+watermark, adds any slices the loader reports as updated in place, and
+rebuilds only those (commodity, year) slices: one
+GROUP BY at full grain, roll-ups computed in Python, then the slice is
+replaced in a single transaction. rebuild() redoes every slice, for
+corrections and deletes the watermark can't see.
+"""
+import logging
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count, ExpressionWrapper, F, FloatField, Max, Min, Q, Sum
+
+from .models import HistoricalPrice, PriceSummary, PriceSummaryWatermark
+
+logger = logging.getLogger(__name__)
+
+
+def _cube_rows(commodity, year):
+    """PriceSummary rows (unsaved) for one (commodity, year) slice."""
+    cells = defaultdict(lambda: [0, 0.0, None, None])
+    grain = (
+        HistoricalPrice.objects.filter(commodity=commodity, year=year)
+        .values('state', 'centre', 'month')
+        .annotate(n=Count('id'), total=Sum('price'), low=Min('price'), high=Max('price'))
+        .order_by()
+    )
+    for row in grain:
+        state, centre, month = row['state'], row['centre'], row['month']
+        months = (month, None) if month > 0 else (month,)
+        for key in {(s, c, m) for s in (state, None) for c in (centre, None) for m in months}:
+            cell = cells[key]
+            cell[0] += row['n']
+            cell[1] += row['total']
+            cell[2] = row['low'] if cell[2] is None else min(cell[2], row['low'])
+            cell[3] = row['high'] if cell[3] is None else max(cell[3], row['high'])
+    return [
+        PriceSummary(
+            commodity=commodity, state=state, centre=centre, year=year, month=month,
+            row_count=n, price_sum=total, price_min=low, price_max=high,
+        )
+        for (state, centre, month), (n, total, low, high) in cells.items()
+    ]
+
+
+def refresh_slices(slices):
+    """Rebuild the cube for an iterable of (commodity, year). Returns cube rows written."""
+    written = 0
+    for commodity, year in sorted(set(slices)):
+        rows = _cube_rows(commodity, year)
+        with transaction.atomic():
+            PriceSummary.objects.filter(commodity=commodity, year=year).delete()
+            PriceSummary.objects.bulk_create(rows, batch_size=1000)
+        written += len(rows)
+    return written
+
+
+def refresh(changed_slices=()):
+    """
+    Fold HistoricalPrice rows added since the last refresh, plus any
+    (commodity, year) slices known to have changed in place (e.g. rows
+    updated by a load), into the cube. Returns (slices, rows).
+    """
+    watermark, _ = PriceSummaryWatermark.objects.get_or_create(pk=1)
+    latest = HistoricalPrice.objects.aggregate(latest=Max('id'))['latest'] or 0
+    if latest <= watermark.last_price_id and not changed_slices:
+        return 0, 0
+    slices = set(changed_slices) | set(
+        HistoricalPrice.objects.filter(id__gt=watermark.last_price_id, id__lte=latest)
+        .values_list('commodity', 'year').distinct().order_by()
+    )
+    written = refresh_slices(slices)
+    watermark.last_price_id = max(latest, watermark.last_price_id)
+    watermark.save()
+    logger.info('Price summary: %d slices, %d cube rows refreshed', len(slices), written)
+    return len(slices), written
+
+
+def touch_watermark():
+    """Mark HistoricalPrice as changed without refreshing the cube (reloads the price store)."""
+    watermark, _ = PriceSummaryWatermark.objects.get_or_create(pk=1)
+    watermark.save(update_fields=['refreshed_at'])
+
+
+def rebuild(commodity=None, year=None):
+    """Rebuild every slice (optionally one commodity and/or year) and drop slices with no prices left."""
+    latest = HistoricalPrice.objects.aggregate(latest=Max('id'))['latest'] or 0
+    prices = HistoricalPrice.objects.all()
+    cube = PriceSummary.objects.all()
+    if commodity:
+        prices, cube = prices.filter(commodity=commodity), cube.filter(commodity=commodity)
+    if year:
+        prices, cube = prices.filter(year=year), cube.filter(year=year)
+    slices = set(prices.values_list('commodity', 'year').distinct().order_by())
+    stale = set(cube.values_list('commodity', 'year').distinct().order_by()) - slices
+    for stale_commodity, stale_year in stale:
+        PriceSummary.objects.filter(commodity=stale_commodity, year=stale_year).delete()
+    written = refresh_slices(slices)
+    if not commodity and not year:
+        PriceSummaryWatermark.objects.update_or_create(pk=1, defaults={'last_price_id': latest})
+    return len(slices), written
+
+
+def summary_queryset(commodity=None, state=None, centre=None):
+    """
+    Average monthly price per commodity and year from the cube, the same
+    rows the GROUP BY over HistoricalPrice returned.
+    """
+    qs = PriceSummary.objects.filter(
+        Q(state=state) if state else Q(state__isnull=True),
+        Q(centre=centre) if centre else Q(centre__isnull=True),
+        month__isnull=True,
+    )
+    if commodity:
+        qs = qs.filter(commodity=commodity)
+    return (
+        qs.annotate(avg_price=ExpressionWrapper(F('price_sum') / F('row_count'), output_field=FloatField()))
+        .values('commodity', 'year', 'avg_price')
+        .order_by('commodity', 'year')
+    )
@@ -8,4 +8,8 @@ urlpatterns = [
     path('prices/years/', views.YearListView.as_view()),
     path('prices/data/', views.PriceDataView.as_view()),
     path('prices/summary/', views.PriceSummaryView.as_view()),
+    path('prices/export/<str:fmt>/', views.PriceExportView.as_view()),
+    path('prices/mandi/latest/', views.MandiLatestView.as_view()),
+    path('prices/mandi/history/', views.MandiHistoryView.as_view()),
+    path('prices/mandi/nearby/', views.NearbyMandiView.as_view()),
 ]
@@ -1,16 +1,32 @@
+import base64
+import datetime
+import json
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
 from rest_framework import status
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework.permissions import AllowAny
-from django.db.models import Avg
+from rest_framework.permissions import AllowAny, IsAuthenticated
+from django.db.models import Avg, Q
+from django.utils import timezone
 
-from .models import HistoricalPrice
+from apps.weather.forecast_cache import parse_point
+from apps.weather.models import WeatherPreference
+from .export import FORMATS, ExportError, aiter_export, export, filename, filtered_prices
+from .mandi import nearest_markets
+from .models import HistoricalPrice, LatestMandiPrice, MandiPrice, PriceSummary
+from .store import get_store
+from .summary import summary_queryset
 
 
 class CropListView(APIView):
     permission_classes = [AllowAny]
 
     def get(self, request):
+        store = get_store()
+        if store is not None:
+            return Response(store.commodities())
         crops = (
             HistoricalPrice.objects
             .values_list('commodity', flat=True)
@@ -24,6 +40,9 @@ class StateListView(APIView):
     permission_classes = [AllowAny]
 
     def get(self, request):
+        store = get_store()
+        if store is not None:
+            return Response(store.states())
         states = (
             HistoricalPrice.objects
             .values_list('state', flat=True)
@@ -39,6 +58,9 @@ class CentreListView(APIView):
 
     def get(self, request):
         state = request.query_params.get('state', '')
+        store = get_store()
+        if store is not None:
+            return Response(store.centres(state))
         qs = HistoricalPrice.objects.exclude(centre='')
         if state:
             qs = qs.filter(state=state)
@@ -50,6 +72,9 @@ class YearListView(APIView):
     permission_classes = [AllowAny]
 
     def get(self, request):
+        store = get_store()
+        if store is not None:
+            return Response(store.years())
         years = (
             HistoricalPrice.objects
             .values_list('year', flat=True)
@@ -59,16 +84,36 @@ class YearListView(APIView):
         return Response(list(years))
 
 
+def _encode_cursor(key):
+    return base64.urlsafe_b64encode(json.dumps(list(key)).encode()).decode()
+
+
+def _decode_cursor(token, types=(str, int, int, int)):
+    """Cursor -> key tuple (default (commodity, year, month, id)); ValueError if malformed."""
+    key = json.loads(base64.urlsafe_b64decode(token.encode()))
+    if (
+        not isinstance(key, list) or len(key) != len(types)
+        or not all(isinstance(v, t) for v, t in zip(key, types))
+    ):
+        raise ValueError('Invalid cursor')
+    return tuple(key)
+
+
 class PriceDataView(APIView):
     """
-    Flexible price query. All filters are optional:
+    Flexible price query (from the in-memory price store when enabled).
+    All filters are optional:
       ?commodity=Wheat
       ?state=All India
       ?centre=Delhi
       ?year=2023
       ?year=2024  (multiple years)
+      ?page_size=500  (default PRICE_PAGE_SIZE, at most PRICE_PAGE_SIZE_MAX)
+      ?cursor=...     (`next` from the previous page)
 
-    Returns list of {commodity, state, centre, year, month, price, unit}.
+    Returns {next, results: [{commodity, state, centre, year, month, price, unit}]}
+    in (commodity, year, month, id) order. Pages are keyset-paginated, so
+    every page costs the same however deep; `next` is null on the last one.
     """
     permission_classes = [AllowAny]
 
@@ -80,6 +125,23 @@ class PriceDataView(APIView):
         centre = request.query_params.get('centre')
         years = request.query_params.getlist('year')
         monthly_only = request.query_params.get('monthly')
+        try:
+            years = [int(y) for y in years]
+            page_size = int(request.query_params.get('page_size') or getattr(settings, 'PRICE_PAGE_SIZE', 2000))
+        except ValueError:
+            return Response({'error': 'year and page_size must be integers.'}, status=status.HTTP_400_BAD_REQUEST)
+        page_size = max(1, min(page_size, getattr(settings, 'PRICE_PAGE_SIZE_MAX', 10000)))
+        after = None
+        if request.query_params.get('cursor'):
+            try:
+                after = _decode_cursor(request.query_params['cursor'])
+            except ValueError:
+                return Response({'error': 'Invalid cursor.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        store = get_store()
+        if store is not None:
+            rows, last = store.rows(commodity, state, centre, years, monthly_only == '1', after, limit=page_size)
+            return Response({'next': _encode_cursor(last) if last else None, 'results': rows})
 
         if commodity:
             qs = qs.filter(commodity=commodity)
@@ -88,32 +150,55 @@ class PriceDataView(APIView):
         if centre:
             qs = qs.filter(centre=centre)
         if years:
-            qs = qs.filter(year__in=[int(y) for y in years])
+            qs = qs.filter(year__in=years)
         if monthly_only == '1':
             qs = qs.filter(month__gt=0)
+        if after is not None:
+            c, y, m, i = after
+            qs = qs.filter(
+                Q(commodity__gt=c)
+                | Q(commodity=c, year__gt=y)
+                | Q(commodity=c, year=y, month__gt=m)
+                | Q(commodity=c, year=y, month=m, id__gt=i)
+            )
 
-        qs = qs.order_by('commodity', 'year', 'month')
+        qs = qs.order_by('commodity', 'year', 'month', 'id')
 
-        data = list(
-            qs.values('commodity', 'state', 'centre', 'year', 'month', 'price', 'unit')[:2000]
+        rows = list(
+            qs.values('id', 'commodity', 'state', 'centre', 'year', 'month', 'price', 'unit')[:page_size + 1]
         )
-        return Response(data)
+        last = None
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            last = rows[-1]['commodity'], rows[-1]['year'], rows[-1]['month'], rows[-1]['id']
+        for row in rows:
+            del row['id']
+        return Response({'next': _encode_cursor(last) if last else None, 'results': rows})
 
 
 class PriceSummaryView(APIView):
     """
     Aggregated view: average price per commodity per year.
     Optional: ?state=&centre=
+
+    Served from the in-memory price store when enabled, else from the
+    PriceSummary cube (manage.py refresh_price_summary), else by aggregating
+    HistoricalPrice until the cube has been built.
     """
     permission_classes = [AllowAny]
 
     def get(self, request):
-        qs = HistoricalPrice.objects.filter(month__gt=0)
-
         commodity = request.query_params.get('commodity')
         state = request.query_params.get('state')
         centre = request.query_params.get('centre')
 
+        store = get_store()
+        if store is not None:
+            return Response(store.summary(commodity, state, centre))
+        if PriceSummary.objects.exists():
+            return Response(list(summary_queryset(commodity, state, centre)))
+
+        qs = HistoricalPrice.objects.filter(month__gt=0)
         if commodity:
             qs = qs.filter(commodity=commodity)
         if state:
@@ -127,3 +212,207 @@ class PriceSummaryView(APIView):
             .order_by('commodity', 'year')
         )
         return Response(list(data))
+
+
+class PriceExportView(APIView):
+    """
+    Streaming bulk export: /prices/export/<csv|ndjson|parquet>/
+    Same filters as PriceDataView plus ?gzip=1; every matching row, in
+    (commodity, year, month, id) order, as a file download.
+
+    Under an ASGI server the rows are streamed chunk by chunk (aiter_export).
+    Behind API Gateway / Mangum the body is still buffered in full, so very
+    large pulls should use manage.py export_prices instead.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, fmt):
+        params = request.query_params
+        try:
+            years = [int(y) for y in params.getlist('year')]
+        except ValueError:
+            return Response({'error': 'year must be an integer.'}, status=status.HTTP_400_BAD_REQUEST)
+        compress = params.get('gzip') == '1'
+        qs = filtered_prices(
+            params.get('commodity'), params.get('state'), params.get('centre'), years, params.get('monthly') == '1',
+        )
+        try:
+            stream = export(fmt, qs, compress=compress)
+        except ExportError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        if isinstance(request._request, ASGIRequest):
+            stream = aiter_export(stream)
+        content_type = 'application/gzip' if compress else FORMATS[fmt][0]
+        response = StreamingHttpResponse(stream, content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="{filename(fmt, compress)}"'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+
+MANDI_HISTORY_MAX_DAYS = 3650
+MANDI_LATEST_PAGE_SIZE = 500
+MANDI_LATEST_PAGE_SIZE_MAX = 2000
+NEARBY_MAX_RADIUS_KM = 500
+NEARBY_MAX_MARKETS = 50
+
+
+def _latest_rows(rows):
+    return [
+        {
+            'commodity': row.commodity,
+            'state': row.state,
+            'market': row.market,
+            'price': row.price,
+            'unit': row.unit,
+            'date': row.date,
+            'previous_price': row.previous_price,
+            'previous_date': row.previous_date,
+            'change': row.price - row.previous_price if row.previous_price is not None else None,
+        }
+        for row in rows
+    ]
+
+
+class MandiLatestView(APIView):
+    """
+    Latest mandi rate per market from LatestMandiPrice.
+    At least one of ?commodity= ?state= ?market= is required.
+    Optional: ?page_size= (default 500, at most 2000), ?cursor= (`next`
+    from the previous page).
+
+    Returns {next, results: [{commodity, state, market, price, unit, date,
+    previous_price, previous_date, change}]} in (commodity, state, market)
+    order, keyset-paginated like PriceDataView; `next` is null on the last page.
+    """
+    permission_classes = [AllowAny]
+
+    def get(self, request):
+        commodity = request.query_params.get('commodity')
+        state = request.query_params.get('state')
+        market = request.query_params.get('market')
+        if not (commodity or state or market):
+            return Response({'error': 'Pass commodity, state or market.'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            page_size = int(request.query_params.get('page_size') or MANDI_LATEST_PAGE_SIZE)
+        except ValueError:
+            return Response({'error': 'page_size must be an integer.'}, status=status.HTTP_400_BAD_REQUEST)
+        page_size = max(1, min(page_size, MANDI_LATEST_PAGE_SIZE_MAX))
+
+        qs = LatestMandiPrice.objects.all()
+        if commodity:
+            qs = qs.filter(commodity=commodity)
+        if state:
+            qs = qs.filter(state=state)
+        if market:
+            qs = qs.filter(market=market)
+        if request.query_params.get('cursor'):
+            try:
+                c, s, m = _decode_cursor(request.query_params['cursor'], types=(str, str, str))
+            except ValueError:
+                return Response({'error': 'Invalid cursor.'}, status=status.HTTP_400_BAD_REQUEST)
+            qs = qs.filter(
+                Q(commodity__gt=c) | Q(commodity=c, state__gt=s) | Q(commodity=c, state=s, market__gt=m)
+            )
+
+        rows = list(qs.order_by('commodity', 'state', 'market')[:page_size + 1])
+        last = None
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            last = rows[-1].commodity, rows[-1].state, rows[-1].market
+        return Response({'next': _encode_cursor(last) if last else None, 'results': _latest_rows(rows)})
+
+
+class MandiHistoryView(APIView):
+    """
+    Daily rates of one commodity at one market: ?commodity=&market=
+    Optional: ?state= (markets with the same name in several states),
+    ?days= (default 90, at most 3650).
+    """
+    permission_classes = [AllowAny]
+
+    def get(self, request):
+        commodity = request.query_params.get('commodity')
+        market = request.query_params.get('market')
+        state = request.query_params.get('state')
+        if not commodity or not market:
+            return Response({'error': 'commodity and market are required.'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            days = int(request.query_params.get('days', 90))
+        except ValueError:
+            days = 0
+        if not 1 <= days <= MANDI_HISTORY_MAX_DAYS:
+            return Response(
+                {'error': f'days must be between 1 and {MANDI_HISTORY_MAX_DAYS}.'}, status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        qs = MandiPrice.objects.filter(
+            commodity=commodity, market=market, date__gte=timezone.localdate() - datetime.timedelta(days=days - 1),
+        )
+        if state:
+            qs = qs.filter(state=state)
+        rows = qs.order_by('date', 'id').values('date', 'price', 'unit', 'state')
+        return Response({'commodity': commodity, 'market': market, 'results': list(rows)})
+
+
+class NearbyMandiView(APIView):
+    """
+    Nearest mandis to ?lat=&lon= (or the user's saved weather location)
+    with their latest rates. Optional: ?commodity= (only markets trading
+    it), ?radius_km= (default 100), ?limit= (default 10).
+    """
+    permission_classes = [AllowAny]
+
+    def get(self, request):
+        params = request.query_params
+        try:
+            radius_km = float(params.get('radius_km', 100))
+            limit = int(params.get('limit', 10))
+        except ValueError:
+            return Response({'error': 'radius_km and limit must be numbers.'}, status=status.HTTP_400_BAD_REQUEST)
+        if not 0 < radius_km <= NEARBY_MAX_RADIUS_KM or not 1 <= limit <= NEARBY_MAX_MARKETS:
+            return Response(
+                {'error': f'radius_km must be at most {NEARBY_MAX_RADIUS_KM} and limit at most {NEARBY_MAX_MARKETS}.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        if params.get('lat') and params.get('lon'):
+            try:
+                lat, lon = parse_point(params['lat'], params['lon'])
+            except ValueError:
+                return Response({'error': 'Invalid lat/lon.'}, status=status.HTTP_400_BAD_REQUEST)
+        else:
+            pref = None
+            if request.user.is_authenticated:
+                pref = WeatherPreference.objects.filter(user=request.user).first()
+            if pref is None or pref.latitude is None or pref.longitude is None:
+                return Response({'error': 'Pass lat and lon, or save a location.'}, status=status.HTTP_400_BAD_REQUEST)
+            lat, lon = pref.latitude, pref.longitude
+
+        commodity = params.get('commodity')
+        markets = nearest_markets(lat, lon, radius_km, limit=None)
+        prices = LatestMandiPrice.objects.filter(
+            market__in={m.name for m, _ in markets}, state__in={m.state for m, _ in markets},
+        )
+        if commodity:
+            prices = prices.filter(commodity=commodity)
+        by_market = {}
+        for row in prices.order_by('commodity'):
+            by_market.setdefault((row.market, row.state), []).append(row)
+
+        data = []
+        for market, distance in markets:
+            rows = by_market.get((market.name, market.state))
+            if not rows:
+                continue
+            data.append({
+                'market': market.name,
+                'state': market.state,
+                'latitude': market.latitude,
+                'longitude': market.longitude,
+                'distance_km': round(distance, 1),
+                'prices': _latest_rows(rows),
+            })
+            if len(data) >= limit:
+                break
+        return Response(data)
@@ -0,0 +1,110 @@
+import asyncio
+
+from django.test import SimpleTestCase, override_settings
+from google.genai import errors as genai_errors
+
+from apps import gemini_resilience
+from apps.gemini_resilience import CircuitBreaker, acall, get_breaker
+
+
+def _open(breaker: CircuitBreaker) -> None:
+    """Trip the breaker and backdate it past the cool-down so the next call is a half-open probe."""
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+    breaker.opened_at -= breaker.reset_timeout
+
+
+@override_settings(GEMINI_HEDGE_ENABLED=False, GEMINI_RETRY_ATTEMPTS=1)
+class CircuitBreakerProbeTests(SimpleTestCase):
+    def setUp(self):
+        gemini_resilience._breakers.clear()
+        gemini_resilience._latencies.clear()
+
+    async def test_cancelled_probe_frees_the_slot(self):
+        breaker = get_breaker("test-model")
+        _open(breaker)
+        started = asyncio.Event()
+
+        async def hang():
+            started.set()
+            await asyncio.Event().wait()
+
+        probe = asyncio.ensure_future(acall("test-model", hang))
+        await started.wait()
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+        self.assertFalse(breaker.allow())  # the probe holds the slot
+
+        probe.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await probe
+
+        async def ok():
+            return "ok"
+
+        self.assertEqual(await acall("test-model", ok), "ok")
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+    async def test_client_error_does_not_close_half_open_breaker(self):
+        breaker = get_breaker("test-model")
+        _open(breaker)
+
+        async def bad_request():
+            raise genai_errors.ClientError(400, {"error": {"message": "bad request"}})
+
+        with self.assertRaises(genai_errors.ClientError):
+            await acall("test-model", bad_request)
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+        self.assertTrue(breaker.allow())
+
+
+@override_settings(GEMINI_HEDGE_ENABLED=True, GEMINI_HEDGE_PERCENTILE=95, GEMINI_RETRY_ATTEMPTS=1)
+class HedgeTests(SimpleTestCase):
+    def setUp(self):
+        gemini_resilience._breakers.clear()
+        gemini_resilience._latencies.clear()
+
+    async def test_cancelled_caller_cancels_first_attempt(self):
+        window = gemini_resilience._latency("test-model", "")
+        for _ in range(20):
+            window.add(60.0)  # hedge threshold far beyond the test
+        started = asyncio.Event()
+        attempts = []
+
+        async def hang():
+            task = asyncio.current_task()
+            attempts.append(task)
+            started.set()
+            await asyncio.Event().wait()
+
+        call = asyncio.ensure_future(acall("test-model", hang))
+        await started.wait()
+        call.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await call
+        await asyncio.sleep(0)
+        self.assertEqual(len(attempts), 1)
+        self.assertTrue(attempts[0].cancelled())
+
+
+@override_settings(
+    GEMINI_HEDGE_ENABLED=False, GEMINI_RETRY_ATTEMPTS=3, GEMINI_RETRY_BASE_DELAY_S=0, GEMINI_BREAKER_FAILURES=5,
+)
+class FailureCountingTests(SimpleTestCase):
+    def setUp(self):
+        gemini_resilience._breakers.clear()
+        gemini_resilience._latencies.clear()
+
+    async def test_retried_attempts_count_as_one_failure(self):
+        attempts = []
+
+        async def unavailable():
+            attempts.append(1)
+            raise genai_errors.ServerError(503, {"error": {"message": "overloaded"}})
+
+        for _ in range(2):
+            with self.assertRaises(genai_errors.ServerError):
+                await acall("test-model", unavailable)
+        breaker = get_breaker("test-model")
+        self.assertEqual(len(attempts), 6)
+        self.assertEqual(breaker.consecutive_failures, 2)
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
@@ -1,5 +1,9 @@
 from django.contrib import admin
-from .models import WeatherPreference, WeatherAlert
+from .models import AgroIndices, AlertDelivery, Place, WeatherAlert, WeatherArchive, WeatherPreference
 
 admin.site.register(WeatherPreference)
 admin.site.register(WeatherAlert)
+admin.site.register(Place)
+admin.site.register(AgroIndices)
+admin.site.register(AlertDelivery)
+admin.site.register(WeatherArchive)
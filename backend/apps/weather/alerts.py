@@ -0,0 +1,99 @@
+"""
+Frost / heat / heavy-rain alerts, precomputed for every farmer.
+
+generate_alerts() is run on a schedule (manage.py generate_weather_alerts).
+Thresholds are evaluated once per grid cell rather than per user, then
+matched against each farmer's alert preferences and written as WeatherAlert
+rows with bulk_create, then queued for email / SMS (see delivery.py). The
+(user, kind, valid_on) constraint keeps one alert of each kind per farmer
+per day however often the job runs, and WeatherAlertsView only reads
+these rows. prune_alerts() drops forecast alerts older than
+WEATHER_ALERT_RETENTION_DAYS so the table doesn't grow without bound.
+"""
+import datetime
+import logging
+
+from .batch import group_by_cell, located_preferences, refresh_forecasts
+from .delivery import enqueue_deliveries
+from .models import WeatherAlert
+
+logger = logging.getLogger(__name__)
+
+FROST_THRESHOLD_C = 2.0
+HEAT_THRESHOLD_C = 40.0
+HEAVY_RAIN_THRESHOLD_MM = 20.0
+
+_PREFERENCE_FLAGS = {
+    WeatherAlert.KIND_FROST: 'alert_frost',
+    WeatherAlert.KIND_HEAT: 'alert_heat',
+    WeatherAlert.KIND_HEAVY_RAIN: 'alert_heavy_rain',
+}
+
+
+def evaluate_forecast(temps, precips):
+    """[(kind, title, message)] for a 24-hour hourly forecast."""
+    alerts = []
+    temps = [t for t in temps if t is not None]
+    if temps:
+        min_temp = min(temps)
+        if min_temp <= FROST_THRESHOLD_C:
+            alerts.append((
+                WeatherAlert.KIND_FROST, 'Frost warning',
+                f'Frost warning: temperature may drop to {min_temp:.1f}°C in the next 24 hours.',
+            ))
+        max_temp = max(temps)
+        if max_temp >= HEAT_THRESHOLD_C:
+            alerts.append((
+                WeatherAlert.KIND_HEAT, 'Heat wave alert',
+                f'Heat wave alert: temperature may reach {max_temp:.1f}°C in the next 24 hours.',
+            ))
+    total_rain = sum(p for p in precips if p)
+    if total_rain >= HEAVY_RAIN_THRESHOLD_MM:
+        alerts.append((
+            WeatherAlert.KIND_HEAVY_RAIN, 'Heavy rain alert',
+            f'Heavy rain alert: up to {total_rain:.1f} mm of rain expected in the next 24 hours.',
+        ))
+    return alerts
+
+
+def generate_alerts(force_refresh=False):
+    """
+    Write today's alerts for all located farmers. Returns (farmers
+    evaluated, alerts created); alerts that already exist are skipped.
+    """
+    today = WeatherAlert.today()
+    prefs = located_preferences().only(
+        'id', 'user_id', 'latitude', 'longitude', 'alert_frost', 'alert_heat', 'alert_heavy_rain',
+    )
+    cells = group_by_cell(prefs)
+    forecasts, _ = refresh_forecasts(cells, force=force_refresh)
+
+    existing = set(
+        WeatherAlert.objects.filter(valid_on=today).values_list('user_id', 'kind')
+    )
+    new_alerts = []
+    farmers = 0
+    for cell, forecast in forecasts.items():
+        # Farmers in a cell share the forecast, so evaluate it once.
+        cell_alerts = evaluate_forecast(*forecast)
+        farmers += len(cells[cell])
+        for pref in cells[cell]:
+            for kind, title, message in cell_alerts:
+                if not getattr(pref, _PREFERENCE_FLAGS[kind]) or (pref.user_id, kind) in existing:
+                    continue
+                new_alerts.append(WeatherAlert(
+                    user_id=pref.user_id, kind=kind, valid_on=today, title=title, body=message,
+                ))
+
+    # ignore_conflicts covers a concurrent run inserting the same rows.
+    WeatherAlert.objects.bulk_create(new_alerts, batch_size=1000, ignore_conflicts=True)
+    logger.info('Weather alerts: %d farmers evaluated, %d alerts created', farmers, len(new_alerts))
+    enqueue_deliveries(today)
+    return farmers, len(new_alerts)
+
+
+def prune_alerts(retention_days):
+    """Delete forecast alerts (and their deliveries) valid more than retention_days ago. Returns alerts deleted."""
+    cutoff = WeatherAlert.today() - datetime.timedelta(days=retention_days)
+    _, deleted = WeatherAlert.objects.filter(valid_on__lt=cutoff).delete()
+    return deleted.get(WeatherAlert._meta.label, 0)
@@ -0,0 +1,227 @@
+"""
+Local archive of observed daily weather per grid cell.
+
+Each WeatherArchive row packs one cell-year as a float32 array of
+HISTORY_FIELDS x day of year (about 9 KB), so years of history for every
+farmer cell fit in a small table and a range query reads one row per year.
+manage.py archive_weather appends the last few days every night and can
+backfill from Open-Meteo's archive once; query(), season_summary() and
+describe_season() then serve WeatherHistoryView, yield prompts and price
+correlation without calling Open-Meteo again.
+"""
+import datetime
+from collections import defaultdict
+
+import numpy as np
+from django.db.models import Q
+
+from . import forecast_cache
+from .models import WeatherArchive
+from .open_meteo import HISTORY_FIELDS
+
+DAYS_PER_ROW = 366
+# Cells per query when reading the rows an append() merges into.
+LOOKUP_BATCH_CELLS = 200
+UNITS = {
+    'temperature_2m_max': '°C',
+    'temperature_2m_min': '°C',
+    'temperature_2m_mean': '°C',
+    'precipitation_sum': 'mm',
+    'et0_fao_evapotranspiration': 'mm',
+    'wind_speed_10m_max': 'km/h',
+}
+# IMD definition of a rainy day.
+RAINY_DAY_MM = 2.5
+_FIELD = {name: i for i, name in enumerate(HISTORY_FIELDS)}
+
+
+def _day_index(date):
+    return date.timetuple().tm_yday - 1
+
+
+def _empty(days=DAYS_PER_ROW):
+    return np.full((len(HISTORY_FIELDS), days), np.nan, dtype=np.float32)
+
+
+def _unpack(row):
+    """Row -> (len(HISTORY_FIELDS) x DAYS_PER_ROW) array; fields added since the row was written are NaN."""
+    stored = row.fields.split(',')
+    values = np.frombuffer(bytes(row.data), dtype='<f4').reshape(len(stored), DAYS_PER_ROW)
+    out = _empty()
+    for i, name in enumerate(stored):
+        if name in _FIELD:
+            out[_FIELD[name]] = values[i]
+    return out
+
+
+def _pack(array):
+    return array.astype('<f4').tobytes()
+
+
+def _existing(keys):
+    """Archived rows for exactly these (lat, lon, year) keys, {key: row}."""
+    years = defaultdict(set)
+    for lat, lon, year in keys:
+        years[(lat, lon)].add(year)
+    cells = list(years)
+    existing = {}
+    for i in range(0, len(cells), LOOKUP_BATCH_CELLS):
+        match = Q()
+        for lat, lon in cells[i:i + LOOKUP_BATCH_CELLS]:
+            match |= Q(latitude=lat, longitude=lon, year__in=years[(lat, lon)])
+        for row in WeatherArchive.objects.filter(match):
+            existing[(row.latitude, row.longitude, row.year)] = row
+    return existing
+
+
+def append(cell_history):
+    """
+    Merge daily series {cell: {'start', 'count', 'fields'}} (the
+    open_meteo.fetch_daily_history format) into the archive. Missing values
+    never overwrite archived ones. Returns the number of cell-days written.
+    """
+    pieces = defaultdict(list)
+    for (lat, lon), series in cell_history.items():
+        count = series['count']
+        if not count:
+            continue
+        block = np.full((len(HISTORY_FIELDS), count), np.nan)
+        for name, values in series['fields'].items():
+            if name in _FIELD and values:
+                values = np.array(values[:count], dtype=float)
+                block[_FIELD[name], :len(values)] = values
+        start = datetime.date.fromisoformat(series['start'][:10])
+        offset = 0
+        while offset < count:
+            day = start + datetime.timedelta(days=offset)
+            first = _day_index(day)
+            n = min(count - offset, (datetime.date(day.year, 12, 31) - day).days + 1)
+            pieces[(lat, lon, day.year)].append((first, block[:, offset:offset + n]))
+            offset += n
+    if not pieces:
+        return 0
+
+    existing = _existing(pieces)
+    rows = []
+    written = 0
+    for (lat, lon, year), blocks in pieces.items():
+        row = existing.get((lat, lon, year))
+        array = _unpack(row) if row is not None else _empty()
+        for first, block in blocks:
+            observed = ~np.isnan(block)
+            target = array[:, first:first + block.shape[1]]
+            target[observed] = block[observed]
+            written += int(observed.any(axis=0).sum())
+        rows.append(WeatherArchive(
+            latitude=lat, longitude=lon, year=year, fields=','.join(HISTORY_FIELDS), data=_pack(array),
+        ))
+    WeatherArchive.objects.bulk_create(
+        rows, batch_size=500, update_conflicts=True,
+        unique_fields=['latitude', 'longitude', 'year'], update_fields=['fields', 'data', 'updated_at'],
+    )
+    return written
+
+
+def _load(cell, first_year, last_year):
+    """{year: unpacked array} for the archived years of one snapped cell."""
+    lat, lon = cell
+    rows = WeatherArchive.objects.filter(latitude=lat, longitude=lon, year__range=(first_year, last_year))
+    return {row.year: _unpack(row) for row in rows}
+
+
+def _slice(years, start, end):
+    """(len(HISTORY_FIELDS) x days) array for start..end (inclusive) from _load() output."""
+    parts = []
+    for year in range(start.year, end.year + 1):
+        first = _day_index(start) if year == start.year else 0
+        last = _day_index(end) + 1 if year == end.year else _day_index(datetime.date(year, 12, 31)) + 1
+        array = years.get(year)
+        parts.append(array[:, first:last] if array is not None else _empty(last - first))
+    return np.concatenate(parts, axis=1)
+
+
+def _mean(values):
+    return round(float(np.nanmean(values)), 1) if np.isfinite(values).any() else None
+
+
+def _summarise(values):
+    rain = values[_FIELD['precipitation_sum']]
+    return {
+        'days': values.shape[1],
+        'days_observed': int(np.isfinite(values).any(axis=0).sum()),
+        'rainfall_mm': round(float(np.nansum(rain)), 1),
+        'rainy_days': int((rain >= RAINY_DAY_MM).sum()),
+        'temperature_max_mean_c': _mean(values[_FIELD['temperature_2m_max']]),
+        'temperature_min_mean_c': _mean(values[_FIELD['temperature_2m_min']]),
+        'et0_mm': round(float(np.nansum(values[_FIELD['et0_fao_evapotranspiration']])), 1),
+    }
+
+
+def query(lat, lon, start, end, fields=None):
+    """
+    Archived daily series for the cell containing (lat, lon) between two
+    dates (inclusive), in the columnar ForecastView format plus a summary.
+    Days not archived are null.
+    """
+    cell = forecast_cache.snap(lat, lon)
+    values = _slice(_load(cell, start.year, end.year), start, end)
+    names = [name for name in HISTORY_FIELDS if fields is None or name in fields]
+    columns = {}
+    for name in names:
+        series = values[_FIELD[name]].astype(float)
+        out = np.round(series, 1).astype(object)
+        out[np.isnan(series)] = None
+        columns[name] = out.tolist()
+    return {
+        'latitude': cell[0],
+        'longitude': cell[1],
+        'start': start.isoformat(),
+        'count': values.shape[1],
+        'interval_s': 86400,
+        'fields': columns,
+        'units': {name: UNITS.get(name, '') for name in names},
+        'summary': _summarise(values),
+    }
+
+
+def season_summary(lat, lon, start, end):
+    """Rainfall, rainy days, mean temperatures and ET0 for start..end at (lat, lon)."""
+    cell = forecast_cache.snap(lat, lon)
+    return _summarise(_slice(_load(cell, start.year, end.year), start, end))
+
+
+def _years_back(date, years):
+    try:
+        return date.replace(year=date.year - years)
+    except ValueError:  # 29 February
+        return date.replace(year=date.year - years, day=28)
+
+
+def describe_season(lat, lon, days=90, compare_years=10, today=None):
+    """
+    One-line rainfall summary of the last `days` days against the same
+    window in up to `compare_years` earlier years, e.g. for Gemini prompts.
+    Empty if the archive doesn't cover the period.
+    """
+    end = (today or datetime.date.today()) - datetime.timedelta(days=1)
+    start = end - datetime.timedelta(days=days - 1)
+    years = _load(forecast_cache.snap(lat, lon), start.year - compare_years, end.year)
+    current = _summarise(_slice(years, start, end))
+    if current['days_observed'] < days * 0.9:
+        return ''
+    text = (
+        f'Rainfall over the last {days} days: {current["rainfall_mm"]} mm '
+        f'on {current["rainy_days"]} rainy days.'
+    )
+    previous = []
+    for back in range(1, compare_years + 1):
+        summary = _summarise(_slice(years, _years_back(start, back), _years_back(end, back)))
+        if summary['days_observed'] >= days * 0.9:
+            previous.append(summary['rainfall_mm'])
+    if previous:
+        normal = sum(previous) / len(previous)
+        text += f' Average for the same period over the previous {len(previous)} years: {normal:.1f} mm'
+        if normal > 0:
+            text += f' ({(current["rainfall_mm"] - normal) / normal:+.0%})'
+        text += '.'
+    return text
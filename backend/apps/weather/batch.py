@@ -0,0 +1,79 @@
+"""
+Bulk forecast refresh for every farmer with a saved location.
+
+WeatherPreference rows are grouped by grid cell (see forecast_cache.snap),
+cells whose cached forecast is missing or stale are fetched through
+open_meteo.fetch_forecasts in multi-coordinate batches, and the results are
+written back to the shared cache and fanned out per preference.
+"""
+import time
+from collections import defaultdict
+
+from . import forecast_cache
+from .models import WeatherPreference
+from .open_meteo import fetch_extended_forecasts, fetch_forecasts
+
+
+def located_preferences():
+    return WeatherPreference.objects.filter(latitude__isnull=False, longitude__isnull=False)
+
+
+def group_by_cell(prefs):
+    """{snapped (lat, lon): [pref, ...]}"""
+    cells = defaultdict(list)
+    for pref in prefs:
+        cells[forecast_cache.snap(pref.latitude, pref.longitude)].append(pref)
+    return cells
+
+
+def refresh_cells(kind, cells, fetch_many, force=False):
+    """
+    Cached `kind` data for the given snapped cells, fetching with
+    fetch_many(cells) only those not fresh in the cache (all of them with
+    force=True). Returns ({cell: data} for every cell available, number of
+    cells fetched from Open-Meteo).
+    """
+    cells = list(cells)
+    cached = {} if force else forecast_cache.get_many(kind, cells)
+    now = time.time()
+    results = {}
+    to_fetch = []
+    for cell in cells:
+        entry = cached.get(cell)
+        if entry is not None:
+            results[cell] = entry['data']
+            if now < entry['fresh_until']:
+                continue
+        to_fetch.append(cell)
+
+    fetched = fetch_many(to_fetch)
+    for (lat, lon), data in fetched.items():
+        forecast_cache.store(kind, lat, lon, data)
+    results.update(fetched)
+    return results, len(fetched)
+
+
+def refresh_forecasts(cells, force=False):
+    """24-hour alert forecasts, {cell: (temps, precips)}; see refresh_cells."""
+    return refresh_cells('forecast', cells, fetch_forecasts, force=force)
+
+
+def refresh_extended_forecasts(cells, force=False):
+    """Multi-day columnar forecasts (ForecastView format); see refresh_cells."""
+    return refresh_cells('extended', cells, fetch_extended_forecasts, force=force)
+
+
+def forecasts_for_preferences(prefs=None, force=False):
+    """
+    {pref: (temps, precips)} for each located preference (all of them by
+    default); preferences whose cell could not be fetched are left out.
+    """
+    if prefs is None:
+        prefs = located_preferences()
+    cells = group_by_cell(prefs)
+    forecasts, _ = refresh_forecasts(cells, force=force)
+    return {
+        pref: forecasts[cell]
+        for cell, members in cells.items() if cell in forecasts
+        for pref in members
+    }
@@ -0,0 +1,239 @@
+"""
+Out-of-band delivery of weather alerts (email, SMS).
+
+enqueue_deliveries() turns new forecast WeatherAlert rows into pending
+AlertDelivery rows for each enabled channel the farmer opted into:
+
+  email  WeatherPreference.email_alerts and FarmerProfile.weather_alerts_email
+         both on, and an email address on file
+  sms    WeatherPreference.sms_alerts on (off unless the farmer opts in; the
+         channel itself is also off by default)
+
+deliver() is run from manage.py deliver_weather_alerts, never from a web
+request. It claims pending rows in batches (SELECT ... SKIP LOCKED, so
+several workers can share the queue), bundles each farmer's alerts into
+one message, sends the batch through the channel backend under a
+per-process rate limit, and records sent / failed state with retries up to
+ALERT_DELIVERY_MAX_ATTEMPTS. Backends are pluggable through
+settings.ALERT_DELIVERY_BACKENDS.
+"""
+import datetime
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from apps.accounts.sms import get_sns_client, send_sms
+from .models import AlertDelivery, WeatherAlert
+
+logger = logging.getLogger(__name__)
+
+# Rows stuck in 'sending' longer than this (a crashed worker) are retried.
+CLAIM_TIMEOUT = datetime.timedelta(minutes=15)
+# A failed attempt is retried no sooner than this.
+RETRY_DELAY = datetime.timedelta(minutes=5)
+
+
+class RateLimiter:
+    """
+    Token bucket shared by the threads of one backend. It is per process:
+    N deliver_weather_alerts workers together send up to N x the rate, so
+    set ALERT_*_RATE_PER_S to the provider limit divided by the workers.
+    """
+
+    def __init__(self, rate_per_s):
+        self.rate = float(rate_per_s)
+        self.tokens = self.rate
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class EmailChannel:
+    """Sends through the configured Django email backend over one connection per batch."""
+
+    def __init__(self):
+        self.limiter = RateLimiter(getattr(settings, 'ALERT_EMAIL_RATE_PER_S', 14))
+
+    def address(self, user):
+        return user.email
+
+    def send(self, messages):
+        """messages: [(key, address, subject, body)]. Returns {key: error} for failures."""
+        errors = {}
+        connection = get_connection()
+        try:
+            connection.open()
+            for key, address, subject, body in messages:
+                self.limiter.acquire()
+                try:
+                    EmailMessage(subject, body, to=[address], connection=connection).send()
+                except Exception as exc:
+                    errors[key] = str(exc) or exc.__class__.__name__
+        except Exception as exc:
+            logger.exception('Email connection failed')
+            for key, *_ in messages:
+                errors.setdefault(key, str(exc) or exc.__class__.__name__)
+        finally:
+            connection.close()
+        return errors
+
+
+class SNSChannel:
+    """SMS through AWS SNS; publishes concurrently with one shared client."""
+
+    def __init__(self):
+        self.limiter = RateLimiter(getattr(settings, 'ALERT_SMS_RATE_PER_S', 20))
+        self.concurrency = getattr(settings, 'ALERT_SMS_CONCURRENCY', 8)
+
+    def address(self, user):
+        return user.phone
+
+    def send(self, messages):
+        client = get_sns_client()
+        errors = {}
+
+        def publish(message):
+            key, address, subject, body = message
+            self.limiter.acquire()
+            try:
+                send_sms(address, f'Agromod: {body}', client=client)
+            except Exception as exc:
+                errors[key] = str(exc) or exc.__class__.__name__
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            list(pool.map(publish, messages))
+        return errors
+
+
+DEFAULT_BACKENDS = {
+    AlertDelivery.CHANNEL_EMAIL: 'apps.weather.delivery.EmailChannel',
+    AlertDelivery.CHANNEL_SMS: 'apps.weather.delivery.SNSChannel',
+}
+
+
+def get_backend(channel):
+    backends = {**DEFAULT_BACKENDS, **getattr(settings, 'ALERT_DELIVERY_BACKENDS', {})}
+    return import_string(backends[channel])()
+
+
+def enabled_channels():
+    return [c for c in getattr(settings, 'ALERT_DELIVERY_CHANNELS', [AlertDelivery.CHANNEL_EMAIL]) if c]
+
+
+def enqueue_deliveries(since=None):
+    """
+    Create pending deliveries for forecast alerts valid on or after `since`
+    (default today) that don't have one yet. Returns rows created per channel.
+    """
+    since = since or WeatherAlert.today()
+    alerts = WeatherAlert.objects.filter(valid_on__gte=since)
+    created = {}
+    for channel in enabled_channels():
+        pending = alerts.exclude(deliveries__channel=channel)
+        if channel == AlertDelivery.CHANNEL_EMAIL:
+            pending = pending.filter(
+                user__weather_preference__email_alerts=True,
+                user__farmer_profile__weather_alerts_email=True,
+            ).exclude(user__email='')
+        else:
+            pending = pending.filter(user__weather_preference__sms_alerts=True).exclude(user__phone='')
+        rows = [
+            AlertDelivery(alert_id=alert_id, user_id=user_id, channel=channel)
+            for alert_id, user_id in pending.values_list('id', 'user_id').iterator(chunk_size=5000)
+        ]
+        AlertDelivery.objects.bulk_create(rows, batch_size=1000, ignore_conflicts=True)
+        created[channel] = len(rows)
+    return created
+
+
+def _claim(channel, batch_size):
+    with transaction.atomic():
+        ids = list(
+            AlertDelivery.objects.select_for_update(skip_locked=True)
+            .filter(channel=channel, status=AlertDelivery.STATUS_PENDING)
+            .filter(Q(claimed_at__isnull=True) | Q(claimed_at__lt=timezone.now() - RETRY_DELAY))
+            .order_by('created_at')
+            .values_list('id', flat=True)[:batch_size]
+        )
+        if ids:
+            AlertDelivery.objects.filter(id__in=ids).update(
+                status=AlertDelivery.STATUS_SENDING, claimed_at=timezone.now(), attempts=F('attempts') + 1,
+            )
+    return ids
+
+
+def _compose(alerts):
+    if len(alerts) == 1:
+        return alerts[0].title, alerts[0].body
+    return f'{len(alerts)} weather alerts for your farm', '\n\n'.join(a.body for a in alerts)
+
+
+def deliver(channel, batch_size=500, max_seconds=None):
+    """Send pending deliveries for one channel until the queue is empty. Returns (sent, failed)."""
+    backend = get_backend(channel)
+    max_attempts = getattr(settings, 'ALERT_DELIVERY_MAX_ATTEMPTS', 3)
+    AlertDelivery.objects.filter(
+        channel=channel, status=AlertDelivery.STATUS_SENDING, claimed_at__lt=timezone.now() - CLAIM_TIMEOUT,
+    ).update(status=AlertDelivery.STATUS_PENDING)
+
+    started = time.monotonic()
+    sent = failed = 0
+    while max_seconds is None or time.monotonic() - started < max_seconds:
+        ids = _claim(channel, batch_size)
+        if not ids:
+            break
+        rows = list(AlertDelivery.objects.filter(id__in=ids).select_related('alert', 'user'))
+
+        by_user = OrderedDict()
+        for row in rows:
+            by_user.setdefault(row.user_id, []).append(row)
+        messages = []
+        errors = {}
+        for user_id, user_rows in by_user.items():
+            address = backend.address(user_rows[0].user)
+            if not address:
+                errors[user_id] = 'No address on file'
+                continue
+            subject, body = _compose([r.alert for r in user_rows])
+            messages.append((user_id, address, subject, body))
+        errors.update(backend.send(messages))
+
+        now = timezone.now()
+        for user_id, user_rows in by_user.items():
+            error = errors.get(user_id)
+            for row in user_rows:
+                if error is None:
+                    row.status, row.sent_at, row.last_error = AlertDelivery.STATUS_SENT, now, ''
+                    sent += 1
+                else:
+                    row.last_error = error[:1000]
+                    if row.attempts >= max_attempts:
+                        row.status = AlertDelivery.STATUS_FAILED
+                        failed += 1
+                    else:
+                        row.status = AlertDelivery.STATUS_PENDING
+        AlertDelivery.objects.bulk_update(rows, ['status', 'sent_at', 'last_error'], batch_size=1000)
+    logger.info('Alert delivery via %s: %d sent, %d failed', channel, sent, failed)
+    return sent, failed
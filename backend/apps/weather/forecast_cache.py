@@ -0,0 +1,147 @@
+"""
+Shared cache for Open-Meteo responses, keyed by grid-snapped coordinates.
+
+Farmers within a few kilometres of each other get the same forecast, so
+lat/lon are snapped to a settings.WEATHER_GRID_DEG grid (0.1° ≈ 11 km)
+and the upstream response is stored in a Django cache alias, shared by
+every process / Lambda container.
+
+Entries are fresh until the next WEATHER_CACHE_REFRESH_S boundary
+(WEATHER_CURRENT_REFRESH_S for current conditions). Open-Meteo refreshes
+on a fixed cadence, so all cells expire together rather than an hour
+after whoever asked first. Stale entries are kept for
+WEATHER_CACHE_STALE_S more and served immediately while a background
+thread refreshes them, so a slow upstream never blocks a page.
+
+Background threads don't survive on Lambda (the container is frozen as
+soon as the response is returned), so WEATHER_CACHE_BACKGROUND_REFRESH
+is off there and the request that takes the cell's refresh lock refetches
+it inline instead; concurrent requests still get the stale value. The
+same happens everywhere once an entry is more than
+WEATHER_CACHE_HARD_STALE_S past its refresh time, so a refresh thread
+that never finished can't leave a cell serving old data for the whole
+WEATHER_CACHE_STALE_S window. A failed inline refresh serves the stale
+value.
+"""
+import logging
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'weather'
+LOCK_TIMEOUT_S = 30
+
+
+def _cache():
+    return caches[getattr(settings, 'WEATHER_CACHE_ALIAS', 'default')]
+
+
+def parse_point(lat, lon):
+    """(lat, lon) as floats from query strings; ValueError unless finite and on the globe."""
+    lat, lon = float(lat), float(lon)
+    if not (math.isfinite(lat) and math.isfinite(lon) and -90 <= lat <= 90 and -180 <= lon <= 180):
+        raise ValueError(f'Coordinates out of range: {lat}, {lon}')
+    return lat, lon
+
+
+def snap(lat, lon):
+    """Centre of the grid cell containing (lat, lon)."""
+    step = getattr(settings, 'WEATHER_GRID_DEG', 0.1)
+    return round(round(float(lat) / step) * step, 4), round(round(float(lon) / step) * step, 4)
+
+
+def cache_key(kind, lat, lon):
+    """Key for an already-snapped cell."""
+    return f'{KEY_PREFIX}:{kind}:{lat:.4f}:{lon:.4f}'
+
+
+def fresh_until(kind, now=None):
+    """End of the current upstream refresh period for this kind (epoch seconds)."""
+    now = time.time() if now is None else now
+    if kind == 'current':
+        period = getattr(settings, 'WEATHER_CURRENT_REFRESH_S', 900)
+    else:
+        period = getattr(settings, 'WEATHER_CACHE_REFRESH_S', 3600)
+    return (int(now // period) + 1) * period
+
+
+def store(kind, lat, lon, data):
+    """Cache data for an already-snapped cell."""
+    expires = fresh_until(kind)
+    timeout = int(expires - time.time()) + getattr(settings, 'WEATHER_CACHE_STALE_S', 6 * 3600)
+    _cache().set(cache_key(kind, lat, lon), {'data': data, 'fresh_until': expires}, timeout)
+
+
+def get_many(kind, cells):
+    """
+    Cached entries for already-snapped cells, in one cache round trip.
+    Returns {cell: {'data': ..., 'fresh_until': ...}} for the cells present.
+    """
+    keys = {cache_key(kind, lat, lon): (lat, lon) for lat, lon in cells}
+    found = _cache().get_many(list(keys))
+    return {keys[key]: entry for key, entry in found.items()}
+
+
+def _lock(kind, lat, lon):
+    """Take the cell's refresh lock; returns its key, or None if another process holds it."""
+    # cache.add is atomic, so only one process refreshes a given cell.
+    lock_key = cache_key(kind, lat, lon) + ':lock'
+    return lock_key if _cache().add(lock_key, 1, LOCK_TIMEOUT_S) else None
+
+
+def _refresh(kind, lat, lon, fetch, lock_key):
+    try:
+        store(kind, lat, lon, fetch(lat, lon))
+    except Exception:
+        logger.warning('Background weather refresh failed for %s %s,%s', kind, lat, lon, exc_info=True)
+    finally:
+        _cache().delete(lock_key)
+        close_old_connections()
+
+
+def _refresh_stale(kind, lat, lon, fetch, entry):
+    """Value to serve for a stale entry, refreshing it in the background or inline."""
+    hard_stale = time.time() >= entry['fresh_until'] + getattr(settings, 'WEATHER_CACHE_HARD_STALE_S', 2 * 3600)
+    lock_key = _lock(kind, lat, lon)
+    if lock_key is None:
+        return entry['data']
+    if not hard_stale and getattr(settings, 'WEATHER_CACHE_BACKGROUND_REFRESH', True):
+        threading.Thread(target=_refresh, args=(kind, lat, lon, fetch, lock_key), daemon=True).start()
+        return entry['data']
+    try:
+        data = fetch(lat, lon)
+    except Exception:
+        logger.warning('Weather refresh failed for %s %s,%s; serving stale data', kind, lat, lon, exc_info=True)
+        return entry['data']
+    else:
+        store(kind, lat, lon, data)
+        return data
+    finally:
+        _cache().delete(lock_key)
+
+
+def get_or_fetch(kind, lat, lon, fetch):
+    """
+    Return fetch(snapped_lat, snapped_lon), served from the shared cache.
+
+    Fresh hits return straight from cache; stale hits return the old value
+    and refresh in the background, or refetch inline when background
+    refresh is off or the entry is past the hard-stale limit (see module
+    docstring); misses call fetch inline (and raise whatever it raises).
+    """
+    lat, lon = snap(lat, lon)
+    entry = _cache().get(cache_key(kind, lat, lon))
+    if entry is not None:
+        if time.time() >= entry['fresh_until']:
+            return _refresh_stale(kind, lat, lon, fetch, entry)
+        return entry['data']
+
+    data = fetch(lat, lon)
+    store(kind, lat, lon, data)
+    return data
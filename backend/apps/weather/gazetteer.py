@@ -0,0 +1,314 @@
+"""
+Offline gazetteer of Indian places for forward and reverse geocoding.
+
+Place rows (imported from a GeoNames dump with manage.py import_gazetteer)
+are loaded once per process into three in-memory indexes:
+
+- a sorted name list, for prefix search with bisect, plus the most
+  populous places for every prefix shared by more than MAX_PREFIX_SCAN
+  names (short prefixes like "pa"), so autocomplete ranks by population
+  across the whole range rather than an alphabetical window of it;
+- a trigram -> place-ids map, for typo-tolerant search when the prefix
+  search finds too little;
+- a grid of CELL_DEG cells, for nearest-place lookup that only looks at
+  neighbouring cells.
+
+Both lookups take well under a millisecond once the index is built.
+GeocodeView and _reverse_geocode try them first and only fall back to
+Open-Meteo / Nominatim when the gazetteer is empty or has no match.
+
+Building the index scans every Place, so import_gazetteer also saves it to
+GAZETTEER_INDEX_PATH (ship that file with the deployment, or write it with
+import_gazetteer --index-only). get_index() unpickles it when it matches
+the table (same row count and max id) and only rebuilds from the database
+otherwise. warm_index() does this at process start (lambda_handler, asgi),
+and an empty gazetteer is rechecked at most every GAZETTEER_EMPTY_RECHECK_S
+seconds instead of on every lookup.
+"""
+import bisect
+import heapq
+import logging
+import math
+import os
+import pickle
+import re
+import threading
+import time
+import unicodedata
+from array import array
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import Count, Max
+
+from .models import Place
+
+logger = logging.getLogger(__name__)
+
+CELL_DEG = 0.25
+# Prefixes matching more names than this are answered from a precomputed
+# top-POPULAR_PER_PREFIX-by-population list instead of scanning the range.
+MAX_PREFIX_SCAN = 2000
+POPULAR_PER_PREFIX = 50
+# Bumped whenever _Index changes shape, so older saved indexes are rebuilt.
+INDEX_FORMAT = 2
+# Trigrams shared by more places than this carry no signal and are skipped.
+MAX_TRIGRAM_POSTINGS = 5000
+MIN_TRIGRAM_SCORE = 0.45
+
+_index = None
+_empty_until = 0.0
+_index_lock = threading.Lock()
+
+
+def normalize(text):
+    """Lower-case ASCII with punctuation removed and whitespace collapsed."""
+    text = unicodedata.normalize('NFKD', text).encode('ascii', 'ignore').decode('ascii').lower()
+    return ' '.join(re.sub(r'[^a-z0-9 ]+', ' ', text).split())
+
+
+def trigrams(text):
+    padded = f'  {text} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _haversine_km(lat1, lon1, lat2, lon2):
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp, dl = p2 - p1, math.radians(lon2 - lon1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 6371.0 * 2 * math.asin(math.sqrt(a))
+
+
+def _cell(lat, lon):
+    return int(math.floor(lat / CELL_DEG)), int(math.floor(lon / CELL_DEG))
+
+
+class _Index:
+    def __init__(self, rows):
+        self.labels = []
+        self.lats = array('d')
+        self.lons = array('d')
+        self.populations = array('q')
+        keys = []
+        postings = defaultdict(lambda: array('I'))
+        self.trigram_counts = array('H')
+        self.grid = defaultdict(lambda: array('I'))
+
+        for idx, (name, ascii_name, district, state, lat, lon, population) in enumerate(rows):
+            parts = [name]
+            for part in (district, state):
+                if part and part not in parts:
+                    parts.append(part)
+            self.labels.append(', '.join(parts))
+            self.lats.append(lat)
+            self.lons.append(lon)
+            self.populations.append(population or 0)
+
+            key = normalize(ascii_name or name)
+            keys.append((key, idx))
+            alt = normalize(name)
+            if alt and alt != key:
+                keys.append((alt, idx))
+            grams = trigrams(key)
+            self.trigram_counts.append(min(len(grams), 65535))
+            for gram in grams:
+                postings[gram].append(idx)
+            self.grid[_cell(lat, lon)].append(idx)
+
+        keys.sort()
+        self.keys = [k for k, _ in keys]
+        self.key_ids = array('I', (i for _, i in keys))
+        self.postings = dict(postings)
+        self.grid = dict(self.grid)
+        self.popular = self._popular_prefixes()
+
+    def _popular_prefixes(self):
+        """{prefix: ids of its most populous places} for every prefix matching > MAX_PREFIX_SCAN keys."""
+        popular = {}
+        ranges = [('', 0, len(self.keys))]
+        while ranges:
+            prefix, lo, hi = ranges.pop()
+            pos = lo
+            while pos < hi:
+                key = self.keys[pos]
+                if len(key) <= len(prefix):
+                    pos += 1
+                    continue
+                child = key[:len(prefix) + 1]
+                # Keys are normalize()d to [a-z0-9 ], all below '\x7f'.
+                end = bisect.bisect_left(self.keys, child + '\x7f', pos, hi)
+                if end - pos > MAX_PREFIX_SCAN:
+                    ids = set(self.key_ids[pos:end])
+                    popular[child] = array('I', heapq.nlargest(
+                        POPULAR_PER_PREFIX, ids, key=lambda i: self.populations[i],
+                    ))
+                    ranges.append((child, pos, end))
+                pos = end
+        return popular
+
+    def __len__(self):
+        return len(self.labels)
+
+    def result(self, idx):
+        return {
+            'lat': self.lats[idx],
+            'lon': self.lons[idx],
+            'name': self.labels[idx],
+            'country': 'India',
+        }
+
+    def prefix(self, query, limit):
+        popular = self.popular.get(query)
+        if popular is not None and limit <= len(popular):
+            return list(popular[:limit])
+        start = bisect.bisect_left(self.keys, query)
+        seen = set()
+        for pos in range(start, min(start + MAX_PREFIX_SCAN, len(self.keys))):
+            if not self.keys[pos].startswith(query):
+                break
+            seen.add(self.key_ids[pos])
+        return heapq.nlargest(limit, seen, key=lambda i: self.populations[i])
+
+    def fuzzy(self, query, limit, exclude=()):
+        grams = trigrams(query)
+        shared = Counter()
+        for gram in grams:
+            ids = self.postings.get(gram)
+            if ids is not None and len(ids) <= MAX_TRIGRAM_POSTINGS:
+                shared.update(ids)
+        scored = []
+        for idx, count in shared.items():
+            if idx in exclude:
+                continue
+            score = count / max(len(grams), self.trigram_counts[idx])
+            if score >= MIN_TRIGRAM_SCORE:
+                scored.append((score, self.populations[idx], idx))
+        return [idx for _, _, idx in heapq.nlargest(limit, scored)]
+
+    def nearest(self, lat, lon, max_km):
+        row, col = _cell(lat, lon)
+        best, best_km = None, max_km
+        # A place in ring k + 1 is at least k cell widths away.
+        cell_km = CELL_DEG * 111 * math.cos(math.radians(min(abs(lat), 80)))
+        max_ring = int(max_km / cell_km) + 1
+        for ring in range(max_ring + 1):
+            for r in range(row - ring, row + ring + 1):
+                for c in range(col - ring, col + ring + 1):
+                    if max(abs(r - row), abs(c - col)) != ring:
+                        continue
+                    for idx in self.grid.get((r, c), ()):
+                        km = _haversine_km(lat, lon, self.lats[idx], self.lons[idx])
+                        if km <= best_km:
+                            best, best_km = idx, km
+            if best is not None and best_km <= ring * cell_km:
+                break
+        return best
+
+
+def _table_version():
+    stats = Place.objects.aggregate(places=Count('id'), latest=Max('id'))
+    return stats['places'], stats['latest']
+
+
+def build_index():
+    rows = Place.objects.values_list(
+        'name', 'ascii_name', 'district', 'state', 'latitude', 'longitude', 'population',
+    ).iterator(chunk_size=5000)
+    return _Index(rows)
+
+
+def _index_path():
+    return getattr(settings, 'GAZETTEER_INDEX_PATH', '')
+
+
+def save_index(index=None, path=None):
+    """Pickle the index (built from the table if not given) with the table version. Returns the path."""
+    path = path or _index_path()
+    version = _table_version()
+    index = index or build_index()
+    tmp = f'{path}.tmp'
+    with open(tmp, 'wb') as fh:
+        pickle.dump(((INDEX_FORMAT, *version), index), fh, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, path)
+    return path
+
+
+def _load_saved(version):
+    """Index from GAZETTEER_INDEX_PATH if it was saved for this table version, else None."""
+    path = _index_path()
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        # Written by save_index() at import / deploy time, never from user input.
+        with open(path, 'rb') as fh:
+            saved_version, index = pickle.load(fh)
+    except Exception:
+        logger.warning('Could not read gazetteer index %s; rebuilding', path, exc_info=True)
+        return None
+    return index if saved_version == (INDEX_FORMAT, *version) else None
+
+
+def get_index():
+    global _index, _empty_until
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                if time.monotonic() < _empty_until:
+                    return _Index(())
+                started = time.monotonic()
+                version = _table_version()
+                index = _load_saved(version) if version[0] else None
+                source = 'file'
+                if index is None:
+                    index, source = build_index(), 'database'
+                if not len(index):
+                    # Nothing imported yet; don't rescan on every lookup.
+                    _empty_until = time.monotonic() + getattr(settings, 'GAZETTEER_EMPTY_RECHECK_S', 300)
+                    return index
+                _index = index
+                logger.info(
+                    'Loaded gazetteer index with %d places from %s in %.2fs',
+                    len(_index), source, time.monotonic() - started,
+                )
+    return _index
+
+
+def warm_index():
+    """Load the index now (process start) instead of on the first geocode."""
+    try:
+        get_index()
+    except Exception:
+        logger.exception('Gazetteer index warm-up failed')
+    finally:
+        connections.close_all()
+
+
+def reset_index():
+    """Drop the in-process index so the next lookup reloads it."""
+    global _index, _empty_until
+    with _index_lock:
+        _index, _empty_until = None, 0.0
+
+
+def search(query, limit=5):
+    """Places matching query, best first, in the GeocodeView result format."""
+    index = get_index()
+    query = normalize(query)
+    if not query or not len(index):
+        return []
+    ids = index.prefix(query, limit)
+    if len(ids) < limit and len(query) >= 3:
+        ids += index.fuzzy(query, limit - len(ids), exclude=set(ids))
+    return [index.result(i) for i in ids]
+
+
+def reverse(lat, lon):
+    """Label of the nearest place within GAZETTEER_REVERSE_MAX_KM, or ''."""
+    index = get_index()
+    if not len(index):
+        return ''
+    idx = index.nearest(float(lat), float(lon), getattr(settings, 'GAZETTEER_REVERSE_MAX_KM', 20))
+    if idx is None:
+        return ''
+    return index.labels[idx] + ', India'
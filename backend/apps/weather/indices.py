@@ -0,0 +1,192 @@
+"""
+Agro-meteorological indices computed from the cached extended forecasts.
+
+compute_indices() takes the columnar forecasts of many grid cells at once,
+stacks each field into a (cells x hours) or (cells x days) NumPy array and
+derives, per cell and day:
+
+  gdd                 growing degree days, base AGRO_GDD_BASE_C, capped at
+                      AGRO_GDD_CAP_C (modified averaging method)
+  spray_hours         hours fit for spraying: light wind, mild temperature,
+                      no rain now or in the following SPRAY_RAINFAST_H hours
+  leaf_wetness_hours  hours with RH >= 90% or measurable rain
+  disease_risk        0-3 from wet hours at 15-28 °C (fungal infection range)
+  et0_mm / effective_rain_mm
+                      reference evapotranspiration and 80% of rainfall;
+                      crop water need is Kc * et0_mm - effective_rain_mm
+
+Results are stored per cell in AgroIndices (manage.py compute_agro_indices),
+so alerts, planner and yield code read them without refetching forecasts.
+"""
+import datetime
+import logging
+import time
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+
+from . import forecast_cache
+from .models import AgroIndices
+
+logger = logging.getLogger(__name__)
+
+SPRAY_MAX_WIND_KMH = 15.0
+SPRAY_MIN_TEMP_C = 5.0
+SPRAY_MAX_TEMP_C = 30.0
+SPRAY_MIN_RH = 40.0
+SPRAY_MAX_RAIN_PROBABILITY = 40.0
+SPRAY_RAINFAST_H = 4
+WET_RH = 90.0
+WET_RAIN_MM = 0.1
+DISEASE_TEMP_RANGE_C = (15.0, 28.0)
+# Wet hours in the infection temperature range for risk levels 1, 2, 3.
+DISEASE_RISK_HOURS = (4, 8, 12)
+EFFECTIVE_RAIN_FRACTION = 0.8
+
+
+def _stack(forecasts, series, field, length):
+    """(cells x length) float array of one field; missing values are NaN."""
+    out = np.full((len(forecasts), length), np.nan)
+    for row, forecast in enumerate(forecasts):
+        values = forecast[series]['fields'].get(field)
+        if values:
+            values = np.asarray(values[:length], dtype=float)
+            out[row, :len(values)] = values
+    return out
+
+
+def _round(array):
+    return [None if np.isnan(v) else round(float(v), 1) for v in array]
+
+
+def _hour_offset(forecast, now):
+    """Index of the current local hour in a cell's hourly series."""
+    start = forecast['hourly'].get('start')
+    if not start:
+        return 0
+    local_now = now + datetime.timedelta(seconds=forecast.get('utc_offset_s', 0))
+    start = datetime.datetime.fromisoformat(start)
+    return max(0, int((local_now - start).total_seconds() // 3600))
+
+
+def compute_indices(forecasts, days=None, now=None):
+    """
+    Indices for each extended forecast in `forecasts` (a list), vectorised
+    across cells. Returns a list of dicts in the same order with keys
+    start_date, daily (columnar per-day series) and the summary fields of
+    AgroIndices.
+    """
+    if not forecasts:
+        return []
+    days = days or getattr(settings, 'AGRO_INDEX_DAYS', 7)
+    hours = days * 24
+    now = now or timezone.now().replace(tzinfo=None)
+    n = len(forecasts)
+
+    temp = _stack(forecasts, 'hourly', 'temperature_2m', hours)
+    rh = _stack(forecasts, 'hourly', 'relative_humidity_2m', hours)
+    rain = _stack(forecasts, 'hourly', 'precipitation', hours)
+    rain_prob = _stack(forecasts, 'hourly', 'precipitation_probability', hours)
+    wind = _stack(forecasts, 'hourly', 'wind_speed_10m', hours)
+    tmax = _stack(forecasts, 'daily', 'temperature_2m_max', days)
+    tmin = _stack(forecasts, 'daily', 'temperature_2m_min', days)
+    rain_day = _stack(forecasts, 'daily', 'precipitation_sum', days)
+    et0_day = _stack(forecasts, 'daily', 'et0_fao_evapotranspiration', days)
+
+    # Growing degree days
+    base = getattr(settings, 'AGRO_GDD_BASE_C', 10.0)
+    cap = getattr(settings, 'AGRO_GDD_CAP_C', 30.0)
+    gdd = (np.clip(tmax, base, cap) + np.clip(tmin, base, cap)) / 2 - base
+
+    # Spray windows: the hour and the next SPRAY_RAINFAST_H hours must be dry.
+    rain0 = np.nan_to_num(rain)
+    padded = np.concatenate([rain0, np.zeros((n, SPRAY_RAINFAST_H))], axis=1)
+    rain_ahead = np.lib.stride_tricks.sliding_window_view(padded, SPRAY_RAINFAST_H + 1, axis=1)[:, :hours].sum(axis=2)
+    with np.errstate(invalid='ignore'):
+        spray = (
+            (wind < SPRAY_MAX_WIND_KMH)
+            & (temp > SPRAY_MIN_TEMP_C) & (temp < SPRAY_MAX_TEMP_C)
+            & (rh >= SPRAY_MIN_RH)
+            & (rain_ahead < WET_RAIN_MM)
+            & ~(np.nan_to_num(rain_prob) > SPRAY_MAX_RAIN_PROBABILITY)
+        )
+        wet = (rh >= WET_RH) | (rain0 >= WET_RAIN_MM)
+        infection = wet & (temp >= DISEASE_TEMP_RANGE_C[0]) & (temp <= DISEASE_TEMP_RANGE_C[1])
+
+    spray_daily = spray.reshape(n, days, 24).sum(axis=2)
+    wet_daily = wet.reshape(n, days, 24).sum(axis=2)
+    risk_daily = np.searchsorted(DISEASE_RISK_HOURS, infection.reshape(n, days, 24).sum(axis=2), side='right')
+
+    effective_rain = np.nan_to_num(rain_day) * EFFECTIVE_RAIN_FRACTION
+    irrigation_need = np.clip(np.nansum(et0_day, axis=1) - effective_rain.sum(axis=1), 0, None)
+
+    results = []
+    for row, forecast in enumerate(forecasts):
+        offset = min(_hour_offset(forecast, now), hours)
+        upcoming = np.flatnonzero(spray[row, offset:])
+        next_window = ''
+        if upcoming.size:
+            start = datetime.datetime.fromisoformat(forecast['hourly']['start'])
+            next_window = (start + datetime.timedelta(hours=int(offset + upcoming[0]))).strftime('%Y-%m-%dT%H:%M')
+        start_date = (forecast['daily'].get('start') or forecast['hourly'].get('start') or '')[:10]
+        dates = []
+        if start_date:
+            first = datetime.date.fromisoformat(start_date)
+            dates = [(first + datetime.timedelta(days=d)).isoformat() for d in range(days)]
+        results.append({
+            'start_date': start_date or None,
+            'daily': {
+                'date': dates,
+                'gdd': _round(gdd[row]),
+                'spray_hours': spray_daily[row].tolist(),
+                'leaf_wetness_hours': wet_daily[row].tolist(),
+                'disease_risk': risk_daily[row].tolist(),
+                'et0_mm': _round(et0_day[row]),
+                'effective_rain_mm': _round(effective_rain[row]),
+            },
+            'gdd_total': round(float(np.nansum(gdd[row])), 1),
+            'spray_hours_24h': int(spray[row, offset:offset + 24].sum()),
+            'next_spray_window': next_window,
+            'disease_risk_max': int(risk_daily[row].max()),
+            'irrigation_need_mm': round(float(irrigation_need[row]), 1),
+        })
+    return results
+
+
+def store_indices(cell_forecasts):
+    """Compute and upsert AgroIndices for {cell: extended forecast}. Returns rows written."""
+    cells = [cell for cell, forecast in cell_forecasts.items() if forecast['hourly']['count']]
+    started = time.monotonic()
+    computed = compute_indices([cell_forecasts[cell] for cell in cells])
+    rows = [
+        AgroIndices(latitude=lat, longitude=lon, **values)
+        for (lat, lon), values in zip(cells, computed) if values['start_date']
+    ]
+    AgroIndices.objects.bulk_create(
+        rows, batch_size=1000, update_conflicts=True, unique_fields=['latitude', 'longitude'],
+        update_fields=[
+            'start_date', 'daily', 'gdd_total', 'spray_hours_24h', 'next_spray_window',
+            'disease_risk_max', 'irrigation_need_mm', 'computed_at',
+        ],
+    )
+    logger.info('Agro indices for %d cells computed in %.2fs', len(rows), time.monotonic() - started)
+    return len(rows)
+
+
+def indices_for(lat, lon):
+    """Stored AgroIndices for the grid cell containing (lat, lon), or None."""
+    cell_lat, cell_lon = forecast_cache.snap(lat, lon)
+    return AgroIndices.objects.filter(latitude=cell_lat, longitude=cell_lon).first()
+
+
+def describe(indices):
+    """One-paragraph plain-text summary, e.g. for Gemini prompts."""
+    risk = ('low', 'low', 'moderate', 'high')[indices.disease_risk_max]
+    parts = [
+        f'Growing degree days over the next {len(indices.daily.get("date", []))} days: {indices.gdd_total}.',
+        f'Hours suitable for spraying in the next 24 hours: {indices.spray_hours_24h}.',
+        f'Fungal disease risk from leaf wetness: {risk}.',
+        f'Estimated irrigation need (reference crop): {indices.irrigation_need_mm} mm.',
+    ]
+    return ' '.join(parts)
@@ -0,0 +1,44 @@
+import datetime
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ...archive import append
+from ...batch import group_by_cell, located_preferences
+from ...open_meteo import fetch_daily_history
+
+
+class Command(BaseCommand):
+    help = 'Append observed daily weather for every farmer grid cell to the local archive.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=7,
+            help='Refetch this many days up to yesterday; the overlap fills in nights that were missed.',
+        )
+        parser.add_argument('--since', help='Backfill from this date (YYYY-MM-DD) instead, one year per request.')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        end = datetime.date.today() - datetime.timedelta(days=1)
+        if options['since']:
+            try:
+                start = datetime.date.fromisoformat(options['since'])
+            except ValueError:
+                raise CommandError('--since must be YYYY-MM-DD.')
+        else:
+            start = end - datetime.timedelta(days=max(1, options['days']) - 1)
+        if start > end:
+            raise CommandError('Nothing to archive before yesterday.')
+
+        cells = list(group_by_cell(located_preferences().only('id', 'latitude', 'longitude')))
+        written = 0
+        chunk_start = start
+        while chunk_start <= end:
+            chunk_end = min(end, datetime.date(chunk_start.year, 12, 31))
+            written += append(fetch_daily_history(cells, chunk_start, chunk_end))
+            self.stdout.write(f'{chunk_start}..{chunk_end}: {written} cell-days so far')
+            chunk_start = chunk_end + datetime.timedelta(days=1)
+        self.stdout.write(self.style.SUCCESS(
+            f'{written} cell-days archived for {len(cells)} cells ({time.monotonic() - started:.1f}s).'
+        ))
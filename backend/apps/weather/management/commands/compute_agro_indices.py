@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from ...batch import group_by_cell, located_preferences, refresh_extended_forecasts
+from ...indices import store_indices
+
+
+class Command(BaseCommand):
+    help = 'Compute growing degree days, spray windows, disease risk and irrigation need for every farmer grid cell.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--refresh', action='store_true', help='Refetch forecasts even if the cached ones are fresh.')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        cells = group_by_cell(located_preferences().only('id', 'latitude', 'longitude'))
+        forecasts, fetched = refresh_extended_forecasts(cells, force=options['refresh'])
+        written = store_indices(forecasts)
+        self.stdout.write(self.style.SUCCESS(
+            f'{written} of {len(cells)} cells updated ({fetched} forecasts fetched, '
+            f'{time.monotonic() - started:.1f}s).'
+        ))
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from ...delivery import deliver, enabled_channels, enqueue_deliveries
+
+
+class Command(BaseCommand):
+    help = 'Send queued weather alerts by email / SMS (run on a schedule, e.g. every few minutes).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--channel', action='append', help='Channel to deliver (repeatable; default: all enabled).')
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--max-seconds', type=float, default=None, help='Stop claiming new batches after this long.')
+
+    def handle(self, *args, **options):
+        channels = options['channel'] or enabled_channels()
+        unknown = set(channels) - set(enabled_channels())
+        if unknown:
+            raise CommandError(f"Channel(s) not enabled in ALERT_DELIVERY_CHANNELS: {', '.join(sorted(unknown))}")
+
+        queued = enqueue_deliveries()
+        for channel in channels:
+            sent, failed = deliver(channel, batch_size=options['batch_size'], max_seconds=options['max_seconds'])
+            self.stdout.write(self.style.SUCCESS(
+                f'{channel}: {queued.get(channel, 0)} newly queued, {sent} sent, {failed} failed.'
+            ))
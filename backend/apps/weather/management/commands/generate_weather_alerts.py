@@ -0,0 +1,18 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from ...alerts import generate_alerts, prune_alerts
+
+
+class Command(BaseCommand):
+    help = "Evaluate frost / heat / heavy-rain thresholds for every saved location and store today's alerts."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--refresh', action='store_true', help='Refetch forecasts even if the cached ones are fresh.')
+
+    def handle(self, *args, **options):
+        farmers, created = generate_alerts(force_refresh=options['refresh'])
+        pruned = prune_alerts(getattr(settings, 'WEATHER_ALERT_RETENTION_DAYS', 30))
+        self.stdout.write(self.style.SUCCESS(
+            f'{farmers} farmers evaluated, {created} alerts created, {pruned} expired alerts deleted.'
+        ))
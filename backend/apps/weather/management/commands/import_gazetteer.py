@@ -0,0 +1,113 @@
+import csv
+import io
+import zipfile
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from ...gazetteer import reset_index, save_index
+from ...models import Place
+
+BATCH_SIZE = 5000
+UPDATE_FIELDS = [
+    'name', 'ascii_name', 'district', 'state', 'feature_code', 'latitude', 'longitude', 'population',
+]
+
+
+def _open_text(path):
+    """Open a GeoNames .txt file, or the single .txt inside a .zip (as downloaded)."""
+    if path.endswith('.zip'):
+        archive = zipfile.ZipFile(path)
+        name = next((n for n in archive.namelist() if n.endswith('.txt') and not n.startswith('readme')), None)
+        if name is None:
+            raise CommandError(f'No .txt file in {path}')
+        return io.TextIOWrapper(archive.open(name), encoding='utf-8')
+    return open(path, encoding='utf-8')
+
+
+def _read_codes(path):
+    """admin1CodesASCII.txt / admin2Codes.txt: code -> name."""
+    if not path:
+        return {}
+    with _open_text(path) as fh:
+        return {row[0]: row[1] for row in csv.reader(fh, delimiter='\t', quoting=csv.QUOTE_NONE) if len(row) > 1}
+
+
+class Command(BaseCommand):
+    help = (
+        'Import places from a GeoNames country dump (e.g. IN.zip from '
+        'download.geonames.org/export/dump/) into the offline gazetteer.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', help='GeoNames dump (.txt or .zip).')
+        parser.add_argument('--admin1', default='', help='admin1CodesASCII.txt, for state names.')
+        parser.add_argument('--admin2', default='', help='admin2Codes.txt, for district names.')
+        parser.add_argument('--feature-classes', default='P',
+                            help='Comma-separated GeoNames feature classes to keep (default: P, populated places).')
+        parser.add_argument('--min-population', type=int, default=0)
+        parser.add_argument('--country', default='IN')
+        parser.add_argument('--replace', action='store_true', help='Delete existing places first.')
+        parser.add_argument('--index-only', action='store_true',
+                            help='Only rewrite the saved search index (GAZETTEER_INDEX_PATH) from the table.')
+
+    def handle(self, *args, **options):
+        if options['index_only']:
+            self._save_index()
+            return
+        if not options['path']:
+            raise CommandError('Pass a GeoNames dump, or --index-only.')
+        states = _read_codes(options['admin1'])
+        districts = _read_codes(options['admin2'])
+        classes = {c.strip().upper() for c in options['feature_classes'].split(',') if c.strip()}
+        country = options['country'].upper()
+
+        if options['replace']:
+            Place.objects.all().delete()
+
+        imported = 0
+        batch = []
+        with _open_text(options['path']) as fh:
+            for row in csv.reader(fh, delimiter='\t', quoting=csv.QUOTE_NONE):
+                if len(row) < 15 or row[8] != country or row[6] not in classes:
+                    continue
+                population = int(row[14] or 0)
+                if population < options['min_population']:
+                    continue
+                batch.append(Place(
+                    geoname_id=int(row[0]),
+                    name=row[1][:200],
+                    ascii_name=row[2][:200],
+                    district=districts.get(f'{row[8]}.{row[10]}.{row[11]}', '')[:200],
+                    state=states.get(f'{row[8]}.{row[10]}', '')[:200],
+                    feature_code=row[7][:10],
+                    latitude=float(row[4]),
+                    longitude=float(row[5]),
+                    population=population,
+                ))
+                if len(batch) >= BATCH_SIZE:
+                    imported += self._save(batch)
+                    batch = []
+        imported += self._save(batch)
+
+        reset_index()
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {imported} places ({Place.objects.count()} in gazetteer). '
+            'Running processes pick up the new data after a restart.'
+        ))
+        self._save_index()
+
+    def _save_index(self):
+        if not settings.GAZETTEER_INDEX_PATH:
+            return
+        try:
+            path = save_index()
+        except OSError as exc:
+            raise CommandError(f'Could not write the gazetteer index: {exc}')
+        self.stdout.write(f'Search index saved to {path}; deploy it with the application.')
+
+    def _save(self, batch):
+        Place.objects.bulk_create(
+            batch, update_conflicts=True, unique_fields=['geoname_id'], update_fields=UPDATE_FIELDS,
+        )
+        return len(batch)
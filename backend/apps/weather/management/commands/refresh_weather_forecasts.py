@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from ...batch import group_by_cell, located_preferences, refresh_forecasts
+
+
+class Command(BaseCommand):
+    help = 'Refresh cached 24-hour forecasts for every saved farmer location in batched Open-Meteo calls.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Refetch cells even if their cached forecast is fresh.')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        cells = group_by_cell(located_preferences().only('id', 'latitude', 'longitude'))
+        forecasts, fetched = refresh_forecasts(cells, force=options['force'])
+        farmers = sum(len(members) for members in cells.values())
+        self.stdout.write(self.style.SUCCESS(
+            f'{farmers} farmers in {len(cells)} cells: {fetched} fetched, '
+            f'{len(cells) - len(forecasts)} unavailable ({time.monotonic() - started:.1f}s).'
+        ))
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.30 on 2026-10-17 20:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('weather', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='weatheralert',
+            name='kind',
+            field=models.CharField(blank=True, choices=[('frost', 'Frost'), ('heat', 'Heat wave'), ('heavy_rain', 'Heavy rain')], default='', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='weatheralert',
+            name='valid_on',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='weatheralert',
+            index=models.Index(fields=['user', '-created_at'], name='weather_wea_user_id_736b1c_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='weatheralert',
+            constraint=models.UniqueConstraint(condition=models.Q(('valid_on__isnull', False)), fields=('user', 'kind', 'valid_on'), name='weather_alert_once_per_day'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.30 on 2026-10-17 20:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('weather', '0002_weatheralert_kind'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Place',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('geoname_id', models.BigIntegerField(unique=True)),
+                ('name', models.CharField(max_length=200)),
+                ('ascii_name', models.CharField(max_length=200)),
+                ('district', models.CharField(blank=True, default='', max_length=200)),
+                ('state', models.CharField(blank=True, default='', max_length=200)),
+                ('feature_code', models.CharField(blank=True, default='', max_length=10)),
+                ('latitude', models.FloatField()),
+                ('longitude', models.FloatField()),
+                ('population', models.BigIntegerField(default=0)),
+            ],
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.30 on 2026-10-17 21:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('weather', '0003_place'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AgroIndices',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('latitude', models.FloatField()),
+                ('longitude', models.FloatField()),
+                ('start_date', models.DateField()),
+                ('daily', models.JSONField(default=dict)),
+                ('gdd_total', models.FloatField(default=0)),
+                ('spray_hours_24h', models.PositiveSmallIntegerField(default=0)),
+                ('next_spray_window', models.CharField(blank=True, default='', max_length=20)),
+                ('disease_risk_max', models.PositiveSmallIntegerField(default=0)),
+                ('irrigation_need_mm', models.FloatField(default=0)),
+                ('computed_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='agroindices',
+            constraint=models.UniqueConstraint(fields=('latitude', 'longitude'), name='agro_indices_one_per_cell'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.30 on 2026-10-17 22:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('weather', '0005_alertdelivery'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WeatherArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('latitude', models.FloatField()),
+                ('longitude', models.FloatField()),
+                ('year', models.PositiveSmallIntegerField()),
+                ('fields', models.CharField(max_length=500)),
+                ('data', models.BinaryField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='weatherarchive',
+            constraint=models.UniqueConstraint(fields=('latitude', 'longitude', 'year'), name='weather_archive_one_per_cell_year'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.30 on 2026-10-18 00:10
+
+from django.db import migrations, models
+
+
+def drop_unconsented_sms(apps, schema_editor):
+    # SMS queued before opt-in existed was never consented to.
+    AlertDelivery = apps.get_model('weather', 'AlertDelivery')
+    AlertDelivery.objects.filter(channel='sms', status__in=['pending', 'sending']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('weather', '0006_weatherarchive'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='weatherpreference',
+            name='sms_alerts',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunPython(drop_unconsented_sms, migrations.RunPython.noop),
+    ]
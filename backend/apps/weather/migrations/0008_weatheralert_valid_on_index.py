@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-18 00:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('weather', '0007_weatherpreference_sms_alerts'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='weatheralert',
+            index=models.Index(fields=['valid_on'], name='weather_alert_valid_on'),
+        ),
+    ]
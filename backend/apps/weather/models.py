@@ -1,5 +1,8 @@
+from zoneinfo import ZoneInfo
+
 from django.conf import settings
 from django.db import models
+from django.utils import timezone
 
 
 class WeatherPreference(models.Model):
@@ -12,6 +15,8 @@ class WeatherPreference(models.Model):
     longitude = models.FloatField(null=True, blank=True)
     location_name = models.CharField(max_length=200, blank=True, default='')
     email_alerts = models.BooleanField(default=True)
+    # Paid SMS is only sent to farmers who switch this on.
+    sms_alerts = models.BooleanField(default=False)
     alert_frost = models.BooleanField(default=True)
     alert_heavy_rain = models.BooleanField(default=True)
     alert_heat = models.BooleanField(default=True)
@@ -22,6 +27,17 @@ class WeatherPreference(models.Model):
 
 
 class WeatherAlert(models.Model):
+    KIND_FROST = 'frost'
+    KIND_HEAT = 'heat'
+    KIND_HEAVY_RAIN = 'heavy_rain'
+    KIND_CHOICES = [
+        (KIND_FROST, 'Frost'),
+        (KIND_HEAT, 'Heat wave'),
+        (KIND_HEAVY_RAIN, 'Heavy rain'),
+    ]
+    # valid_on is an Indian calendar date whatever settings.TIME_ZONE is.
+    TIMEZONE = ZoneInfo('Asia/Kolkata')
+
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
@@ -30,10 +46,134 @@ class WeatherAlert(models.Model):
     title = models.CharField(max_length=200)
     body = models.TextField()
     read = models.BooleanField(default=False)
+    # Set on forecast alerts written by generate_weather_alerts; blank for other notifications.
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES, blank=True, default='')
+    valid_on = models.DateField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', '-created_at']),
+            models.Index(fields=['valid_on'], name='weather_alert_valid_on'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'kind', 'valid_on'],
+                condition=models.Q(valid_on__isnull=False),
+                name='weather_alert_once_per_day',
+            ),
+        ]
 
     def __str__(self):
         return self.title
+
+    @classmethod
+    def today(cls):
+        """Today's date in India, the calendar valid_on uses."""
+        return timezone.localdate(timezone=cls.TIMEZONE)
+
+
+class Place(models.Model):
+    """Gazetteer entry (GeoNames), loaded with manage.py import_gazetteer."""
+
+    geoname_id = models.BigIntegerField(unique=True)
+    name = models.CharField(max_length=200)
+    ascii_name = models.CharField(max_length=200)
+    district = models.CharField(max_length=200, blank=True, default='')
+    state = models.CharField(max_length=200, blank=True, default='')
+    feature_code = models.CharField(max_length=10, blank=True, default='')
+    latitude = models.FloatField()
+    longitude = models.FloatField()
+    population = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return ', '.join(p for p in (self.name, self.district, self.state) if p)
+
+
+class AgroIndices(models.Model):
+    """
+    Agro-meteorological indices for one forecast grid cell, recomputed by
+    manage.py compute_agro_indices. `daily` holds columnar per-day series
+    (see apps.weather.indices); the scalar fields summarise the next days.
+    """
+
+    latitude = models.FloatField()
+    longitude = models.FloatField()
+    start_date = models.DateField()
+    daily = models.JSONField(default=dict)
+    gdd_total = models.FloatField(default=0)
+    spray_hours_24h = models.PositiveSmallIntegerField(default=0)
+    next_spray_window = models.CharField(max_length=20, blank=True, default='')
+    disease_risk_max = models.PositiveSmallIntegerField(default=0)
+    irrigation_need_mm = models.FloatField(default=0)
+    computed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['latitude', 'longitude'], name='agro_indices_one_per_cell'),
+        ]
+
+    def __str__(self):
+        return f'{self.latitude},{self.longitude} from {self.start_date}'
+
+
+class AlertDelivery(models.Model):
+    """One out-of-band delivery of a WeatherAlert (see apps.weather.delivery)."""
+
+    CHANNEL_EMAIL = 'email'
+    CHANNEL_SMS = 'sms'
+    CHANNEL_CHOICES = [(CHANNEL_EMAIL, 'Email'), (CHANNEL_SMS, 'SMS')]
+
+    STATUS_PENDING = 'pending'
+    STATUS_SENDING = 'sending'
+    STATUS_SENT = 'sent'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_SENDING, 'Sending'),
+        (STATUS_SENT, 'Sent'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    alert = models.ForeignKey(WeatherAlert, on_delete=models.CASCADE, related_name='deliveries')
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='alert_deliveries')
+    channel = models.CharField(max_length=10, choices=CHANNEL_CHOICES)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True, default='')
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['channel', 'status', 'created_at'])]
+        constraints = [
+            models.UniqueConstraint(fields=['alert', 'channel'], name='alert_delivery_once_per_channel'),
+        ]
+
+    def __str__(self):
+        return f'{self.alert_id} via {self.channel}: {self.status}'
+
+
+class WeatherArchive(models.Model):
+    """
+    One year of observed daily weather for a grid cell (see
+    apps.weather.archive). `data` holds a float32 array of shape
+    (len(fields), 366) indexed by day of year; days not yet archived are NaN.
+    """
+
+    latitude = models.FloatField()
+    longitude = models.FloatField()
+    year = models.PositiveSmallIntegerField()
+    fields = models.CharField(max_length=500)
+    data = models.BinaryField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['latitude', 'longitude', 'year'], name='weather_archive_one_per_cell_year'),
+        ]
+
+    def __str__(self):
+        return f'{self.latitude},{self.longitude} {self.year}'
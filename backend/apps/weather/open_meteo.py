@@ -0,0 +1,187 @@
+"""
+Open-Meteo forecast API (free, no key needed).
+
+fetch_forecasts() uses the API's support for comma-separated coordinate
+lists: one request returns a list of per-location results in the order
+asked, so refreshing thousands of grid cells takes a few dozen calls. The
+same batching serves past daily weather from the forecast and archive APIs.
+"""
+import datetime
+import logging
+
+from django.conf import settings
+
+from apps import http_client
+
+logger = logging.getLogger(__name__)
+
+OPEN_METEO_WEATHER = 'https://api.open-meteo.com/v1/forecast'
+OPEN_METEO_ARCHIVE = 'https://archive-api.open-meteo.com/v1/archive'
+FORECAST_HOURLY = 'temperature_2m,precipitation'
+
+
+def fetch_current(lat, lon):
+    """Fetch current weather for one location."""
+    resp = http_client.get(OPEN_METEO_WEATHER, params={
+        'latitude': lat,
+        'longitude': lon,
+        'current_weather': 'true',
+    })
+    resp.raise_for_status()
+    data = resp.json()
+    cw = data.get('current_weather', {})
+    return {
+        'temperature': cw.get('temperature'),
+        'wind_speed': cw.get('windspeed'),
+        'precipitation': None,
+        'weather_code': cw.get('weathercode'),
+    }
+
+
+def _parse_forecast(data):
+    hourly = data.get('hourly', {})
+    temps = hourly.get('temperature_2m', [])
+    precips = hourly.get('precipitation', [])
+    return temps, precips
+
+
+def fetch_forecast(lat, lon):
+    """Fetch 24-hour forecast for alert generation."""
+    resp = http_client.get(OPEN_METEO_WEATHER, params={
+        'latitude': lat,
+        'longitude': lon,
+        'hourly': FORECAST_HOURLY,
+        'forecast_days': 1,
+    })
+    resp.raise_for_status()
+    return _parse_forecast(resp.json())
+
+
+def _fetch_batched(cells, params, parse, batch_size=None, url=OPEN_METEO_WEATHER):
+    batch_size = batch_size or getattr(settings, 'WEATHER_BATCH_SIZE', 100)
+    cells = list(dict.fromkeys(cells))
+    results = {}
+    for start in range(0, len(cells), batch_size):
+        batch = cells[start:start + batch_size]
+        try:
+            resp = http_client.get(url, params={
+                'latitude': ','.join(f'{lat:.4f}' for lat, _ in batch),
+                'longitude': ','.join(f'{lon:.4f}' for _, lon in batch),
+                **params,
+            }, timeout=30)
+            resp.raise_for_status()
+            data = resp.json()
+        except Exception:
+            logger.exception('Batched forecast fetch failed for %d cells', len(batch))
+            continue
+        # A single coordinate comes back as an object, several as a list.
+        if isinstance(data, dict):
+            data = [data]
+        if len(data) != len(batch):
+            logger.error('Open-Meteo returned %d results for %d cells', len(data), len(batch))
+            continue
+        for cell, item in zip(batch, data):
+            results[cell] = parse(item)
+    return results
+
+
+def fetch_forecasts(cells, batch_size=None):
+    """
+    Fetch 24-hour forecasts for many (lat, lon) cells, batch_size per request.
+
+    Returns {cell: (temps, precips)}. Cells in a batch that failed are
+    missing from the result; the caller decides whether to retry them.
+    """
+    return _fetch_batched(cells, {'hourly': FORECAST_HOURLY, 'forecast_days': 1}, _parse_forecast, batch_size)
+
+
+# Series served by the extended forecast endpoint (ForecastView).
+HOURLY_FIELDS = (
+    'temperature_2m', 'relative_humidity_2m', 'precipitation', 'precipitation_probability',
+    'wind_speed_10m', 'soil_moisture_0_to_1cm', 'soil_moisture_3_to_9cm', 'et0_fao_evapotranspiration',
+)
+DAILY_FIELDS = (
+    'temperature_2m_max', 'temperature_2m_min', 'precipitation_sum', 'precipitation_probability_max',
+    'relative_humidity_2m_max', 'relative_humidity_2m_min', 'wind_speed_10m_max', 'et0_fao_evapotranspiration',
+)
+MAX_FORECAST_DAYS = 16
+
+
+def _columns(block, units, fields):
+    """Open-Meteo series block -> {'start', 'count', 'fields': {name: values}, 'units'}; times are implied."""
+    times = block.get('time', [])
+    return {
+        'start': times[0] if times else None,
+        'count': len(times),
+        'fields': {name: block.get(name, []) for name in fields if name in block},
+        'units': {name: units.get(name, '') for name in fields if name in block},
+    }
+
+
+def _extended_params():
+    return {
+        'hourly': ','.join(HOURLY_FIELDS),
+        'daily': ','.join(DAILY_FIELDS),
+        'forecast_days': MAX_FORECAST_DAYS,
+        'timezone': 'auto',
+    }
+
+
+def _parse_extended(data):
+    hourly = _columns(data.get('hourly', {}), data.get('hourly_units', {}), HOURLY_FIELDS)
+    hourly['interval_s'] = 3600
+    daily = _columns(data.get('daily', {}), data.get('daily_units', {}), DAILY_FIELDS)
+    daily['interval_s'] = 86400
+    return {
+        'timezone': data.get('timezone', ''),
+        'utc_offset_s': data.get('utc_offset_seconds', 0),
+        'hourly': hourly,
+        'daily': daily,
+    }
+
+
+def fetch_extended_forecast(lat, lon):
+    """Hourly and daily series for MAX_FORECAST_DAYS days, in columnar form."""
+    resp = http_client.get(OPEN_METEO_WEATHER, params={
+        'latitude': lat,
+        'longitude': lon,
+        **_extended_params(),
+    })
+    resp.raise_for_status()
+    return _parse_extended(resp.json())
+
+
+def fetch_extended_forecasts(cells, batch_size=None):
+    """fetch_extended_forecast for many cells; same batching contract as fetch_forecasts."""
+    return _fetch_batched(cells, _extended_params(), _parse_extended, batch_size)
+
+
+# Daily observations kept in the local archive (apps.weather.archive).
+HISTORY_FIELDS = (
+    'temperature_2m_max', 'temperature_2m_min', 'temperature_2m_mean', 'precipitation_sum',
+    'et0_fao_evapotranspiration', 'wind_speed_10m_max',
+)
+# The forecast API serves recent past days; older ones come from the
+# reanalysis archive, which lags a few days behind.
+RECENT_HISTORY_DAYS = 90
+
+
+def _parse_history(data):
+    return _columns(data.get('daily', {}), data.get('daily_units', {}), HISTORY_FIELDS)
+
+
+def fetch_daily_history(cells, start, end, batch_size=None):
+    """
+    Daily HISTORY_FIELDS for many cells between two dates (inclusive), local
+    time. Returns {cell: {'start', 'count', 'fields', 'units'}}; same batching
+    contract as fetch_forecasts.
+    """
+    recent = (datetime.date.today() - start).days <= RECENT_HISTORY_DAYS
+    params = {
+        'daily': ','.join(HISTORY_FIELDS),
+        'start_date': start.isoformat(),
+        'end_date': end.isoformat(),
+        'timezone': 'auto',
+    }
+    url = OPEN_METEO_WEATHER if recent else OPEN_METEO_ARCHIVE
+    return _fetch_batched(cells, params, _parse_history, batch_size, url=url)
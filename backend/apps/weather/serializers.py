@@ -7,7 +7,7 @@ class WeatherPreferenceSerializer(serializers.ModelSerializer):
         model = WeatherPreference
         fields = [
             'latitude', 'longitude', 'location_name',
-            'email_alerts', 'alert_frost', 'alert_heavy_rain', 'alert_heat',
+            'email_alerts', 'sms_alerts', 'alert_frost', 'alert_heavy_rain', 'alert_heat',
         ]
 
 
@@ -5,5 +5,7 @@ urlpatterns = [
     path('weather/preferences/', views.WeatherPreferencesView.as_view()),
     path('weather/geocode/', views.GeocodeView.as_view()),
     path('weather/current/', views.CurrentWeatherView.as_view()),
+    path('weather/forecast/', views.ForecastView.as_view()),
+    path('weather/history/', views.WeatherHistoryView.as_view()),
     path('weather/alerts/', views.WeatherAlertsView.as_view()),
 ]
@@ -1,33 +1,43 @@
+import datetime
 import logging
-import requests as http_requests
+import time
+from django.conf import settings
+from django.utils import timezone
 from rest_framework import status
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from apps import http_client
+from . import archive, forecast_cache, gazetteer
+from .open_meteo import (
+    DAILY_FIELDS, HISTORY_FIELDS, HOURLY_FIELDS, MAX_FORECAST_DAYS, fetch_current, fetch_extended_forecast,
+)
 from .models import WeatherPreference, WeatherAlert
 from .serializers import WeatherPreferenceSerializer, WeatherAlertSerializer
 
 logger = logging.getLogger(__name__)
 
-OPEN_METEO_WEATHER = 'https://api.open-meteo.com/v1/forecast'
 OPEN_METEO_GEOCODE = 'https://geocoding-api.open-meteo.com/v1/search'
 NOMINATIM_REVERSE = 'https://nominatim.openstreetmap.org/reverse'
 
-FROST_THRESHOLD_C = 2.0
-HEAT_THRESHOLD_C = 40.0
-HEAVY_RAIN_THRESHOLD_MM = 20.0
-
 
 def _reverse_geocode(lat, lon):
-    """Resolve lat/lon to a human-readable place name via Nominatim."""
+    """Resolve lat/lon to a human-readable place name (local gazetteer, then Nominatim)."""
+    try:
+        local = gazetteer.reverse(lat, lon)
+    except Exception:
+        logger.exception('Gazetteer reverse lookup failed')
+        local = ''
+    if local:
+        return local
     try:
-        resp = http_requests.get(NOMINATIM_REVERSE, params={
+        resp = http_client.get(NOMINATIM_REVERSE, params={
             'lat': lat,
             'lon': lon,
             'format': 'json',
             'zoom': 10,
             'addressdetails': 1,
-        }, headers={'User-Agent': 'Agromod/1.0'}, timeout=10)
+        })
         resp.raise_for_status()
         data = resp.json()
         addr = data.get('address', {})
@@ -41,73 +51,6 @@ def _reverse_geocode(lat, lon):
         return ''
 
 
-def _fetch_weather(lat, lon):
-    """Fetch current weather from Open-Meteo (free, no key needed)."""
-    resp = http_requests.get(OPEN_METEO_WEATHER, params={
-        'latitude': lat,
-        'longitude': lon,
-        'current_weather': 'true',
-    }, timeout=10)
-    resp.raise_for_status()
-    data = resp.json()
-    cw = data.get('current_weather', {})
-    return {
-        'temperature': cw.get('temperature'),
-        'wind_speed': cw.get('windspeed'),
-        'precipitation': None,
-        'weather_code': cw.get('weathercode'),
-    }
-
-
-def _fetch_forecast(lat, lon):
-    """Fetch 24-hour forecast for alert generation."""
-    resp = http_requests.get(OPEN_METEO_WEATHER, params={
-        'latitude': lat,
-        'longitude': lon,
-        'hourly': 'temperature_2m,precipitation',
-        'forecast_days': 1,
-    }, timeout=10)
-    resp.raise_for_status()
-    data = resp.json()
-    hourly = data.get('hourly', {})
-    temps = hourly.get('temperature_2m', [])
-    precips = hourly.get('precipitation', [])
-    return temps, precips
-
-
-def _generate_live_alerts(lat, lon, prefs):
-    """Generate live weather alerts based on forecast data and user prefs."""
-    alerts = []
-    try:
-        temps, precips = _fetch_forecast(lat, lon)
-    except Exception:
-        logger.exception('Failed to fetch forecast for alerts')
-        return alerts
-
-    if prefs.alert_frost and temps:
-        min_temp = min(temps)
-        if min_temp <= FROST_THRESHOLD_C:
-            alerts.append({
-                'message': f'Frost warning: temperature may drop to {min_temp:.1f}°C in the next 24 hours.',
-            })
-
-    if prefs.alert_heat and temps:
-        max_temp = max(temps)
-        if max_temp >= HEAT_THRESHOLD_C:
-            alerts.append({
-                'message': f'Heat wave alert: temperature may reach {max_temp:.1f}°C in the next 24 hours.',
-            })
-
-    if prefs.alert_heavy_rain and precips:
-        total_rain = sum(p for p in precips if p)
-        if total_rain >= HEAVY_RAIN_THRESHOLD_MM:
-            alerts.append({
-                'message': f'Heavy rain alert: up to {total_rain:.1f} mm of rain expected in the next 24 hours.',
-            })
-
-    return alerts
-
-
 class WeatherPreferencesView(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -140,12 +83,19 @@ class GeocodeView(APIView):
         if not query:
             return Response({'results': []})
         try:
-            resp = http_requests.get(OPEN_METEO_GEOCODE, params={
+            local = gazetteer.search(query)
+        except Exception:
+            logger.exception('Gazetteer search failed')
+            local = []
+        if local:
+            return Response({'results': local})
+        try:
+            resp = http_client.get(OPEN_METEO_GEOCODE, params={
                 'name': query,
                 'count': 5,
                 'language': 'en',
                 'format': 'json',
-            }, timeout=10)
+            })
             resp.raise_for_status()
             data = resp.json()
             results = []
@@ -175,7 +125,7 @@ class CurrentWeatherView(APIView):
             return Response({'current': {}, 'location_name': pref.location_name})
 
         try:
-            current = _fetch_weather(pref.latitude, pref.longitude)
+            current = forecast_cache.get_or_fetch('current', pref.latitude, pref.longitude, fetch_current)
         except Exception:
             logger.exception('Failed to fetch weather')
             return Response({'current': {}, 'location_name': pref.location_name})
@@ -183,24 +133,160 @@ class CurrentWeatherView(APIView):
         return Response({'current': current, 'location_name': pref.location_name})
 
 
-class WeatherAlertsView(APIView):
+def _slice_series(series, count, fields):
+    return {
+        'start': series['start'],
+        'interval_s': series['interval_s'],
+        'count': min(count, series['count']),
+        'fields': {name: values[:count] for name, values in series['fields'].items() if name in fields},
+        'units': {name: unit for name, unit in series['units'].items() if name in fields},
+    }
+
+
+class ForecastView(APIView):
+    """
+    Multi-day hourly and daily series for the user's saved location (or
+    ?lat=&lon=), as columnar arrays: each series has a start time, an
+    interval and one value list per field.
+
+    Query params: days (1-16, default 7), fields (comma-separated; default
+    all), series ('hourly', 'daily' or both).
+    """
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        stored = WeatherAlert.objects.filter(user=request.user)
-        serialized = WeatherAlertSerializer(stored, many=True).data
+        params = request.query_params
+        try:
+            days = int(params.get('days', 7))
+        except ValueError:
+            days = 0
+        if not 1 <= days <= MAX_FORECAST_DAYS:
+            return Response({'error': f'days must be between 1 and {MAX_FORECAST_DAYS}.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        series = {s.strip() for s in params.get('series', 'hourly,daily').split(',') if s.strip()}
+        if not series or not series <= {'hourly', 'daily'}:
+            return Response({'error': "series must be 'hourly', 'daily' or both."}, status=status.HTTP_400_BAD_REQUEST)
+
+        available = set(HOURLY_FIELDS) | set(DAILY_FIELDS)
+        fields = {f.strip() for f in params.get('fields', '').split(',') if f.strip()} or available
+        unknown = sorted(fields - available)
+        if unknown:
+            return Response(
+                {'error': f"Unknown fields: {', '.join(unknown)}.", 'available': sorted(available)},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        location_name = ''
+        if params.get('lat') and params.get('lon'):
+            try:
+                lat, lon = forecast_cache.parse_point(params['lat'], params['lon'])
+            except ValueError:
+                return Response({'error': 'Invalid lat/lon.'}, status=status.HTTP_400_BAD_REQUEST)
+        else:
+            pref = WeatherPreference.objects.filter(user=request.user).first()
+            if pref is None or pref.latitude is None or pref.longitude is None:
+                return Response({'error': 'No location saved.'}, status=status.HTTP_404_NOT_FOUND)
+            lat, lon, location_name = pref.latitude, pref.longitude, pref.location_name
 
-        live = []
         try:
-            pref = WeatherPreference.objects.get(user=request.user)
-            if pref.latitude is not None and pref.longitude is not None:
-                live = _generate_live_alerts(pref.latitude, pref.longitude, pref)
-        except WeatherPreference.DoesNotExist:
-            pass
+            forecast = forecast_cache.get_or_fetch('extended', lat, lon, fetch_extended_forecast)
         except Exception:
-            logger.exception('Error generating live alerts')
+            logger.exception('Failed to fetch extended forecast')
+            return Response({'error': 'Forecast temporarily unavailable.'}, status=status.HTTP_502_BAD_GATEWAY)
+
+        cell_lat, cell_lon = forecast_cache.snap(lat, lon)
+        data = {
+            'location_name': location_name,
+            'latitude': cell_lat,
+            'longitude': cell_lon,
+            'timezone': forecast['timezone'],
+            'utc_offset_s': forecast['utc_offset_s'],
+        }
+        if 'hourly' in series:
+            data['hourly'] = _slice_series(forecast['hourly'], days * 24, fields)
+        if 'daily' in series:
+            data['daily'] = _slice_series(forecast['daily'], days, fields)
+
+        response = Response(data)
+        max_age = max(0, int(forecast_cache.fresh_until('extended') - time.time()))
+        response['Cache-Control'] = f'private, max-age={max_age}'
+        return response
+
+
+MAX_HISTORY_DAYS = 366 * 10
+
+
+class WeatherHistoryView(APIView):
+    """
+    Archived daily weather (see apps.weather.archive) for the user's saved
+    location (or ?lat=&lon=) as columnar arrays, with a rainfall and
+    temperature summary of the range.
+
+    Query params: start, end (YYYY-MM-DD, inclusive; default the last 365
+    days), fields (comma-separated; default all).
+    """
+    permission_classes = [IsAuthenticated]
 
-        return Response({'alerts': serialized, 'live': live})
+    def get(self, request):
+        params = request.query_params
+        yesterday = timezone.localdate() - datetime.timedelta(days=1)
+        try:
+            end = datetime.date.fromisoformat(params['end']) if params.get('end') else yesterday
+            start = (
+                datetime.date.fromisoformat(params['start']) if params.get('start')
+                else end - datetime.timedelta(days=364)
+            )
+        except ValueError:
+            return Response({'error': 'start and end must be YYYY-MM-DD.'}, status=status.HTTP_400_BAD_REQUEST)
+        if start > end or (end - start).days >= MAX_HISTORY_DAYS:
+            return Response(
+                {'error': f'start must not be after end, and the range is limited to {MAX_HISTORY_DAYS} days.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        fields = {f.strip() for f in params.get('fields', '').split(',') if f.strip()} or set(HISTORY_FIELDS)
+        unknown = sorted(fields - set(HISTORY_FIELDS))
+        if unknown:
+            return Response(
+                {'error': f"Unknown fields: {', '.join(unknown)}.", 'available': list(HISTORY_FIELDS)},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        location_name = ''
+        if params.get('lat') and params.get('lon'):
+            try:
+                lat, lon = forecast_cache.parse_point(params['lat'], params['lon'])
+            except ValueError:
+                return Response({'error': 'Invalid lat/lon.'}, status=status.HTTP_400_BAD_REQUEST)
+        else:
+            pref = WeatherPreference.objects.filter(user=request.user).first()
+            if pref is None or pref.latitude is None or pref.longitude is None:
+                return Response({'error': 'No location saved.'}, status=status.HTTP_404_NOT_FOUND)
+            lat, lon, location_name = pref.latitude, pref.longitude, pref.location_name
+
+        data = archive.query(lat, lon, start, end, fields)
+        data['location_name'] = location_name
+        return Response(data)
+
+
+class WeatherAlertsView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        # Forecast alerts are precomputed by generate_weather_alerts; today's
+        # are returned as `live`, the newest ?limit= others as stored
+        # notifications (older ones are pruned by the same job).
+        page_size = getattr(settings, 'WEATHER_ALERTS_PAGE_SIZE', 50)
+        try:
+            limit = min(max(int(request.query_params.get('limit', page_size)), 1), 4 * page_size)
+        except ValueError:
+            limit = page_size
+        today = WeatherAlert.today()
+        alerts = WeatherAlert.objects.filter(user=request.user).order_by('-created_at')
+        live = [{'message': body} for body in alerts.filter(valid_on=today).values_list('body', flat=True)]
+        stored = list(alerts.exclude(valid_on=today)[:limit + 1])
+        serialized = WeatherAlertSerializer(stored[:limit], many=True).data
+        return Response({'alerts': serialized, 'live': live, 'has_more': len(stored) > limit})
 
     def patch(self, request):
         ids = request.data.get('mark_read', [])
@@ -1,13 +1,18 @@
 """
 Yield prediction and crop suggestion using Google Gemini.
 
-Fetches live weather data for the region and instructs Gemini to
-factor in current conditions and historical yield/profit numbers.
+Fetches live weather data for the region (plus the archived rainfall of
+the season for exact locations) and instructs Gemini to factor in current
+conditions and historical yield/profit numbers.
 """
+import asyncio
 import logging
-import requests as http_requests
+from asgiref.sync import sync_to_async
 
-from apps.gemini_client import ask_text
+from apps import http_client
+from apps.gemini_client import aask_text, ask_text
+from apps.weather.archive import describe_season
+from apps.weather.indices import describe, indices_for
 
 logger = logging.getLogger(__name__)
 
@@ -33,24 +38,23 @@ STATE_COORDS = {
 }
 
 
-def _fetch_weather(state: str, latitude: float = None, longitude: float = None) -> str:
-    """Fetch current weather from Open-Meteo. Uses exact lat/lon when provided, else falls back to state centre."""
+def _coords(state: str, latitude: float = None, longitude: float = None):
     if latitude is not None and longitude is not None:
-        lat, lon = latitude, longitude
-    else:
-        coords = STATE_COORDS.get(state)
-        if not coords:
-            return "Weather data not available for this region."
-        lat, lon = coords
+        return latitude, longitude
+    return STATE_COORDS.get(state)
+
+
+def _fetch_forecast(lat: float, lon: float) -> str:
+    """Current weather and 7-day forecast from Open-Meteo (HTTP only, no DB access)."""
     try:
-        resp = http_requests.get(WEATHER_URL, params={
+        resp = http_client.get(WEATHER_URL, params={
             "latitude": lat,
             "longitude": lon,
             "current_weather": "true",
             "daily": "temperature_2m_max,temperature_2m_min,precipitation_sum",
             "forecast_days": 7,
             "timezone": "Asia/Kolkata",
-        }, timeout=10)
+        })
         resp.raise_for_status()
         data = resp.json()
 
@@ -77,6 +81,48 @@ def _fetch_weather(state: str, latitude: float = None, longitude: float = None)
         return "Weather data temporarily unavailable."
 
 
+def _local_weather(lat: float, lon: float) -> list[str]:
+    """Stored agro indices and archived season rainfall for an exact location (DB only)."""
+    lines = []
+    try:
+        agro = indices_for(lat, lon)
+        if agro is not None:
+            lines.append(describe(agro))
+        season = describe_season(lat, lon)
+        if season:
+            lines.append(season)
+    except Exception:
+        logger.exception("Failed to read stored weather for yield prediction")
+    return lines
+
+
+def _fetch_weather(state: str, latitude: float = None, longitude: float = None) -> str:
+    """Fetch current weather from Open-Meteo. Uses exact lat/lon when provided, else falls back to state centre."""
+    coords = _coords(state, latitude, longitude)
+    if not coords:
+        return "Weather data not available for this region."
+    lines = [_fetch_forecast(*coords)]
+    if latitude is not None and longitude is not None:
+        lines.extend(_local_weather(latitude, longitude))
+    return "\n".join(lines)
+
+
+async def _afetch_weather(state: str, latitude: float = None, longitude: float = None) -> str:
+    """
+    Async _fetch_weather. The Open-Meteo call runs in a worker thread; the
+    DB lookups run concurrently on the thread-sensitive executor, whose
+    connection Django closes at the end of the request.
+    """
+    coords = _coords(state, latitude, longitude)
+    if not coords:
+        return "Weather data not available for this region."
+    forecast = sync_to_async(_fetch_forecast, thread_sensitive=False)(*coords)
+    if latitude is None or longitude is None:
+        return await forecast
+    forecast, local = await asyncio.gather(forecast, sync_to_async(_local_weather)(latitude, longitude))
+    return "\n".join([forecast, *local])
+
+
 YIELD_SYSTEM_PROMPT = (
     "You are an expert Indian agricultural advisor with deep knowledge of "
     "Indian crop yields, MSP rates, and farming economics.\n\n"
@@ -130,19 +176,17 @@ SUGGESTION_SYSTEM_PROMPT = (
 )
 
 
-def predict_yield(
-    crop: str, region: str, season: str, area: str = "",
-    latitude: float = None, longitude: float = None,
-    location_name: str = "",
-) -> str:
-    weather_info = _fetch_weather(region, latitude, longitude)
-    area_info = f", on approximately {area}" if area else ""
-
+def _location_desc(region: str, location_name: str) -> str:
     location_desc = location_name or region
     if location_name and region and region.lower() not in location_name.lower():
         location_desc = f"{location_name}, {region}"
+    return location_desc
 
-    user_msg = (
+
+def _yield_message(crop: str, region: str, season: str, area: str, location_name: str, weather_info: str) -> str:
+    area_info = f", on approximately {area}" if area else ""
+    location_desc = _location_desc(region, location_name)
+    return (
         f"Predict the yield for {crop} grown in {location_desc} during the "
         f"{season} season{area_info}.\n\n"
         f"CURRENT WEATHER DATA FOR {location_desc.upper()}:\n{weather_info}\n\n"
@@ -150,37 +194,75 @@ def predict_yield(
         f"the crop. Also include last year's yield and price data for {crop} "
         f"in {region}."
     )
-    try:
-        return ask_text(YIELD_SYSTEM_PROMPT, user_msg)
-    except Exception:
-        logger.exception("Gemini yield prediction failed")
-        raise
 
 
-def suggest_crops(
-    region: str, season: str, current_crop: str = "",
-    latitude: float = None, longitude: float = None,
-    location_name: str = "",
-) -> str:
+def _suggestion_message(region: str, season: str, current_crop: str, location_name: str) -> str:
     crop_info = (
         f" The farmer's current/previous crop is {current_crop}."
         if current_crop
         else ""
     )
-
-    location_desc = location_name or region
-    if location_name and region and region.lower() not in location_name.lower():
-        location_desc = f"{location_name}, {region}"
-
-    user_msg = (
+    location_desc = _location_desc(region, location_name)
+    return (
         f"Suggest the most profitable crops for {location_desc} in the "
         f"{season} season.{crop_info}\n\n"
         f"For each suggested crop, include yield and profit data for "
         f"the last 2-3 years with actual numbers (yield in quintals/hectare, "
         f"MSP or market price in INR/quintal, and estimated profit in INR/hectare)."
     )
+
+
+def predict_yield(
+    crop: str, region: str, season: str, area: str = "",
+    latitude: float = None, longitude: float = None,
+    location_name: str = "",
+) -> str:
+    weather_info = _fetch_weather(region, latitude, longitude)
+    user_msg = _yield_message(crop, region, season, area, location_name, weather_info)
+    try:
+        return ask_text(YIELD_SYSTEM_PROMPT, user_msg, feature="yield_predict")
+    except Exception:
+        logger.exception("Gemini yield prediction failed")
+        raise
+
+
+def suggest_crops(
+    region: str, season: str, current_crop: str = "",
+    latitude: float = None, longitude: float = None,
+    location_name: str = "",
+) -> str:
+    user_msg = _suggestion_message(region, season, current_crop, location_name)
+    try:
+        return ask_text(SUGGESTION_SYSTEM_PROMPT, user_msg, feature="crop_suggestions")
+    except Exception:
+        logger.exception("Gemini crop suggestion failed")
+        raise
+
+
+async def apredict_yield(
+    crop: str, region: str, season: str, area: str = "",
+    latitude: float = None, longitude: float = None,
+    location_name: str = "",
+) -> str:
+    """Async counterpart of predict_yield."""
+    weather_info = await _afetch_weather(region, latitude, longitude)
+    user_msg = _yield_message(crop, region, season, area, location_name, weather_info)
+    try:
+        return await aask_text(YIELD_SYSTEM_PROMPT, user_msg, feature="yield_predict")
+    except Exception:
+        logger.exception("Gemini yield prediction failed")
+        raise
+
+
+async def asuggest_crops(
+    region: str, season: str, current_crop: str = "",
+    latitude: float = None, longitude: float = None,
+    location_name: str = "",
+) -> str:
+    """Async counterpart of suggest_crops."""
+    user_msg = _suggestion_message(region, season, current_crop, location_name)
     try:
-        return ask_text(SUGGESTION_SYSTEM_PROMPT, user_msg)
+        return await aask_text(SUGGESTION_SYSTEM_PROMPT, user_msg, feature="crop_suggestions")
     except Exception:
         logger.exception("Gemini crop suggestion failed")
         raise
@@ -1,24 +1,25 @@
 import logging
 
+from asgiref.sync import sync_to_async
 from rest_framework import status
-from rest_framework.decorators import api_view
 from rest_framework.response import Response
 
-from .gemini_yield import predict_yield, suggest_crops
+from apps.async_api import async_api_view
+from .gemini_yield import apredict_yield, asuggest_crops
 from .models import CropSuggestionQuery, YieldQuery
 from .serializers import CropSuggestionSerializer, YieldPredictionSerializer
 
 logger = logging.getLogger(__name__)
 
 
-@api_view(["POST"])
-def yield_predict(request):
+@async_api_view(["POST"])
+async def yield_predict(request):
     serializer = YieldPredictionSerializer(data=request.data)
     serializer.is_valid(raise_exception=True)
     d = serializer.validated_data
 
     try:
-        prediction = predict_yield(
+        prediction = await apredict_yield(
             crop=d["crop"],
             region=d["region"],
             season=d["season"],
@@ -35,7 +36,7 @@ def yield_predict(request):
         )
 
     user = request.user if request.user.is_authenticated else None
-    YieldQuery.objects.create(
+    await sync_to_async(YieldQuery.objects.create)(
         user=user,
         crop=d["crop"],
         region=d["region"],
@@ -47,14 +48,14 @@ def yield_predict(request):
     return Response({"prediction": prediction})
 
 
-@api_view(["GET"])
-def crop_suggestions(request):
+@async_api_view(["GET"])
+async def crop_suggestions(request):
     serializer = CropSuggestionSerializer(data=request.query_params)
     serializer.is_valid(raise_exception=True)
     d = serializer.validated_data
 
     try:
-        suggestions = suggest_crops(
+        suggestions = await asuggest_crops(
             region=d["region"],
             season=d["season"],
             current_crop=d.get("current_crop", ""),
@@ -70,7 +71,7 @@ def crop_suggestions(request):
         )
 
     user = request.user if request.user.is_authenticated else None
-    CropSuggestionQuery.objects.create(
+    await sync_to_async(CropSuggestionQuery.objects.create)(
         user=user,
         region=d["region"],
         season=d["season"],
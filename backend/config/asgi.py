@@ -1,5 +1,14 @@
 import os
+import threading
+
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 application = get_asgi_application()
+
+# Load the in-memory price store and gazetteer while the server starts accepting requests.
+from apps.prices.store import warm_store  # noqa: E402
+from apps.weather.gazetteer import warm_index  # noqa: E402
+
+threading.Thread(target=warm_store, name='price-store-warmup', daemon=True).start()
+threading.Thread(target=warm_index, name='gazetteer-warmup', daemon=True).start()
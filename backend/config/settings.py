@@ -37,6 +37,7 @@ INSTALLED_APPS = [
     'apps.accounts',
     'apps.chatbot',
     'apps.disease',
+    'apps.llm_usage',
     'apps.marketplace',
     'apps.planner',
     'apps.prices',
@@ -139,6 +140,131 @@ REST_FRAMEWORK = {
 # ---------------------------------------------------------------------------
 GEMINI_API_KEY = env('GEMINI_API_KEY', '')
 GEMINI_MODEL = env('GEMINI_MODEL', 'gemini-2.5-flash')
+# 'google' (real API) or 'stub' (apps.gemini_stub: offline canned replies for load tests)
+GEMINI_BACKEND = env('GEMINI_BACKEND', 'google')
+GEMINI_STUB_LATENCY_MS = float(env('GEMINI_STUB_LATENCY_MS', '1500'))
+GEMINI_STUB_LATENCY_SIGMA = float(env('GEMINI_STUB_LATENCY_SIGMA', '0.4'))
+GEMINI_STUB_ERROR_RATE = float(env('GEMINI_STUB_ERROR_RATE', '0'))
+# Retries (exponential backoff + full jitter), hedging and circuit breaker for Gemini calls
+GEMINI_RETRY_ATTEMPTS = int(env('GEMINI_RETRY_ATTEMPTS', '3'))
+GEMINI_RETRY_BASE_DELAY_S = float(env('GEMINI_RETRY_BASE_DELAY_S', '0.5'))
+GEMINI_RETRY_MAX_DELAY_S = float(env('GEMINI_RETRY_MAX_DELAY_S', '8'))
+GEMINI_HEDGE_ENABLED = env('GEMINI_HEDGE_ENABLED', 'False').lower() in ('true', '1', 'yes')
+GEMINI_HEDGE_PERCENTILE = float(env('GEMINI_HEDGE_PERCENTILE', '95'))
+# Consecutive failed calls (retries exhausted, not individual attempts) that open the breaker
+GEMINI_BREAKER_FAILURES = int(env('GEMINI_BREAKER_FAILURES', '5'))
+GEMINI_BREAKER_RESET_S = float(env('GEMINI_BREAKER_RESET_S', '30'))
+
+# LLM call metrics are buffered in-process and written once this many seconds
+# have passed or this many calls are buffered (and at exit). Lambda freezes
+# containers instead of exiting them, so it flushes after every request.
+LLM_USAGE_FLUSH_S = int(env('LLM_USAGE_FLUSH_S', '0' if env('AWS_LAMBDA_FUNCTION_NAME') else '60'))
+LLM_USAGE_FLUSH_CALLS = int(env('LLM_USAGE_FLUSH_CALLS', '500'))
+
+# Uploaded images are downsized / re-encoded before Gemini vision calls
+GEMINI_IMAGE_MAX_SIDE = int(env('GEMINI_IMAGE_MAX_SIDE', '1024'))
+GEMINI_IMAGE_QUALITY = int(env('GEMINI_IMAGE_QUALITY', '85'))
+GEMINI_IMAGE_FORMAT = env('GEMINI_IMAGE_FORMAT', 'jpeg')  # 'jpeg' or 'webp'
+# Reuse a stored diagnosis for images within this dHash Hamming distance (-1 disables)
+DISEASE_DEDUP_MAX_DISTANCE = int(env('DISEASE_DEDUP_MAX_DISTANCE', '3'))
+# Most band-matching hashes compared per lookup (newest first; only id + hash are read)
+DISEASE_DEDUP_MAX_CANDIDATES = int(env('DISEASE_DEDUP_MAX_CANDIDATES', '5000'))
+# Used to encode Kisan Mitra TTS as OGG/Opus; WAV is served when it is missing
+FFMPEG_BINARY = env('FFMPEG_BINARY', 'ffmpeg')
+# Cached Kisan Mitra TTS audio older than this is deleted by manage.py prune_tts_cache
+TTS_CACHE_TTL_DAYS = int(env('TTS_CACHE_TTL_DAYS', '30'))
+# Max concurrent in-flight async Gemini calls per event loop
+GEMINI_MAX_CONCURRENCY = int(env('GEMINI_MAX_CONCURRENCY', '32'))
+
+# Response cache for ask_text: 'memory' (per-process LRU), 'django' (CACHES alias) or 'none'
+GEMINI_CACHE_BACKEND = env('GEMINI_CACHE_BACKEND', 'memory')
+GEMINI_CACHE_ALIAS = env('GEMINI_CACHE_ALIAS', 'default')
+GEMINI_CACHE_TTL = int(env('GEMINI_CACHE_TTL', str(6 * 60 * 60)))
+GEMINI_CACHE_MAX_ENTRIES = int(env('GEMINI_CACHE_MAX_ENTRIES', '1000'))
+GEMINI_CACHE_MAX_BYTES = int(env('GEMINI_CACHE_MAX_BYTES', str(8 * 1024 * 1024)))
+
+# ---------------------------------------------------------------------------
+# Weather (Open-Meteo)
+# ---------------------------------------------------------------------------
+# Forecasts are shared per grid cell of this size (degrees) via a CACHES alias
+WEATHER_GRID_DEG = float(env('WEATHER_GRID_DEG', '0.1'))
+WEATHER_CACHE_ALIAS = env('WEATHER_CACHE_ALIAS', 'default')
+# Entries go stale at the next multiple of these periods (seconds), matching upstream refreshes
+WEATHER_CACHE_REFRESH_S = int(env('WEATHER_CACHE_REFRESH_S', '3600'))
+WEATHER_CURRENT_REFRESH_S = int(env('WEATHER_CURRENT_REFRESH_S', '900'))
+# Stale entries are served (and refreshed in the background) for this long
+WEATHER_CACHE_STALE_S = int(env('WEATHER_CACHE_STALE_S', str(6 * 60 * 60)))
+# Entries stale for longer than this are refetched inline instead of served
+WEATHER_CACHE_HARD_STALE_S = int(env('WEATHER_CACHE_HARD_STALE_S', str(2 * 60 * 60)))
+# Background refresh threads; off on Lambda, where a frozen container never finishes them
+# (stale entries are then refetched inline by one request while others get the old value)
+WEATHER_CACHE_BACKGROUND_REFRESH = env(
+    'WEATHER_CACHE_BACKGROUND_REFRESH', 'False' if env('AWS_LAMBDA_FUNCTION_NAME') else 'True',
+).lower() in ('true', '1', 'yes')
+# Locations per multi-coordinate Open-Meteo request in bulk refreshes
+WEATHER_BATCH_SIZE = int(env('WEATHER_BATCH_SIZE', '100'))
+# Agro-meteorological indices (apps.weather.indices): horizon and growing-degree-day base/cap
+AGRO_INDEX_DAYS = int(env('AGRO_INDEX_DAYS', '7'))
+AGRO_GDD_BASE_C = float(env('AGRO_GDD_BASE_C', '10'))
+AGRO_GDD_CAP_C = float(env('AGRO_GDD_CAP_C', '30'))
+# Reverse geocoding uses the nearest gazetteer place within this distance before Nominatim
+GAZETTEER_REVERSE_MAX_KM = float(env('GAZETTEER_REVERSE_MAX_KM', '20'))
+# Prebuilt gazetteer search index written by import_gazetteer and loaded at start-up
+# (empty disables); an empty gazetteer is rechecked at most this often (seconds)
+GAZETTEER_INDEX_PATH = env('GAZETTEER_INDEX_PATH', str(BASE_DIR / 'gazetteer_index.pickle'))
+GAZETTEER_EMPTY_RECHECK_S = int(env('GAZETTEER_EMPTY_RECHECK_S', '300'))
+
+# Outbound HTTP (apps.http_client): pooled keep-alive sessions with retries
+HTTP_CONNECT_TIMEOUT_S = float(env('HTTP_CONNECT_TIMEOUT_S', '3.05'))
+HTTP_READ_TIMEOUT_S = float(env('HTTP_READ_TIMEOUT_S', '10'))
+HTTP_RETRIES = int(env('HTTP_RETRIES', '2'))
+HTTP_RETRY_BACKOFF_S = float(env('HTTP_RETRY_BACKOFF_S', '0.3'))
+HTTP_POOL_HOSTS = int(env('HTTP_POOL_HOSTS', '10'))
+HTTP_POOL_MAXSIZE = int(env('HTTP_POOL_MAXSIZE', '20'))
+
+# WeatherAlertsView returns this many stored alerts by default (?limit= up to 4x);
+# generate_weather_alerts deletes forecast alerts older than the retention (days)
+WEATHER_ALERTS_PAGE_SIZE = int(env('WEATHER_ALERTS_PAGE_SIZE', '50'))
+WEATHER_ALERT_RETENTION_DAYS = int(env('WEATHER_ALERT_RETENTION_DAYS', '30'))
+
+# Weather alert delivery (apps.weather.delivery): enabled channels ('email', 'sms'),
+# send rates per second per worker process (divide the provider limit by the
+# number of deliver_weather_alerts workers) and retry budget
+ALERT_DELIVERY_CHANNELS = [c.strip() for c in env('ALERT_DELIVERY_CHANNELS', 'email').split(',') if c.strip()]
+ALERT_EMAIL_RATE_PER_S = float(env('ALERT_EMAIL_RATE_PER_S', '14'))
+ALERT_SMS_RATE_PER_S = float(env('ALERT_SMS_RATE_PER_S', '20'))
+ALERT_SMS_CONCURRENCY = int(env('ALERT_SMS_CONCURRENCY', '8'))
+ALERT_DELIVERY_MAX_ATTEMPTS = int(env('ALERT_DELIVERY_MAX_ATTEMPTS', '3'))
+
+# HistoricalPrice is served from in-process NumPy columns (apps.prices.store), loaded at
+# process start (PRICE_STORE_PRELOAD; off on Lambda, where the init phase has a ~10s limit,
+# so the first price request loads it) and reloaded when the summary watermark changes;
+# the check runs at most this often (seconds). While enabled the store also answers
+# PriceSummaryView, taking precedence over the PriceSummary cube, which then only
+# serves when the store is disabled or failed to load.
+PRICE_STORE_ENABLED = env('PRICE_STORE_ENABLED', 'True').lower() in ('true', '1', 'yes')
+PRICE_STORE_PRELOAD = env(
+    'PRICE_STORE_PRELOAD', 'False' if env('AWS_LAMBDA_FUNCTION_NAME') else 'True',
+).lower() in ('true', '1', 'yes')
+PRICE_STORE_CHECK_S = int(env('PRICE_STORE_CHECK_S', '60'))
+# PriceDataView keyset pages: default and maximum rows per page
+PRICE_PAGE_SIZE = int(env('PRICE_PAGE_SIZE', '2000'))
+PRICE_PAGE_SIZE_MAX = int(env('PRICE_PAGE_SIZE_MAX', '10000'))
+# Rows fetched from the server-side cursor and encoded per chunk in price exports
+PRICE_EXPORT_CHUNK_ROWS = int(env('PRICE_EXPORT_CHUNK_ROWS', '5000'))
+# work_mem for the COPY staging merge in manage.py load_prices (transaction-local)
+PRICE_LOAD_WORK_MEM = env('PRICE_LOAD_WORK_MEM', '256MB')
+
+# ---------------------------------------------------------------------------
+# Email
+# ---------------------------------------------------------------------------
+EMAIL_BACKEND = env('EMAIL_BACKEND', 'django.core.mail.backends.smtp.EmailBackend')
+EMAIL_HOST = env('EMAIL_HOST', 'localhost')
+EMAIL_PORT = int(env('EMAIL_PORT', '587'))
+EMAIL_HOST_USER = env('EMAIL_HOST_USER', '')
+EMAIL_HOST_PASSWORD = env('EMAIL_HOST_PASSWORD', '')
+EMAIL_USE_TLS = env('EMAIL_USE_TLS', 'True').lower() in ('true', '1', 'yes')
+DEFAULT_FROM_EMAIL = env('DEFAULT_FROM_EMAIL', 'Agromod <alerts@agromod.in>')
 
 # ---------------------------------------------------------------------------
 # AWS SNS (OTP SMS)
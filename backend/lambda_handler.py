@@ -6,3 +6,11 @@ from django.core.asgi import get_asgi_application
 
 application = get_asgi_application()
 handler = Mangum(application, lifespan="off")
+
+# Load the gazetteer (and the price store, if PRICE_STORE_PRELOAD is set; it is off by
+# default here) during the init phase, not on the first request.
+from apps.prices.store import warm_store  # noqa: E402
+from apps.weather.gazetteer import warm_index  # noqa: E402
+
+warm_store()
+warm_index()
@@ -27,6 +27,20 @@ const COLORS = [
   '#1b5e20', '#0d47a1', '#bf360c', '#4a148c', '#b71c1c',
 ]
 
+// /api/prices/data/ is keyset-paginated; follow `next` until the last page.
+async function fetchAllPrices(queryStr) {
+  const rows = []
+  let cursor = null
+  do {
+    const params = new URLSearchParams(queryStr)
+    if (cursor) params.set('cursor', cursor)
+    const { data } = await api.get('/api/prices/data/?' + params.toString())
+    rows.push(...data.results)
+    cursor = data.next
+  } while (cursor)
+  return rows
+}
+
 export default function Prices() {
   const [crops, setCrops] = useState([])
   const [states, setStates] = useState([])
@@ -84,8 +98,8 @@ export default function Prices() {
     selectedYears.forEach(y => queryStr.append('year', y))
     queryStr.append('monthly', '1')
 
-    api.get('/api/prices/data/?' + queryStr.toString())
-      .then(({ data }) => setPriceData(data))
+    fetchAllPrices(queryStr)
+      .then(setPriceData)
       .catch(err => setError(err.response?.data?.detail || err.message || 'Failed to fetch prices'))
       .finally(() => setLoading(false))
   }, [selectedCrop, selectedState, selectedCentre, selectedYears])
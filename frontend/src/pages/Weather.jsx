@@ -7,7 +7,7 @@ export default function Weather() {
   const [current, setCurrent] = useState(null)
   const [locationName, setLocationName] = useState('')
   const [alerts, setAlerts] = useState({ alerts: [], live: [] })
-  const [prefs, setPrefs] = useState({ location_name: '', email_alerts: true, alert_frost: true, alert_heavy_rain: true, alert_heat: true })
+  const [prefs, setPrefs] = useState({ location_name: '', email_alerts: true, sms_alerts: false, alert_frost: true, alert_heavy_rain: true, alert_heat: true })
   const [loading, setLoading] = useState(false)
   const [searchQuery, setSearchQuery] = useState('')
   const [searchResults, setSearchResults] = useState([])
@@ -47,6 +47,7 @@ export default function Weather() {
       longitude: lon,
       location_name: name || searchQuery,
       email_alerts: prefs.email_alerts,
+      sms_alerts: prefs.sms_alerts,
       alert_frost: prefs.alert_frost,
       alert_heavy_rain: prefs.alert_heavy_rain,
       alert_heat: prefs.alert_heat,
@@ -69,6 +70,7 @@ export default function Weather() {
           longitude: lon,
           location_name: 'Current location',
           email_alerts: prefs.email_alerts,
+          sms_alerts: prefs.sms_alerts,
           alert_frost: prefs.alert_frost,
           alert_heavy_rain: prefs.alert_heavy_rain,
           alert_heat: prefs.alert_heat,
@@ -88,6 +90,7 @@ export default function Weather() {
       longitude: prefs.longitude,
       location_name: prefs.location_name,
       email_alerts: prefs.email_alerts,
+      sms_alerts: prefs.sms_alerts,
       alert_frost: prefs.alert_frost,
       alert_heavy_rain: prefs.alert_heavy_rain,
       alert_heat: prefs.alert_heat,
@@ -138,6 +141,7 @@ export default function Weather() {
             </Box>
             <Typography variant="subtitle2" sx={{ mt: 2 }}>Alert preferences</Typography>
             <FormControlLabel control={<Switch checked={prefs.email_alerts} onChange={(e) => setPrefs((p) => ({ ...p, email_alerts: e.target.checked }))} />} label="Email alerts" />
+            <FormControlLabel control={<Switch checked={prefs.sms_alerts} onChange={(e) => setPrefs((p) => ({ ...p, sms_alerts: e.target.checked }))} />} label="SMS alerts" />
             <FormControlLabel control={<Switch checked={prefs.alert_frost} onChange={(e) => setPrefs((p) => ({ ...p, alert_frost: e.target.checked }))} />} label="Frost" />
             <FormControlLabel control={<Switch checked={prefs.alert_heavy_rain} onChange={(e) => setPrefs((p) => ({ ...p, alert_heavy_rain: e.target.checked }))} />} label="Heavy rain" />
             <FormControlLabel control={<Switch checked={prefs.alert_heat} onChange={(e) => setPrefs((p) => ({ ...p, alert_heat: e.target.checked }))} />} label="Heat wave" />